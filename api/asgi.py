@@ -0,0 +1,290 @@
+import sys
+import os
+import logging
+from contextlib import asynccontextmanager
+from datetime import datetime
+from a2wsgi import WSGIMiddleware
+from fastapi import FastAPI, Depends, HTTPException, Request
+from fastapi.responses import JSONResponse, Response
+from starlette.routing import Mount
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from werkzeug.http import parse_etags
+
+# Add the parent directory to Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from api.main import app as flask_app
+from src.db import db, create_async_db_engine, schema_for, EXPANSIONS, HotelSchema, RoomSchema, BookingSchema, booking_schema
+from src.async_logic import AsyncHotelBookingLogic
+from src.logic import HotelBookingLogic
+from src.metrics import metrics
+from src.lifecycle import booking_lifecycle
+from src.idempotency import idempotency_store, IDEMPOTENCY_HEADER
+
+logger = logging.getLogger(__name__)
+
+# Same database as the Flask app (which also creates and seeds it), via the asyncio driver
+with flask_app.app_context():
+    engine = create_async_db_engine(db.engine.url, flask_app.config)
+SessionLocal = async_sessionmaker(engine, expire_on_commit=False)
+
+@asynccontextmanager
+async def lifespan(app):
+    if booking_lifecycle.enabled:
+        booking_lifecycle.start(flask_app)
+    yield
+    booking_lifecycle.stop()
+    await engine.dispose()
+
+app = FastAPI(title="Hotel/Room Reservation System API", version="1.0.0", lifespan=lifespan)
+
+class RequestMetricsMiddleware:
+    """Record native routes in src.metrics; requests mounted on the Flask app are recorded there"""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        
+        started = metrics.start_request()
+        status = 500
+        
+        async def send_with_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # Anything without a native route falls through to the Flask mount
+            route = scope.get('route')
+            if route is not None and not isinstance(route, Mount):
+                metrics.finish_request(started, route.path, scope['method'], status)
+
+app.add_middleware(RequestMetricsMiddleware)
+
+async def get_session():
+    async with SessionLocal() as session:
+        yield session
+
+@app.exception_handler(HTTPException)
+async def http_error(request, exc):
+    return JSONResponse({"error": exc.detail}, status_code=exc.status_code)
+
+def replayed_response(replay):
+    """The stored response for a repeated Idempotency-Key"""
+    status, body = replay
+    return Response(body, status_code=status, media_type='application/json', headers={'Idempotent-Replayed': 'true'})
+
+def server_error(request, e):
+    """500 response for an unexpected exception, logged with its traceback"""
+    logger.exception("Error handling %s %s", request.method, request.url.path)
+    return JSONResponse({"error": str(e)}, status_code=500)
+
+def get_arg(request, name, default=None, type=str):
+    """Query parameter converted with type, or default if missing or invalid (like Flask's args.get)"""
+    value = request.query_params.get(name)
+    if value is None:
+        return default
+    try:
+        return type(value)
+    except ValueError:
+        return default
+
+def get_expand(request, schema_class):
+    """Parse ?expand=a,b into the set of relationships to nest in the response"""
+    expand = frozenset(name.strip() for name in get_arg(request, 'expand', '').split(',') if name.strip())
+    unknown = expand - set(EXPANSIONS[schema_class])
+    if unknown:
+        raise HTTPException(400, f"Cannot expand: {', '.join(sorted(unknown))}")
+    return expand
+
+def cached_json(request, payload, etag):
+    """JSON response tagged with an ETag, or 304 Not Modified if it matches If-None-Match"""
+    headers = {"ETag": f'"{etag}"', "Cache-Control": "no-cache"}
+    if parse_etags(request.headers.get('if-none-match')).contains(etag):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(payload, headers=headers)
+
+# Hotel endpoints
+@app.get('/api/hotels')
+async def get_hotels(request: Request, session=Depends(get_session)):
+    """Get all hotels"""
+    expand = get_expand(request, HotelSchema)
+    try:
+        hotels, etag = await AsyncHotelBookingLogic.get_all_hotels_payload(session, expand)
+        return cached_json(request, hotels, etag)
+    except Exception as e:
+        return server_error(request, e)
+
+@app.get('/api/hotels/{hotel_id}')
+async def get_hotel(hotel_id: int, request: Request, session=Depends(get_session)):
+    """Get hotel by ID"""
+    expand = get_expand(request, HotelSchema)
+    try:
+        hotel, etag = await AsyncHotelBookingLogic.get_hotel_payload(session, hotel_id, expand)
+        if not hotel:
+            return JSONResponse({"error": "Hotel not found"}, status_code=404)
+        return cached_json(request, hotel, etag)
+    except Exception as e:
+        return server_error(request, e)
+
+# Room endpoints
+@app.get('/api/hotels/{hotel_id}/rooms')
+async def get_hotel_rooms(hotel_id: int, request: Request, session=Depends(get_session)):
+    """Get all rooms for a specific hotel"""
+    expand = get_expand(request, RoomSchema)
+    try:
+        rooms, etag = await AsyncHotelBookingLogic.get_hotel_rooms_payload(session, hotel_id, expand)
+        return cached_json(request, rooms, etag)
+    except Exception as e:
+        return server_error(request, e)
+
+@app.get('/api/rooms/{room_id}')
+async def get_room(room_id: int, request: Request, session=Depends(get_session)):
+    """Get room by ID"""
+    expand = get_expand(request, RoomSchema)
+    try:
+        room, etag = await AsyncHotelBookingLogic.get_room_payload(session, room_id, expand)
+        if not room:
+            return JSONResponse({"error": "Room not found"}, status_code=404)
+        return cached_json(request, room, etag)
+    except Exception as e:
+        return server_error(request, e)
+
+@app.get('/api/hotels/{hotel_id}/available-rooms')
+async def get_available_rooms(hotel_id: int, request: Request, session=Depends(get_session)):
+    """Get available rooms for given dates"""
+    expand = get_expand(request, RoomSchema)
+    try:
+        check_in = get_arg(request, 'check_in')
+        check_out = get_arg(request, 'check_out')
+        guests = get_arg(request, 'guests', 1, type=int)
+        
+        if not check_in or not check_out:
+            return JSONResponse({"error": "check_in and check_out parameters are required"}, status_code=400)
+        
+        # Validate date format
+        try:
+            check_in_date = datetime.strptime(check_in, '%Y-%m-%d').date()
+            check_out_date = datetime.strptime(check_out, '%Y-%m-%d').date()
+        except ValueError:
+            return JSONResponse({"error": "Invalid date format. Use YYYY-MM-DD"}, status_code=400)
+        
+        available_rooms = await AsyncHotelBookingLogic.get_available_rooms_payload(
+            session, hotel_id, check_in_date, check_out_date, guests, expand
+        )
+        return JSONResponse(available_rooms)
+    except Exception as e:
+        return server_error(request, e)
+
+# Booking endpoints; listing bookings is served by the Flask app below
+@app.post('/api/bookings')
+async def create_booking(request: Request, session=Depends(get_session)):
+    """Create a new booking"""
+    try:
+        data = await request.json()
+        
+        required_fields = ['room_id', 'guest_name', 'guest_email', 'check_in', 'check_out']
+        for field in required_fields:
+            if field not in data:
+                return JSONResponse({"error": f"Missing required field: {field}"}, status_code=400)
+        
+        room_id, error = HotelBookingLogic.parse_room_id(data['room_id'])
+        if error:
+            return JSONResponse({"error": error}, status_code=400)
+        
+        # A retry of a booking already created replays its response
+        idempotent = None
+        if IDEMPOTENCY_HEADER in request.headers:
+            idempotent, error = idempotency_store.begin(request.headers[IDEMPOTENCY_HEADER], data)
+            if error:
+                return JSONResponse({"error": error}, status_code=400)
+            replay, error = await idempotency_store.lookup_async(session, idempotent)
+            if error:
+                return JSONResponse({"error": error}, status_code=422)
+            if replay:
+                return replayed_response(replay)
+        
+        booking, error = await AsyncHotelBookingLogic.create_booking(
+            session,
+            room_id,
+            data['guest_name'],
+            data['guest_email'],
+            data['check_in'],
+            data['check_out'],
+            idempotent
+        )
+        
+        if error:
+            if idempotent:
+                # A concurrent request with the same key may have created it
+                replay, _ = await idempotency_store.lookup_async(session, idempotent)
+                if replay:
+                    return replayed_response(replay)
+            return JSONResponse({"error": error}, status_code=400)
+        
+        if idempotent:
+            return Response(idempotent.body, status_code=201, media_type='application/json')
+        return JSONResponse(booking_schema.dump(booking), status_code=201)
+    
+    except Exception as e:
+        return server_error(request, e)
+
+@app.get('/api/bookings/{booking_id}')
+async def get_booking(booking_id: int, request: Request, session=Depends(get_session)):
+    """Get a specific booking"""
+    expand = get_expand(request, BookingSchema)
+    try:
+        booking = await AsyncHotelBookingLogic.get_booking_by_id(session, booking_id, expand)
+        if not booking:
+            return JSONResponse({"error": "Booking not found"}, status_code=404)
+        return JSONResponse(schema_for(BookingSchema, expand).dump(booking))
+    except Exception as e:
+        return server_error(request, e)
+
+@app.delete('/api/bookings/{booking_id}')
+async def cancel_booking(booking_id: int, request: Request, session=Depends(get_session)):
+    """Cancel a specific booking"""
+    try:
+        success, error = await AsyncHotelBookingLogic.cancel_booking(session, booking_id)
+        if error:
+            return JSONResponse({"error": error}, status_code=400)
+        return JSONResponse({"message": "Booking cancelled successfully"})
+    except Exception as e:
+        return server_error(request, e)
+
+@app.get('/api/bookings/guest/{guest_email}')
+async def get_guest_bookings(guest_email: str, request: Request, session=Depends(get_session)):
+    """Get a page of bookings for a guest email, newest stay first"""
+    expand = get_expand(request, BookingSchema)
+    try:
+        limit = min(get_arg(request, 'limit', 50, type=int), 500)
+        if limit < 1:
+            return JSONResponse({"error": "limit must be a positive integer"}, status_code=400)
+        
+        try:
+            bookings, next_cursor = await AsyncHotelBookingLogic.get_bookings_by_email(
+                session, guest_email, expand, limit=limit, cursor=get_arg(request, 'cursor')
+            )
+        except ValueError as e:
+            return JSONResponse({"error": str(e)}, status_code=400)
+        
+        return JSONResponse({
+            "bookings": schema_for(BookingSchema, expand, many=True).dump(bookings),
+            "next_cursor": next_cursor
+        })
+    except Exception as e:
+        return server_error(request, e)
+
+# Every other route (search, calendar, bulk bookings, admin, ...) is served by
+# the Flask app on a thread pool until it gets a native async implementation
+app.mount('/', WSGIMiddleware(flask_app))
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, host='0.0.0.0', port=int(os.getenv('ASGI_PORT', '5002')))
@@ -1,14 +1,25 @@
 import sys
 import os
-from flask import Flask, request, jsonify
+import json
+import time
+import click
+from flask import Flask, Response, g, request, jsonify, abort, make_response, stream_with_context
 from datetime import datetime
 from dotenv import load_dotenv
 
 # Add the parent directory to Python path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
-from src.db import init_db, hotel_schema, room_schema, booking_schema, hotels_schema, rooms_schema, bookings_schema
+from src.db import db, init_db, schema_for, EXPANSIONS, HotelSchema, RoomSchema, BookingSchema, booking_schema
 from src.logic import HotelBookingLogic
+from src.occupancy import occupancy_index
+from src.cache import catalog_cache, availability_cache
+from src.metrics import metrics, profiler
+from src.lifecycle import booking_lifecycle
+from src.partitions import archive_partitions
+from src.idempotency import idempotency_store, IDEMPOTENCY_HEADER
+from src.importer import CatalogImporter, FORMATS, IMPORT_BATCH_SIZE
+from src import rollups
 
 load_dotenv()
 
@@ -17,9 +28,147 @@ app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///hot
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key')
 
+MAX_BULK_BOOKINGS = int(os.getenv('MAX_BULK_BOOKINGS', '1000'))
+MAX_PRICE_QUOTES = int(os.getenv('MAX_PRICE_QUOTES', '10000'))
+
 # Initialize database
 init_db(app)
 
+# Build the in-memory occupancy index from confirmed bookings; the asyncio
+# server reloads it in this app's context
+occupancy_index.app = app
+if occupancy_index.enabled:
+    with app.app_context():
+        occupancy_index.load()
+
+# Databases created before the daily rollup existed start with an empty one
+with app.app_context():
+    if rollups.needs_backfill():
+        db.session.remove()
+        rollups.backfill()
+    db.session.remove()
+
+# Per-route timings, SQL statement counts and slow query logging
+metrics.instrument_sql()
+
+def cache_metrics():
+    """Response cache counters as Prometheus samples"""
+    lines = []
+    stats = {"catalog": catalog_cache.stats(), "availability": availability_cache.stats()}
+    for counter in ('hits', 'misses', 'evictions', 'expirations', 'invalidations'):
+        lines += [f"# HELP cache_{counter}_total Response cache {counter}", f"# TYPE cache_{counter}_total counter"]
+        lines += [f'cache_{counter}_total{{cache="{name}"}} {cache[counter]}' for name, cache in stats.items()]
+    lines += ["# HELP cache_entries Entries currently in the response cache", "# TYPE cache_entries gauge"]
+    lines += [f'cache_entries{{cache="{name}"}} {cache["entries"]}' for name, cache in stats.items()]
+    return lines
+
+metrics.add_collector(cache_metrics)
+metrics.add_collector(booking_lifecycle.metrics)
+metrics.add_collector(idempotency_store.metrics)
+
+if os.getenv('PROFILER_ENABLED', '0') == '1':
+    profiler.start()
+
+@app.before_request
+def start_request_metrics():
+    g.request_metrics = metrics.start_request()
+
+@app.before_request
+def start_booking_lifecycle():
+    # Started by the first request rather than at import, so CLI commands never run it
+    if booking_lifecycle.enabled and not booking_lifecycle.running:
+        booking_lifecycle.start(app)
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('request_metrics', None)
+    if started:
+        route = request.url_rule.rule if request.url_rule else '<unmatched>'
+        metrics.finish_request(started, route, request.method, response.status_code)
+    return response
+
+def replayed_response(replay):
+    """The stored response for a repeated Idempotency-Key"""
+    status, body = replay
+    return Response(body, status=status, mimetype='application/json', headers={'Idempotent-Replayed': 'true'})
+
+def server_error(e):
+    """500 response for an unexpected exception, logged with its traceback"""
+    app.logger.exception("Error handling %s %s", request.method, request.path)
+    return jsonify({"error": str(e)}), 500
+
+@app.cli.command('backfill-rollups')
+@click.option('--start', type=click.DateTime(formats=['%Y-%m-%d']), help="First night to rebuild (default: all)")
+@click.option('--end', type=click.DateTime(formats=['%Y-%m-%d']), help="Night after the last one to rebuild (default: all)")
+@click.option('--batch-size', default=10000, show_default=True, help="Bookings fetched per round trip")
+def backfill_rollups(start, end, batch_size):
+    """Rebuild the daily occupancy and revenue rollup from the bookings table"""
+    started = time.perf_counter()
+    bookings_read, rows_written = rollups.backfill(
+        start.date() if start else None, end.date() if end else None, batch_size
+    )
+    elapsed = time.perf_counter() - started
+    click.echo(f"Read {bookings_read} bookings and wrote {rows_written} rollup rows in {elapsed:.2f}s "
+               f"({bookings_read / elapsed:,.0f} bookings/s)")
+
+@app.cli.command('import-catalog')
+@click.option('--hotels', 'hotels_path', type=click.Path(exists=True, dir_okay=False), help="Hotels file")
+@click.option('--rooms', 'rooms_path', type=click.Path(exists=True, dir_okay=False), help="Rooms file")
+@click.option('--bookings', 'bookings_path', type=click.Path(exists=True, dir_okay=False), help="Historical bookings file")
+@click.option('--format', 'file_format', type=click.Choice(FORMATS), help="File format (default: from the extension)")
+@click.option('--batch-size', default=IMPORT_BATCH_SIZE, show_default=True, help="Rows written per transaction")
+def import_catalog(hotels_path, rooms_path, bookings_path, file_format, batch_size):
+    """Import hotels, rooms and bookings from CSV or NDJSON files, matching rows on natural keys"""
+    def progress(kind, rows, seconds):
+        click.echo(f"  {kind}: {rows:,} rows read ({rows / seconds:,.0f} rows/s)", err=True)
+    
+    importer = CatalogImporter(batch_size=batch_size, progress=progress)
+    failed = False
+    # Hotels before the rooms that reference them, rooms before their bookings
+    for kind, path in (('hotels', hotels_path), ('rooms', rooms_path), ('bookings', bookings_path)):
+        if not path:
+            continue
+        summary = importer.import_file(kind, path, file_format)
+        click.echo(f"{kind}: {summary['read']:,} read, {summary['inserted']:,} inserted, {summary['updated']:,} updated, "
+                   f"{summary['unchanged']:,} unchanged, {summary['rejected']:,} rejected "
+                   f"in {summary['seconds']}s ({summary['rows_per_sec']:,} rows/s)")
+        for error in summary['errors']:
+            click.echo(f"  {path}:{error['line']}: {error['error']}", err=True)
+        failed |= summary['rejected'] > 0
+    
+    started = time.perf_counter()
+    importer.refresh_derived_state()
+    click.echo(f"Rebuilt rollups and counters in {time.perf_counter() - started:.2f}s; "
+               "running API servers pick up the import when restarted")
+    if failed:
+        sys.exit(1)
+
+@app.cli.command('run-lifecycle')
+@click.option('--archive-after-days', type=int, help="Also archive bookings finished this many days ago "
+              "(default: LIFECYCLE_ARCHIVE_AFTER_DAYS)")
+def run_lifecycle(archive_after_days):
+    """Mark past stays completed and archive old finished bookings once, e.g. from cron"""
+    if archive_after_days is not None:
+        booking_lifecycle.archive_after_days = archive_after_days
+    result = booking_lifecycle.run_once()
+    click.echo(f"Completed {result['completed']} past stays and archived {result['archived']} bookings "
+               f"in {result['seconds']:.2f}s")
+
+def get_expand(schema_class):
+    """Parse ?expand=a,b into the set of relationships to nest in the response"""
+    expand = frozenset(name.strip() for name in request.args.get('expand', '').split(',') if name.strip())
+    unknown = expand - set(EXPANSIONS[schema_class])
+    if unknown:
+        abort(make_response(jsonify({"error": f"Cannot expand: {', '.join(sorted(unknown))}"}), 400))
+    return expand
+
+def cached_json(payload, etag):
+    """JSON response tagged with an ETag, or 304 Not Modified if it matches If-None-Match"""
+    response = jsonify(payload)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
 @app.route('/')
 def home():
     return jsonify({
@@ -30,10 +179,21 @@ def home():
             "hotel_detail": "/api/hotels/<int:hotel_id>",
             "hotel_rooms": "/api/hotels/<int:hotel_id>/rooms",
             "available_rooms": "/api/hotels/<int:hotel_id>/available-rooms",
+            "availability_calendar": "/api/hotels/<int:hotel_id>/calendar",
+            "search": "/api/search",
             "room_detail": "/api/rooms/<int:room_id>",
             "bookings": "/api/bookings",
+            "bulk_bookings": "/api/bookings/bulk",
             "booking_detail": "/api/bookings/<int:booking_id>",
-            "guest_bookings": "/api/bookings/guest/<string:guest_email>"
+            "guest_bookings": "/api/bookings/guest/<string:guest_email>",
+            "occupancy_index_check": "/api/admin/occupancy-index/check",
+            "cache_stats": "/api/cache/stats",
+            "stats": "/api/stats",
+            "occupancy_report": "/api/reports/occupancy",
+            "metrics": "/metrics",
+            "profiler": "/api/admin/profiler",
+            "lifecycle": "/api/admin/lifecycle",
+            "partitions": "/api/admin/partitions"
         }
     })
 
@@ -41,47 +201,52 @@ def home():
 @app.route('/api/hotels', methods=['GET'])
 def get_hotels():
     """Get all hotels"""
+    expand = get_expand(HotelSchema)
     try:
-        hotels = HotelBookingLogic.get_all_hotels()
-        return jsonify(hotels_schema.dump(hotels))
+        hotels, etag = HotelBookingLogic.get_all_hotels_payload(expand)
+        return cached_json(hotels, etag)
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return server_error(e)
 
 @app.route('/api/hotels/<int:hotel_id>', methods=['GET'])
 def get_hotel(hotel_id):
     """Get hotel by ID"""
+    expand = get_expand(HotelSchema)
     try:
-        hotel = HotelBookingLogic.get_hotel_by_id(hotel_id)
+        hotel, etag = HotelBookingLogic.get_hotel_payload(hotel_id, expand)
         if not hotel:
             return jsonify({"error": "Hotel not found"}), 404
-        return jsonify(hotel_schema.dump(hotel))
+        return cached_json(hotel, etag)
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return server_error(e)
 
 # Room endpoints
 @app.route('/api/hotels/<int:hotel_id>/rooms', methods=['GET'])
 def get_hotel_rooms(hotel_id):
     """Get all rooms for a specific hotel"""
+    expand = get_expand(RoomSchema)
     try:
-        rooms = HotelBookingLogic.get_rooms_by_hotel(hotel_id)
-        return jsonify(rooms_schema.dump(rooms))
+        rooms, etag = HotelBookingLogic.get_hotel_rooms_payload(hotel_id, expand)
+        return cached_json(rooms, etag)
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return server_error(e)
 
 @app.route('/api/rooms/<int:room_id>', methods=['GET'])
 def get_room(room_id):
     """Get room by ID"""
+    expand = get_expand(RoomSchema)
     try:
-        room = HotelBookingLogic.get_room_by_id(room_id)
+        room, etag = HotelBookingLogic.get_room_payload(room_id, expand)
         if not room:
             return jsonify({"error": "Room not found"}), 404
-        return jsonify(room_schema.dump(room))
+        return cached_json(room, etag)
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return server_error(e)
 
 @app.route('/api/hotels/<int:hotel_id>/available-rooms', methods=['GET'])
 def get_available_rooms(hotel_id):
     """Get available rooms for given dates"""
+    expand = get_expand(RoomSchema)
     try:
         check_in = request.args.get('check_in')
         check_out = request.args.get('check_out')
@@ -97,21 +262,128 @@ def get_available_rooms(hotel_id):
         except ValueError:
             return jsonify({"error": "Invalid date format. Use YYYY-MM-DD"}), 400
         
-        available_rooms = HotelBookingLogic.get_available_rooms(hotel_id, check_in, check_out, guests)
-        return jsonify(rooms_schema.dump(available_rooms))
+        available_rooms = HotelBookingLogic.get_available_rooms_payload(hotel_id, check_in, check_out, guests, expand)
+        return jsonify(available_rooms)
+    except Exception as e:
+        return server_error(e)
+
+@app.route('/api/hotels/<int:hotel_id>/calendar', methods=['GET'])
+def get_availability_calendar(hotel_id):
+    """Get per-night free room counts for a month"""
+    try:
+        month = request.args.get('month')
+        guests = request.args.get('guests', 1, type=int)
+        
+        if not month:
+            return jsonify({"error": "month parameter is required"}), 400
+        
+        # Validate month format
+        try:
+            first_day = datetime.strptime(month, '%Y-%m')
+        except ValueError:
+            return jsonify({"error": "Invalid month format. Use YYYY-MM"}), 400
+        
+        calendar = HotelBookingLogic.get_availability_calendar(hotel_id, first_day.year, first_day.month, guests)
+        return jsonify(calendar)
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return server_error(e)
+
+@app.route('/api/search', methods=['GET'])
+def search_rooms():
+    """Search available rooms across all hotels"""
+    expand = get_expand(RoomSchema)
+    try:
+        check_in = request.args.get('check_in')
+        check_out = request.args.get('check_out')
+        guests = request.args.get('guests', 1, type=int)
+        limit = min(request.args.get('limit', 20, type=int), 100)
+        
+        if not check_in or not check_out:
+            return jsonify({"error": "check_in and check_out parameters are required"}), 400
+        
+        # Validate date format
+        try:
+            datetime.strptime(check_in, '%Y-%m-%d')
+            datetime.strptime(check_out, '%Y-%m-%d')
+        except ValueError:
+            return jsonify({"error": "Invalid date format. Use YYYY-MM-DD"}), 400
+        
+        if limit < 1:
+            return jsonify({"error": "limit must be a positive integer"}), 400
+        
+        try:
+            rooms, next_cursor = HotelBookingLogic.search_available_rooms(
+                check_in,
+                check_out,
+                guests,
+                location=request.args.get('location'),
+                min_price=request.args.get('min_price', type=float),
+                max_price=request.args.get('max_price', type=float),
+                room_type=request.args.get('room_type'),
+                limit=limit,
+                cursor=request.args.get('cursor')
+            )
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        return jsonify({"rooms": schema_for(RoomSchema, expand, many=True).dump(rooms), "next_cursor": next_cursor})
+    except Exception as e:
+        return server_error(e)
 
 # Booking endpoints
 @app.route('/api/bookings', methods=['GET', 'POST'])
 def handle_bookings():
     """Get all bookings or create a new booking"""
     if request.method == 'GET':
+        expand = get_expand(BookingSchema)
         try:
-            bookings = HotelBookingLogic.get_all_bookings()
-            return jsonify(bookings_schema.dump(bookings))
+            limit = min(request.args.get('limit', 50, type=int), 500)
+            output_format = request.args.get('format', 'json')
+            filters = {
+                'status': request.args.get('status'),
+                'hotel_id': request.args.get('hotel_id', type=int),
+                'date_from': request.args.get('date_from'),
+                'date_to': request.args.get('date_to'),
+                'expand': expand,
+            }
+            
+            # Validate date format
+            try:
+                for field in ('date_from', 'date_to'):
+                    if filters[field]:
+                        filters[field] = datetime.strptime(filters[field], '%Y-%m-%d').date()
+            except ValueError:
+                return jsonify({"error": "Invalid date format. Use YYYY-MM-DD"}), 400
+            
+            if output_format == 'ndjson':
+                # Stream every matching booking, one JSON document per line
+                schema = schema_for(BookingSchema, expand)
+                
+                def generate():
+                    for booking in HotelBookingLogic.iter_bookings(**filters):
+                        yield json.dumps(schema.dump(booking)) + '\n'
+                
+                return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+            
+            if output_format != 'json':
+                return jsonify({"error": "format must be 'json' or 'ndjson'"}), 400
+            
+            if limit < 1:
+                return jsonify({"error": "limit must be a positive integer"}), 400
+            
+            try:
+                bookings, next_cursor = HotelBookingLogic.get_bookings_page(
+                    limit=limit, cursor=request.args.get('cursor'), **filters
+                )
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            
+            return jsonify({
+                "bookings": schema_for(BookingSchema, expand, many=True).dump(bookings),
+                "next_cursor": next_cursor
+            })
         except Exception as e:
-            return jsonify({"error": str(e)}), 500
+            return server_error(e)
     
     elif request.method == 'POST':
         try:
@@ -122,33 +394,99 @@ def handle_bookings():
                 if field not in data:
                     return jsonify({"error": f"Missing required field: {field}"}), 400
             
+            room_id, error = HotelBookingLogic.parse_room_id(data['room_id'])
+            if error:
+                return jsonify({"error": error}), 400
+            
+            # A retry of a booking already created replays its response
+            idempotent = None
+            if IDEMPOTENCY_HEADER in request.headers:
+                idempotent, error = idempotency_store.begin(request.headers[IDEMPOTENCY_HEADER], data)
+                if error:
+                    return jsonify({"error": error}), 400
+                replay, error = idempotency_store.lookup(idempotent)
+                if error:
+                    return jsonify({"error": error}), 422
+                if replay:
+                    return replayed_response(replay)
+            
             booking, error = HotelBookingLogic.create_booking(
-                data['room_id'],
+                room_id,
                 data['guest_name'],
                 data['guest_email'],
                 data['check_in'],
-                data['check_out']
+                data['check_out'],
+                idempotent
             )
             
             if error:
+                if idempotent:
+                    # A concurrent request with the same key may have created it
+                    replay, _ = idempotency_store.lookup(idempotent)
+                    if replay:
+                        return replayed_response(replay)
                 return jsonify({"error": error}), 400
             
+            if idempotent:
+                return Response(idempotent.body, status=201, mimetype='application/json')
             return jsonify(booking_schema.dump(booking)), 201
             
         except Exception as e:
-            return jsonify({"error": str(e)}), 500
+            return server_error(e)
+
+@app.route('/api/bookings/bulk', methods=['POST'])
+def create_bulk_bookings():
+    """Create many bookings in a single transaction"""
+    try:
+        data = request.get_json()
+        
+        items = data.get('bookings') if isinstance(data, dict) else None
+        if not isinstance(items, list) or not items:
+            return jsonify({"error": "bookings must be a non-empty list"}), 400
+        
+        if len(items) > MAX_BULK_BOOKINGS:
+            return jsonify({"error": f"At most {MAX_BULK_BOOKINGS} bookings per request"}), 400
+        
+        mode = data.get('mode', 'all_or_nothing')
+        if mode not in ('all_or_nothing', 'partial'):
+            return jsonify({"error": "mode must be 'all_or_nothing' or 'partial'"}), 400
+        
+        if not all(isinstance(item, dict) for item in items):
+            return jsonify({"error": "Each booking must be an object"}), 400
+        
+        results = HotelBookingLogic.create_bookings_bulk(items, atomic=(mode == 'all_or_nothing'))
+        
+        response = []
+        for index, (booking, error) in enumerate(results):
+            if error:
+                response.append({"index": index, "error": error})
+            else:
+                response.append({"index": index, "booking": booking_schema.dump(booking)})
+        
+        created = sum(1 for booking, _ in results if booking)
+        if created == len(results):
+            status = 201
+        elif created:
+            status = 207
+        else:
+            status = 400
+        return jsonify({"mode": mode, "created": created, "failed": len(results) - created, "results": response}), status
+    
+    except Exception as e:
+        return server_error(e)
 
 @app.route('/api/bookings/<int:booking_id>', methods=['GET', 'DELETE'])
 def handle_booking(booking_id):
     """Get or cancel a specific booking"""
     if request.method == 'GET':
+        expand = get_expand(BookingSchema)
         try:
-            booking = HotelBookingLogic.get_booking_by_id(booking_id)
+            booking = HotelBookingLogic.get_booking_by_id(booking_id, expand)
             if not booking:
                 return jsonify({"error": "Booking not found"}), 404
-            return jsonify(booking_schema.dump(booking))
+            return jsonify(schema_for(BookingSchema, expand).dump(booking))
         except Exception as e:
-            return jsonify({"error": str(e)}), 500
+            return server_error(e)
     
     elif request.method == 'DELETE':
         try:
@@ -157,23 +495,160 @@ def handle_booking(booking_id):
                 return jsonify({"error": error}), 400
             return jsonify({"message": "Booking cancelled successfully"})
         except Exception as e:
-            return jsonify({"error": str(e)}), 500
+            return server_error(e)
 
 @app.route('/api/bookings/guest/<string:guest_email>', methods=['GET'])
 def get_guest_bookings(guest_email):
-    """Get all bookings for a guest email"""
+    """Get a page of bookings for a guest email, newest stay first"""
+    expand = get_expand(BookingSchema)
+    try:
+        limit = min(request.args.get('limit', 50, type=int), 500)
+        if limit < 1:
+            return jsonify({"error": "limit must be a positive integer"}), 400
+        
+        try:
+            bookings, next_cursor = HotelBookingLogic.get_bookings_by_email(
+                guest_email, expand, limit=limit, cursor=request.args.get('cursor')
+            )
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        return jsonify({
+            "bookings": schema_for(BookingSchema, expand, many=True).dump(bookings),
+            "next_cursor": next_cursor
+        })
+    except Exception as e:
+        return server_error(e)
+
+@app.route('/api/admin/occupancy-index/check', methods=['GET'])
+def check_occupancy_index():
+    """Compare the in-memory occupancy index with the database"""
+    try:
+        if not occupancy_index.enabled:
+            return jsonify({"error": "Occupancy index is disabled"}), 400
+        occupancy_index.ensure_loaded()
+        differences = occupancy_index.check_consistency()
+        return jsonify({
+            "consistent": not differences,
+            "differences": {str(room_id): diff for room_id, diff in differences.items()}
+        })
+    except Exception as e:
+        return server_error(e)
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus metrics: per-route latency, SQL per request, slow queries and caches"""
     try:
-        bookings = HotelBookingLogic.get_bookings_by_email(guest_email)
-        return jsonify(bookings_schema.dump(bookings))
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return server_error(e)
+
+@app.route('/api/admin/profiler', methods=['GET', 'POST'])
+def handle_profiler():
+    """Get the sampling profiler's hottest stacks, or start, stop and reset it"""
+    try:
+        if request.method == 'GET':
+            if request.args.get('format') == 'collapsed':
+                return Response(profiler.collapsed(), mimetype='text/plain')
+            return jsonify(profiler.snapshot(request.args.get('limit', 50, type=int)))
+        
+        data = request.get_json(silent=True) or {}
+        interval_ms = data.get('interval_ms')
+        if interval_ms is not None and (not isinstance(interval_ms, (int, float)) or not 0.1 <= interval_ms <= 1000):
+            return jsonify({"error": "interval_ms must be between 0.1 and 1000"}), 400
+        
+        if data.get('reset'):
+            profiler.reset()
+        if data.get('enabled') is True:
+            profiler.start(interval_ms / 1000 if interval_ms else None)
+        elif data.get('enabled') is False:
+            profiler.stop()
+        return jsonify(profiler.snapshot(0))
+    except Exception as e:
+        return server_error(e)
+
+@app.route('/api/admin/lifecycle', methods=['GET', 'POST'])
+def handle_lifecycle():
+    """Get the booking lifecycle job's status, or run it now"""
+    try:
+        if request.method == 'POST':
+            booking_lifecycle.run_once()
+        return jsonify(booking_lifecycle.snapshot())
+    except Exception as e:
+        return server_error(e)
+
+@app.route('/api/admin/partitions', methods=['GET'])
+def get_archive_partitions():
+    """Get the archive partitions with their check-out ranges and row counts"""
+    try:
+        return jsonify(archive_partitions.snapshot())
+    except Exception as e:
+        return server_error(e)
+
+@app.route('/api/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """Get hit, miss and eviction counters for the response caches and the idempotency store"""
+    try:
+        return jsonify({
+            "catalog": catalog_cache.stats(),
+            "availability": availability_cache.stats(),
+            "idempotency": idempotency_store.stats()
+        })
+    except Exception as e:
+        return server_error(e)
+
+@app.route('/api/stats', methods=['GET'])
+def get_stats():
+    """Get dashboard totals: hotels, rooms, active bookings, tonight's occupancy and revenue"""
+    try:
+        return jsonify(HotelBookingLogic.get_dashboard_stats())
+    except Exception as e:
+        return server_error(e)
+
+@app.route('/api/reports/occupancy', methods=['GET'])
+def get_occupancy_report():
+    """Get nights sold, revenue, cancellations and occupancy per day, hotel and/or room type"""
+    try:
+        report, error = HotelBookingLogic.get_occupancy_report(
+            request.args.get('start'),
+            request.args.get('end'),
+            request.args.get('hotel_id', type=int),
+            request.args.get('group_by', 'day')
+        )
+        if error:
+            return jsonify({"error": error}), 400
+        return jsonify(report)
+    except Exception as e:
+        return server_error(e)
 
 @app.route('/api/calculate-price', methods=['POST'])
 def calculate_price():
-    """Calculate price for a potential booking"""
+    """Calculate price for a potential booking, or for a list of stays in one batch"""
     try:
         data = request.get_json()
         
+        # Batch: a list (or {"stays": [...]}) of [room_id, check_in, check_out] or objects
+        stays = data if isinstance(data, list) else data.get('stays') if isinstance(data, dict) else None
+        if stays is not None:
+            if not isinstance(stays, list) or not stays:
+                return jsonify({"error": "stays must be a non-empty list"}), 400
+            if len(stays) > MAX_PRICE_QUOTES:
+                return jsonify({"error": f"At most {MAX_PRICE_QUOTES} stays per request"}), 400
+            try:
+                stays = [
+                    (stay['room_id'], stay['check_in'], stay['check_out']) if isinstance(stay, dict) else tuple(stay)
+                    for stay in stays
+                ]
+            except (KeyError, TypeError):
+                return jsonify({"error": "Each stay needs room_id, check_in and check_out"}), 400
+            if any(len(stay) != 3 for stay in stays):
+                return jsonify({"error": "Each stay needs room_id, check_in and check_out"}), 400
+            
+            quotes, error = HotelBookingLogic.calculate_prices(stays)
+            if error:
+                return jsonify({"error": error}), 400
+            return jsonify({"quotes": quotes})
+        
         required_fields = ['room_id', 'check_in', 'check_out']
         for field in required_fields:
             if field not in data:
@@ -191,7 +666,7 @@ def calculate_price():
         return jsonify({"total_price": total_price})
         
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return server_error(e)
 
 if __name__ == '__main__':
     app.run(debug=os.getenv('DEBUG', False), host='0.0.0.0', port=5001)
\ No newline at end of file
@@ -0,0 +1,148 @@
+"""Benchmark for HotelBookingLogic.get_available_rooms
+
+Seeds a throwaway SQLite database and compares the in-memory occupancy
+index and the set-based availability query against the previous per-room
+conflict lookup.
+
+Usage: python -m benchmarks.bench_availability [--rooms 10000] [--bookings 1000000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from flask import Flask
+from sqlalchemy import event, insert
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.db import db, Hotel, Room, Booking
+from src.logic import HotelBookingLogic
+from src.occupancy import occupancy_index
+
+def create_app(database_url):
+    """Create a bare Flask app bound to the benchmark database"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+def seed(num_hotels, num_rooms, num_bookings, chunk_size=50000):
+    """Bulk insert hotels, rooms and bookings spread over the next two years"""
+    rng = random.Random(42)
+    today = date.today()
+    
+    db.session.execute(insert(Hotel), [
+        {"id": i, "name": f"Hotel {i}", "location": f"City {i % 50}"}
+        for i in range(1, num_hotels + 1)
+    ])
+    db.session.execute(insert(Room), [
+        {
+            "id": i,
+            "hotel_id": (i - 1) % num_hotels + 1,
+            "room_number": str(i),
+            "room_type": rng.choice(["Single", "Double", "Suite"]),
+            "price_per_night": rng.choice([79.99, 129.99, 199.99, 299.99]),
+            "max_guests": rng.randint(1, 4),
+            "is_available": True,
+        }
+        for i in range(1, num_rooms + 1)
+    ])
+    db.session.commit()
+    
+    for start in range(0, num_bookings, chunk_size):
+        rows = []
+        for _ in range(min(chunk_size, num_bookings - start)):
+            check_in = today + timedelta(days=rng.randint(-365, 365))
+            rows.append({
+                "room_id": rng.randint(1, num_rooms),
+                "guest_name": "Guest",
+                "guest_email": f"guest{rng.randint(1, 100000)}@example.com",
+                "check_in_date": check_in,
+                "check_out_date": check_in + timedelta(days=rng.randint(1, 7)),
+                "total_price": 100.0,
+                "status": "confirmed" if rng.random() < 0.9 else "cancelled",
+            })
+        db.session.execute(insert(Booking), rows)
+        db.session.commit()
+
+def per_room_available_rooms(hotel_id, check_in_date, check_out_date, guests=1):
+    """The previous implementation: one conflict query per candidate room"""
+    rooms = Room.query.filter(
+        Room.hotel_id == hotel_id,
+        Room.is_available == True,
+        Room.max_guests >= guests
+    ).all()
+    
+    final_available_rooms = []
+    for room in rooms:
+        conflicting_booking = Booking.query.filter(
+            Booking.room_id == room.id,
+            Booking.status == 'confirmed',
+            HotelBookingLogic._overlaps(check_in_date, check_out_date)
+        ).first()
+        if not conflicting_booking:
+            final_available_rooms.append(room)
+    return final_available_rooms
+
+def measure(func, *args, repeat=3):
+    """Return (best wall time in ms, statements per call, result ids)"""
+    statements = []
+    
+    def count(*_):
+        statements.append(1)
+    
+    event.listen(db.engine, 'before_cursor_execute', count)
+    try:
+        best = None
+        for _ in range(repeat):
+            db.session.expire_all()
+            statements.clear()
+            started = time.perf_counter()
+            result = func(*args)
+            elapsed = (time.perf_counter() - started) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+    return best, len(statements), sorted(room.id for room in result)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--hotels', type=int, default=20)
+    parser.add_argument('--rooms', type=int, default=10000)
+    parser.add_argument('--bookings', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory(prefix='hotel-bench-') as workdir:
+        app = create_app(f"sqlite:///{os.path.join(workdir, 'bench.db')}")
+        
+        with app.app_context():
+            db.create_all()
+            started = time.perf_counter()
+            seed(args.hotels, args.rooms, args.bookings)
+            print(f"Seeded {args.rooms} rooms / {args.bookings} bookings in {time.perf_counter() - started:.1f}s")
+            
+            check_in = date.today() + timedelta(days=30)
+            check_out = check_in + timedelta(days=3)
+            
+            old_ms, old_statements, old_ids = measure(per_room_available_rooms, 1, check_in, check_out, 1, repeat=args.repeat)
+            sql_ms, sql_statements, sql_ids = measure(HotelBookingLogic._query_available_rooms, 1, check_in, check_out, 1, repeat=args.repeat)
+            
+            started = time.perf_counter()
+            occupancy_index.load()
+            print(f"Built occupancy index in {time.perf_counter() - started:.1f}s")
+            index_ms, index_statements, index_ids = measure(HotelBookingLogic.get_available_rooms, 1, check_in, check_out, 1, repeat=args.repeat)
+            
+            assert old_ids == sql_ids == index_ids, "availability results differ"
+            print(f"{'implementation':<16} {'statements':>10} {'best ms':>10} {'rooms':>7}")
+            print(f"{'per-room':<16} {old_statements:>10} {old_ms:>10.1f} {len(old_ids):>7}")
+            print(f"{'set-based':<16} {sql_statements:>10} {sql_ms:>10.1f} {len(sql_ids):>7}")
+            print(f"{'occupancy index':<16} {index_statements:>10} {index_ms:>10.1f} {len(index_ids):>7}")
+
+if __name__ == '__main__':
+    main()
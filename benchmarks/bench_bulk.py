@@ -0,0 +1,75 @@
+"""Benchmark for bulk booking creation
+
+Books a group reservation of N rooms once through a loop of
+HotelBookingLogic.create_booking calls and once through
+HotelBookingLogic.create_bookings_bulk, and reports bookings per second.
+
+Usage: python -m benchmarks.bench_bulk [--group-size 500] [--groups 5]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.db import db, upgrade_db
+from src.logic import HotelBookingLogic
+from benchmarks.bench_availability import create_app, seed
+
+def group(room_ids, check_in):
+    """A tour-operator group: one three-night stay per room"""
+    return [
+        {
+            "room_id": room_id,
+            "guest_name": f"Tour guest {room_id}",
+            "guest_email": "operator@example.com",
+            "check_in": check_in.isoformat(),
+            "check_out": (check_in + timedelta(days=3)).isoformat(),
+        }
+        for room_id in room_ids
+    ]
+
+def looped(items):
+    for item in items:
+        booking, error = HotelBookingLogic.create_booking(
+            item["room_id"], item["guest_name"], item["guest_email"], item["check_in"], item["check_out"]
+        )
+        assert booking, error
+
+def bulk(items):
+    results = HotelBookingLogic.create_bookings_bulk(items)
+    assert all(booking for booking, _ in results), results[0][1]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--group-size', type=int, default=500)
+    parser.add_argument('--groups', type=int, default=5)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory(prefix='hotel-bulk-') as workdir:
+        app = create_app(f"sqlite:///{os.path.join(workdir, 'bulk.db')}")
+        
+        with app.app_context():
+            db.create_all()
+            upgrade_db()
+            seed(num_hotels=1, num_rooms=args.group_size, num_bookings=0)
+            room_ids = list(range(1, args.group_size + 1))
+            
+            print(f"{'path':<8} {'bookings':>9} {'seconds':>9} {'bookings/s':>11}")
+            for name, func in (("looped", looped), ("bulk", bulk)):
+                total = 0.0
+                for g in range(args.groups):
+                    # Each group stays in its own week so groups never conflict
+                    check_in = date.today() + timedelta(days=7 * (g + 1) + (100 if name == "bulk" else 0))
+                    items = group(room_ids, check_in)
+                    started = time.perf_counter()
+                    func(items)
+                    total += time.perf_counter() - started
+                count = args.group_size * args.groups
+                print(f"{name:<8} {count:>9} {total:>9.2f} {count / total:>11.0f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""Microbenchmark for the batched pricing engine
+
+Seeds a throwaway SQLite database with rooms and prices random stays under a
+sample set of seasonal, weekday and length-of-stay rules three ways: the
+previous per-room path (load the room, then walk the nights in Python), a
+single HotelBookingLogic.calculate_prices call (what a batched
+POST /api/calculate-price runs), and PricingEngine.quote alone. Checks that
+all three agree to the cent and reports quotes per second.
+
+Usage: python -m benchmarks.bench_pricing [--rooms 10000] [--quotes 10000]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+SAMPLE_RULES = {
+    "seasons": {"6": 1.25, "7": 1.4, "8": 1.4, "12": 1.3, "1": 0.85, "2": 0.85},
+    "weekdays": {"4": 1.15, "5": 1.2},
+    "dates": {f"{date.today().year}-12-31": 2.0},
+    "length_of_stay": [[7, 0.9], [28, 0.75]],
+}
+
+def per_room_price(room_id, check_in_date, check_out_date):
+    """The per-room path: one room lookup, then each night priced in Python"""
+    from src.db import db, Room
+    room = db.session.get(Room, room_id)
+    if not room:
+        return None
+    total = 0.0
+    night = check_in_date
+    while night < check_out_date:
+        total += room.price_per_night * SAMPLE_RULES["seasons"].get(str(night.month), 1.0) * \
+            SAMPLE_RULES["weekdays"].get(str(night.weekday()), 1.0) * \
+            SAMPLE_RULES["dates"].get(night.isoformat(), 1.0)
+        night += timedelta(days=1)
+    nights = (check_out_date - check_in_date).days
+    for min_nights, multiplier in sorted(SAMPLE_RULES["length_of_stay"], reverse=True):
+        if nights >= min_nights:
+            total *= multiplier
+            break
+    return round(total, 2)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rooms', type=int, default=10000)
+    parser.add_argument('--quotes', type=int, default=10000)
+    parser.add_argument('--max-nights', type=int, default=30)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory(prefix='hotel-pricing-') as workdir:
+        rules_path = os.path.join(workdir, 'rules.json')
+        with open(rules_path, 'w') as rules_file:
+            json.dump(SAMPLE_RULES, rules_file)
+        # The engine reads its rules when src.pricing is first imported
+        os.environ['PRICING_RULES'] = rules_path
+        
+        from src.db import db, upgrade_db
+        from src.logic import HotelBookingLogic
+        from src.pricing import pricing_engine
+        from benchmarks.bench_availability import create_app, seed
+        
+        app = create_app(f"sqlite:///{os.path.join(workdir, 'pricing.db')}")
+        with app.app_context():
+            db.create_all()
+            upgrade_db()
+            seed(num_hotels=max(1, args.rooms // 500), num_rooms=args.rooms, num_bookings=0)
+            
+            rng = random.Random(7)
+            stays = []
+            for _ in range(args.quotes):
+                check_in = date.today() + timedelta(days=rng.randint(0, 540))
+                stays.append((rng.randint(1, args.rooms), check_in, check_in + timedelta(days=rng.randint(1, args.max_nights))))
+            requests = [(room_id, str(check_in), str(check_out)) for room_id, check_in, check_out in stays]
+            
+            # Warm up: base prices and the rate calendar are built on first use
+            pricing_engine.quote([1], [date.today()], [date.today() + timedelta(days=1)])
+            
+            started = time.perf_counter()
+            expected = [per_room_price(*stay) for stay in stays]
+            per_room = time.perf_counter() - started
+            db.session.remove()
+            
+            started = time.perf_counter()
+            results, error = HotelBookingLogic.calculate_prices(requests)
+            batched = time.perf_counter() - started
+            assert not error, error
+            
+            started = time.perf_counter()
+            totals, _ = pricing_engine.quote(
+                [stay[0] for stay in stays], [stay[1] for stay in stays], [stay[2] for stay in stays]
+            )
+            engine = time.perf_counter() - started
+            
+            mismatches = sum(
+                abs(result['total_price'] - price) > 0.011 or abs(total - price) > 0.011
+                for result, total, price in zip(results, totals.tolist(), expected)
+            )
+            
+            print(f"{'path':<24} {'quotes':>8} {'seconds':>9} {'quotes/s':>12}")
+            for name, seconds in (("per-room", per_room), ("calculate_prices", batched), ("PricingEngine.quote", engine)):
+                print(f"{name:<24} {args.quotes:>8} {seconds:>9.4f} {args.quotes / seconds:>12,.0f}")
+            print(f"{mismatches} quotes differ by more than a cent")
+            sys.exit(1 if mismatches else 0)
+
+if __name__ == '__main__':
+    main()
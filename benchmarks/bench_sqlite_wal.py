@@ -0,0 +1,122 @@
+"""Concurrent write throughput on SQLite with and without WAL
+
+Runs writer threads creating bookings alongside reader threads running the
+availability query for a fixed time, once with the previous connection
+settings (rollback journal, synchronous=FULL) and once with the defaults
+applied by configure_db (WAL, synchronous=NORMAL), and reports completed
+writes/reads per second and "database is locked" failures for each.
+
+Usage: python -m benchmarks.bench_sqlite_wal [--writers 8] [--readers 8] [--seconds 10]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import date, timedelta
+
+from flask import Flask
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.db import db, configure_db, upgrade_db
+from src.logic import HotelBookingLogic
+from src.occupancy import occupancy_index
+from benchmarks.bench_availability import seed
+
+PROFILES = {
+    'rollback journal': {'SQLITE_JOURNAL_MODE': 'DELETE', 'SQLITE_SYNCHRONOUS': 'FULL'},
+    'wal': {'SQLITE_JOURNAL_MODE': 'WAL', 'SQLITE_SYNCHRONOUS': 'NORMAL'},
+}
+
+def run_profile(name, settings, args, workdir):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(workdir, name.replace(' ', '_'))}.db"
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config.update(settings, SQLITE_BUSY_TIMEOUT=args.busy_timeout)
+    configure_db(app)
+    
+    with app.app_context():
+        db.create_all()
+        upgrade_db()
+        seed(num_hotels=args.hotels, num_rooms=args.rooms, num_bookings=args.bookings)
+        db.session.remove()
+    
+    outcomes = Counter()
+    outcomes_lock = threading.Lock()
+    start_barrier = threading.Barrier(args.writers + args.readers)
+    deadline = []
+    
+    def record(outcome):
+        with outcomes_lock:
+            outcomes[outcome] += 1
+    
+    def writer(worker_id):
+        rng = random.Random(worker_id)
+        with app.app_context():
+            start_barrier.wait()
+            while time.monotonic() < deadline[0]:
+                check_in = date.today() + timedelta(days=rng.randint(1, 365))
+                booking, error = HotelBookingLogic.create_booking(
+                    rng.randint(1, args.rooms), "WAL Bench", "wal@example.com",
+                    check_in, check_in + timedelta(days=rng.randint(1, 7))
+                )
+                if booking or error == "Room is not available for the selected dates":
+                    record('writes')
+                elif 'locked' in error:
+                    record('locked')
+                else:
+                    record('other errors')
+            db.session.remove()
+    
+    def reader(worker_id):
+        rng = random.Random(-worker_id)
+        with app.app_context():
+            start_barrier.wait()
+            while time.monotonic() < deadline[0]:
+                check_in = date.today() + timedelta(days=rng.randint(1, 365))
+                try:
+                    HotelBookingLogic._query_available_rooms(
+                        rng.randint(1, args.hotels), check_in, check_in + timedelta(days=3), 1
+                    )
+                    record('reads')
+                except Exception as e:
+                    db.session.rollback()
+                    record('locked' if 'locked' in str(e) else 'other errors')
+            db.session.remove()
+    
+    deadline.append(time.monotonic() + args.seconds)
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(args.writers)]
+    threads += [threading.Thread(target=reader, args=(i,)) for i in range(args.readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    print(f"{name:<17} {outcomes['writes'] / args.seconds:>8.1f} writes/s  {outcomes['reads'] / args.seconds:>8.1f} reads/s  "
+          f"{outcomes['locked']:>5} locked  {outcomes['other errors']:>5} other errors")
+    return outcomes
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--hotels', type=int, default=20)
+    parser.add_argument('--rooms', type=int, default=1000)
+    parser.add_argument('--bookings', type=int, default=100000)
+    parser.add_argument('--busy-timeout', type=int, default=5000, help="SQLITE_BUSY_TIMEOUT in ms for both runs")
+    args = parser.parse_args()
+    
+    # Every write should reach SQLite rather than be rejected from memory
+    occupancy_index.enabled = False
+    
+    with tempfile.TemporaryDirectory(prefix='hotel-wal-') as workdir:
+        for name, settings in PROFILES.items():
+            run_profile(name, settings, args, workdir)
+
+if __name__ == '__main__':
+    main()
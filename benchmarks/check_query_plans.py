@@ -0,0 +1,85 @@
+"""EXPLAIN QUERY PLAN check for the hot HotelBookingLogic queries
+
+Runs each hot query against a small seeded SQLite database, captures the
+SQL it emits and fails (exit status 1) if any plan falls back to a full
+table scan instead of an index search.
+
+Usage: python -m benchmarks.check_query_plans
+"""
+import os
+import sys
+import tempfile
+from datetime import date, timedelta
+
+from sqlalchemy import event
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.db import db, upgrade_db
+from src.logic import HotelBookingLogic
+from benchmarks.bench_availability import create_app, seed
+
+def capture_statements(func, *args):
+    """Call func and return the (statement, parameters) pairs it executed"""
+    statements = []
+    
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+    
+    event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        func(*args)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', capture)
+        db.session.rollback()
+    return statements
+
+def full_scans(statement, parameters):
+    """Return the plan lines of a statement that scan a whole table"""
+    connection = db.session.connection().connection.driver_connection
+    plan = connection.execute(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+    # "SCAN t USING INDEX" is an ordered index walk (e.g. keyset pagination
+    # with LIMIT), only a bare "SCAN t" reads the whole table
+    return [row[-1] for row in plan if row[-1].startswith('SCAN') and 'USING' not in row[-1]]
+
+def main():
+    check_in = date.today() + timedelta(days=30)
+    check_out = check_in + timedelta(days=3)
+    hot_queries = {
+        "get_available_rooms": (HotelBookingLogic.get_available_rooms, 1, check_in, check_out, 2),
+        "_query_available_rooms": (HotelBookingLogic._query_available_rooms, 1, check_in, check_out, 2),
+        "get_rooms_by_hotel": (HotelBookingLogic.get_rooms_by_hotel, 1),
+        "search_available_rooms": (HotelBookingLogic.search_available_rooms, check_in, check_out, 2),
+        "get_bookings_by_email": (HotelBookingLogic.get_bookings_by_email, "guest1@example.com"),
+        "create_booking": (HotelBookingLogic.create_booking, 1, "Guest", "guest1@example.com", check_in, check_out),
+    }
+    
+    failures = 0
+    with tempfile.TemporaryDirectory(prefix='hotel-plans-') as workdir:
+        app = create_app(f"sqlite:///{os.path.join(workdir, 'plans.db')}")
+        
+        with app.app_context():
+            db.create_all()
+            upgrade_db()
+            seed(num_hotels=5, num_rooms=500, num_bookings=20000)
+            # Let the planner see realistic table statistics
+            db.session.execute(db.text('ANALYZE'))
+            db.session.commit()
+            
+            for name, (func, *args) in hot_queries.items():
+                for statement, parameters in capture_statements(func, *args):
+                    if not statement.lstrip().upper().startswith('SELECT'):
+                        continue
+                    scans = full_scans(statement, parameters)
+                    status = "FAIL" if scans else "ok"
+                    print(f"{status:<5} {name}: {' '.join(statement.split())[:100]}")
+                    for scan in scans:
+                        print(f"      {scan}")
+                    failures += bool(scans)
+    
+    if failures:
+        print(f"{failures} hot queries fall back to a full table scan")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
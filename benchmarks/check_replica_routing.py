@@ -0,0 +1,105 @@
+"""Read-replica routing check with two SQLite files
+
+Builds a primary database, snapshots it into a second file that plays the
+replica (no further replication, so writes never reach it), starts the API
+with DATABASE_REPLICA_URLS pointing at the copy, and counts the statements
+each engine runs per request. Exits with status 1 if reads do not go to the
+replica, writes do not go to the primary, or a guest does not see their own
+booking within the read-your-writes window.
+
+Usage: python -m benchmarks.check_replica_routing
+"""
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import date, timedelta
+
+from sqlalchemy import event
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+WINDOW_SECONDS = 1.0
+
+def main():
+    with tempfile.TemporaryDirectory(prefix='hotel-replica-') as workdir:
+        primary_path = os.path.join(workdir, 'primary.db')
+        replica_path = os.path.join(workdir, 'replica.db')
+        
+        # Seed the primary in a child interpreter so this process starts clean
+        os.environ.update(
+            DATABASE_URL=f"sqlite:///{primary_path}",
+            CATALOG_CACHE_TTL='0',
+            AVAILABILITY_CACHE_TTL='0',
+            REPLICA_READ_YOUR_WRITES_SECONDS=str(WINDOW_SECONDS),
+            # The background lifecycle job would add its statements to the routing counts
+            LIFECYCLE_ENABLED='0',
+        )
+        if subprocess.run([sys.executable, '-c', 'import api.main'], cwd=ROOT).returncode != 0:
+            sys.exit("Could not create the primary database")
+        with sqlite3.connect(primary_path) as source, sqlite3.connect(replica_path) as target:
+            source.backup(target)
+        os.environ['DATABASE_REPLICA_URLS'] = f"sqlite:///{replica_path}"
+        
+        from api.main import app
+        from src.db import db
+        
+        statements = Counter()
+        with app.app_context():
+            for key, engine in db.engines.items():
+                name = 'primary' if key is None else 'replica'
+                event.listen(engine, 'before_cursor_execute',
+                             lambda *args, name=name: statements.update([name]))
+        
+        client = app.test_client()
+        failures = 0
+        
+        def check(description, method, url, expect, **kwargs):
+            nonlocal failures
+            statements.clear()
+            response = getattr(client, method)(url, **kwargs)
+            routed = 'primary' if statements['primary'] and not statements['replica'] else \
+                'replica' if statements['replica'] and not statements['primary'] else \
+                'both' if statements else 'none'
+            ok = routed == expect['routed'] and response.status_code == expect['status'] and \
+                ('count' not in expect or len(response.get_json()['bookings']) == expect['count'])
+            failures += not ok
+            print(f"{'ok' if ok else 'FAIL':<5} {description:<42} -> {routed:<8} {response.status_code}")
+            return response
+        
+        check_in = date.today() + timedelta(days=30)
+        email = 'replica-check@example.com'
+        stay = f"check_in={check_in}&check_out={check_in + timedelta(days=2)}"
+        
+        check("list hotels", 'get', '/api/hotels', {'routed': 'replica', 'status': 200})
+        check("hotel rooms", 'get', '/api/hotels/1/rooms', {'routed': 'replica', 'status': 200})
+        check("available rooms", 'get', f'/api/hotels/1/available-rooms?{stay}', {'routed': 'replica', 'status': 200})
+        booking = check("create booking", 'post', '/api/bookings', {'routed': 'primary', 'status': 201}, json={
+            "room_id": 1,
+            "guest_name": "Replica Check",
+            "guest_email": email,
+            "check_in": str(check_in),
+            "check_out": str(check_in + timedelta(days=2)),
+        }).get_json()
+        check("guest bookings right after booking", 'get', f'/api/bookings/guest/{email.upper()}',
+              {'routed': 'primary', 'status': 200, 'count': 1})
+        check("new booking by ID (replica miss)", 'get', f"/api/bookings/{booking['id']}",
+              {'routed': 'both', 'status': 200})
+        
+        time.sleep(WINDOW_SECONDS + 0.1)
+        # The replica never received the booking, so after the window it is not listed
+        check("guest bookings after the window", 'get', f'/api/bookings/guest/{email.upper()}',
+              {'routed': 'replica', 'status': 200, 'count': 0})
+        check("cancel booking", 'delete', f"/api/bookings/{booking['id']}", {'routed': 'primary', 'status': 200})
+        
+        if failures:
+            print(f"{failures} routing checks failed")
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""SQL statement budget check for the read endpoints
+
+Serves each endpoint through the Flask test client against a seeded
+SQLite database, counts the SQL statements it executes and fails (exit
+status 1) if any endpoint exceeds its budget, e.g. because a serializer
+started lazy-loading relationships row by row.
+
+Usage: python -m benchmarks.check_statement_counts
+"""
+import os
+import sys
+import tempfile
+from datetime import date, timedelta
+
+from sqlalchemy import event
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+CHECK_IN = date.today() + timedelta(days=30)
+CHECK_OUT = CHECK_IN + timedelta(days=3)
+DATES = f"check_in={CHECK_IN}&check_out={CHECK_OUT}"
+
+# endpoint -> maximum number of SQL statements per request
+BUDGETS = {
+    "/api/hotels": 1,
+    "/api/hotels?expand=rooms": 2,
+    "/api/hotels/1": 1,
+    "/api/hotels/1?expand=rooms": 2,
+    "/api/hotels/1/rooms": 1,
+    "/api/hotels/1/rooms?expand=hotel": 1,
+    "/api/rooms/1": 1,
+    "/api/rooms/1?expand=hotel": 1,
+    f"/api/hotels/1/available-rooms?{DATES}": 1,
+    f"/api/hotels/1/available-rooms?{DATES}&expand=hotel": 1,
+    f"/api/search?{DATES}": 1,
+    f"/api/search?{DATES}&expand=hotel": 1,
+    "/api/bookings": 1,
+    "/api/bookings?status=confirmed&hotel_id=1&limit=5": 1,
+    "/api/bookings?expand=room": 1,
+    "/api/bookings?expand=room,hotel": 1,
+    "/api/bookings/1?expand=room,hotel": 1,
+    # Live bookings, then the archive: a short history may continue there
+    "/api/bookings/guest/guest@example.com": 2,
+    "/api/bookings/guest/guest@example.com?expand=room,hotel": 2,
+}
+
+def main():
+    with tempfile.TemporaryDirectory(prefix='hotel-statements-') as workdir:
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'statements.db')}"
+        # The background lifecycle job would add its statements to the counts
+        os.environ['LIFECYCLE_ENABLED'] = '0'
+        from api.main import app
+        from src.db import db
+        from src.logic import HotelBookingLogic
+        
+        with app.app_context():
+            # A few bookings spread over every sample room
+            for room_id in range(1, 10):
+                for week in range(3):
+                    check_in = date.today() + timedelta(days=7 * week + 1)
+                    HotelBookingLogic.create_booking(room_id, "Guest", "guest@example.com", check_in, check_in + timedelta(days=2))
+            engine = db.engine
+        
+        statements = []
+        event.listen(engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+        
+        client = app.test_client()
+        failures = 0
+        for endpoint, budget in BUDGETS.items():
+            statements.clear()
+            response = client.get(endpoint)
+            count = len(statements)
+            ok = response.status_code == 200 and count <= budget
+            print(f"{'ok' if ok else 'FAIL':<5} {count:>3}/{budget:<3} {response.status_code} {endpoint}")
+            failures += not ok
+    
+    if failures:
+        print(f"{failures} endpoints exceed their SQL statement budget")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+"""Synthetic benchmark dataset: hotels, rooms and years of booking history
+
+Every room gets a back-to-back history of non-overlapping stays from
+--years ago until --future-days ahead, with gaps sized so that about
+--occupancy of the nights are sold and a share of the stays cancelled.
+Guests are drawn from a fixed pool so "my bookings" lookups return several
+rows. Rows are written with chunked executemany INSERTs instead of one
+db.session.add per row, then the daily rollup is built.
+
+The same --seed always produces the same database.
+
+Usage: python -m benchmarks.dataset PATH.db [--hotels 50] [--rooms 2000] [--years 2] [--occupancy 0.65]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import insert
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.db import db, upgrade_db, Hotel, Room, Booking
+from src import rollups
+from benchmarks.bench_availability import create_app
+
+CITIES = [
+    "New York, NY", "Miami, FL", "Denver, CO", "Chicago, IL", "Austin, TX", "Seattle, WA",
+    "Boston, MA", "San Diego, CA", "Nashville, TN", "Portland, OR", "Phoenix, AZ", "Savannah, GA",
+]
+
+# (room type, nightly price range, max guests, share of rooms)
+ROOM_TYPES = [
+    ("Single", (69, 129), 1, 0.3),
+    ("Double", (109, 219), 2, 0.45),
+    ("Suite", (219, 499), 4, 0.2),
+    ("Penthouse", (599, 1499), 6, 0.05),
+]
+
+CANCELLED_SHARE = 0.08
+
+def generate_hotels(num_hotels):
+    return [
+        {
+            "id": i,
+            "name": f"Benchmark Hotel {i}",
+            "location": CITIES[(i - 1) % len(CITIES)],
+            "description": f"Synthetic hotel {i}",
+        }
+        for i in range(1, num_hotels + 1)
+    ]
+
+def generate_rooms(rng, num_hotels, num_rooms):
+    weights = [share for _, _, _, share in ROOM_TYPES]
+    rooms = []
+    for i in range(1, num_rooms + 1):
+        room_type, (low, high), max_guests, _ = rng.choices(ROOM_TYPES, weights)[0]
+        hotel_id = (i - 1) % num_hotels + 1
+        rooms.append({
+            "id": i,
+            "hotel_id": hotel_id,
+            "room_number": str(100 * (1 + (i - 1) // num_hotels // 50) + (i - 1) // num_hotels % 50 + 1),
+            "room_type": room_type,
+            "price_per_night": round(rng.uniform(low, high), 2),
+            "max_guests": max_guests,
+            "is_available": True,
+        })
+    return rooms
+
+def generate_bookings(rng, rooms, years, occupancy, future_days, num_guests):
+    """Yield booking rows room by room; stays of one room never overlap"""
+    today = date.today()
+    first_night = today - timedelta(days=round(365 * years))
+    last_night = today + timedelta(days=future_days)
+    mean_stay = 3.5
+    # Average gap between stays that leaves `occupancy` of the nights sold
+    mean_gap = mean_stay * (1 - occupancy) / occupancy
+    
+    for room in rooms:
+        night = first_night + timedelta(days=rng.randint(0, 14))
+        while night < last_night:
+            nights = min(rng.choice((1, 1, 2, 2, 3, 3, 4, 5, 7, 7)), 14)
+            guest = rng.randint(1, num_guests)
+            yield {
+                "room_id": room["id"],
+                "guest_name": f"Guest {guest}",
+                "guest_email": f"guest{guest}@example.com",
+                "check_in_date": night,
+                "check_out_date": night + timedelta(days=nights),
+                "total_price": round(room["price_per_night"] * nights, 2),
+                "status": "cancelled" if rng.random() < CANCELLED_SHARE else "confirmed",
+            }
+            night += timedelta(days=nights + round(rng.expovariate(1 / mean_gap)) if mean_gap else nights)
+
+def seed_dataset(num_hotels=50, num_rooms=2000, years=2, occupancy=0.65, future_days=180,
+                 num_guests=None, seed=42, chunk_size=20000, progress=None):
+    """Bulk insert the dataset into the current app's database; returns row counts and timings"""
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    
+    db.session.execute(insert(Hotel), generate_hotels(num_hotels))
+    rooms = generate_rooms(rng, num_hotels, num_rooms)
+    db.session.execute(insert(Room), rooms)
+    db.session.commit()
+    
+    bookings = 0
+    chunk = []
+    for row in generate_bookings(rng, rooms, years, occupancy, future_days, num_guests or num_rooms * 5):
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            db.session.execute(insert(Booking), chunk)
+            db.session.commit()
+            bookings += len(chunk)
+            chunk = []
+            if progress:
+                progress(bookings, time.perf_counter() - started)
+    if chunk:
+        db.session.execute(insert(Booking), chunk)
+        db.session.commit()
+        bookings += len(chunk)
+    insert_seconds = time.perf_counter() - started
+    
+    db.session.remove()
+    rollups.backfill()
+    return {
+        "hotels": num_hotels,
+        "rooms": num_rooms,
+        "bookings": bookings,
+        "insert_seconds": round(insert_seconds, 2),
+        "rows_per_sec": round((num_hotels + num_rooms + bookings) / insert_seconds),
+        "total_seconds": round(time.perf_counter() - started, 2),
+    }
+
+def create_database(path, **params):
+    """Create a SQLite file at path holding a freshly seeded dataset"""
+    app = create_app(f"sqlite:///{os.path.abspath(path)}")
+    with app.app_context():
+        db.create_all()
+        upgrade_db()
+        summary = seed_dataset(**params)
+        db.session.remove()
+    return summary
+
+def add_dataset_arguments(parser):
+    parser.add_argument('--hotels', type=int, default=50)
+    parser.add_argument('--rooms', type=int, default=2000)
+    parser.add_argument('--years', type=float, default=2, help="years of booking history before today")
+    parser.add_argument('--occupancy', type=float, default=0.65, help="share of room-nights booked")
+    parser.add_argument('--future-days', type=int, default=180, help="how far ahead rooms are already booked")
+    parser.add_argument('--seed', type=int, default=42)
+
+def dataset_params(args):
+    return {
+        "num_hotels": args.hotels,
+        "num_rooms": args.rooms,
+        "years": args.years,
+        "occupancy": args.occupancy,
+        "future_days": args.future_days,
+        "seed": args.seed,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('path', help="SQLite file to create")
+    add_dataset_arguments(parser)
+    args = parser.parse_args()
+    
+    if os.path.exists(args.path):
+        sys.exit(f"{args.path} already exists")
+    
+    def progress(bookings, seconds):
+        print(f"  {bookings:>10,} bookings  {bookings / seconds:>10,.0f} rows/s", file=sys.stderr)
+    
+    summary = create_database(args.path, progress=progress, **dataset_params(args))
+    print(json.dumps(summary, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+"""Load test comparing the Flask and ASGI servers
+
+Seeds a throwaway SQLite database, starts api/main.py (Flask's threaded
+server) and api/asgi.py (uvicorn) against separate copies of it, and drives
+the availability and booking endpoints with concurrent clients. Reports
+requests/sec and latency percentiles per server and endpoint, then checks
+that neither server double booked a room.
+
+Response caches are disabled unless --cache is given, so the numbers measure
+the database path rather than cache hits.
+
+Usage: python -m benchmarks.load_test [--requests 2000] [--concurrency 50] [--json results.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import date, timedelta
+
+import httpx
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.db import db, upgrade_db
+from benchmarks.bench_availability import create_app, seed
+from benchmarks.stress_booking import find_overlaps
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+SERVERS = {
+    'flask': lambda port: [
+        sys.executable, '-c',
+        f"from api.main import app; app.run(host='127.0.0.1', port={port}, threaded=True)"
+    ],
+    'asgi': lambda port: [
+        sys.executable, '-m', 'uvicorn', 'api.asgi:app', '--host', '127.0.0.1', '--port', str(port), '--log-level', 'warning'
+    ],
+}
+
+def availability_request(rng, args):
+    check_in = date.today() + timedelta(days=rng.randint(1, 365))
+    check_out = check_in + timedelta(days=rng.randint(1, 7))
+    hotel_id = rng.randint(1, args.hotels)
+    return 'GET', f"/api/hotels/{hotel_id}/available-rooms?check_in={check_in}&check_out={check_out}&guests={rng.randint(1, 2)}", None
+
+def booking_request(rng, args):
+    check_in = date.today() + timedelta(days=rng.randint(1, 365))
+    return 'POST', '/api/bookings', {
+        "room_id": rng.randint(1, args.rooms),
+        "guest_name": "Load Test",
+        "guest_email": f"load{rng.randint(1, 1000)}@example.com",
+        "check_in": str(check_in),
+        "check_out": str(check_in + timedelta(days=rng.randint(1, 7))),
+    }
+
+ENDPOINTS = {
+    'availability': availability_request,
+    'booking': booking_request,
+}
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))]
+
+async def drive(base_url, make_request, args):
+    """Send args.requests requests from args.concurrency concurrent clients"""
+    latencies = []
+    statuses = Counter()
+    remaining = iter(range(args.requests))
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+        async def client_loop(client_id):
+            rng = random.Random(client_id)
+            for _ in remaining:
+                method, url, body = make_request(rng, args)
+                start = time.perf_counter()
+                response = await client.request(method, url, json=body)
+                latencies.append(time.perf_counter() - start)
+                statuses[response.status_code] += 1
+        
+        start = time.perf_counter()
+        await asyncio.gather(*(client_loop(i) for i in range(args.concurrency)))
+        elapsed = time.perf_counter() - start
+    
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "requests_per_sec": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2),
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+    }
+
+def wait_until_ready(base_url, process, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with status {process.returncode}")
+        try:
+            if httpx.get(f"{base_url}/api/hotels", timeout=2).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} did not start within {timeout}s")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--hotels', type=int, default=20)
+    parser.add_argument('--rooms', type=int, default=1000)
+    parser.add_argument('--bookings', type=int, default=100000)
+    parser.add_argument('--servers', default='flask,asgi')
+    parser.add_argument('--endpoints', default='availability,booking')
+    parser.add_argument('--port', type=int, default=5100)
+    parser.add_argument('--cache', action='store_true', help="keep the response caches enabled")
+    parser.add_argument('--json', help="also write the results to this file")
+    args = parser.parse_args()
+    
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='hotel-load-') as workdir:
+        template = os.path.join(workdir, 'template.db')
+        app = create_app(f"sqlite:///{template}")
+        with app.app_context():
+            db.create_all()
+            upgrade_db()
+            print(f"Seeding {args.hotels} hotels, {args.rooms} rooms, {args.bookings} bookings...")
+            seed(num_hotels=args.hotels, num_rooms=args.rooms, num_bookings=args.bookings)
+            # Randomly seeded stays may already overlap; only new overlaps count
+            seeded_overlaps = len(find_overlaps())
+            db.session.remove()
+        
+        for offset, name in enumerate(args.servers.split(',')):
+            database = os.path.join(workdir, f"{name}.db")
+            shutil.copy(template, database)
+            port = args.port + offset
+            base_url = f"http://127.0.0.1:{port}"
+            env = dict(os.environ, DATABASE_URL=f"sqlite:///{database}")
+            if not args.cache:
+                env.update(CATALOG_CACHE_TTL='0', AVAILABILITY_CACHE_TTL='0')
+            
+            process = subprocess.Popen(
+                SERVERS[name](port), cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+            try:
+                wait_until_ready(base_url, process)
+                for endpoint in args.endpoints.split(','):
+                    summary = asyncio.run(drive(base_url, ENDPOINTS[endpoint], args))
+                    results.setdefault(name, {})[endpoint] = summary
+                    print(f"{name:<6} {endpoint:<13} {summary['requests_per_sec']:>8} req/s  "
+                          f"p50 {summary['p50_ms']:>8} ms  p99 {summary['p99_ms']:>8} ms  {summary['statuses']}")
+            finally:
+                process.terminate()
+                process.wait()
+            
+            check_app = create_app(f"sqlite:///{database}")
+            with check_app.app_context():
+                overlaps = len(find_overlaps()) - seeded_overlaps
+                db.session.remove()
+            results[name]["overlapping_bookings"] = overlaps
+            if overlaps:
+                print(f"{name}: {overlaps} new overlapping confirmed bookings")
+    
+    if args.json:
+        with open(args.json, 'w') as output:
+            json.dump(results, output, indent=2)
+    
+    sys.exit(1 if any(result["overlapping_bookings"] for result in results.values()) else 0)
+
+if __name__ == '__main__':
+    main()
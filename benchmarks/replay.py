@@ -0,0 +1,282 @@
+"""Replay a realistic traffic mix against the API and report JSON percentiles
+
+Seeds a synthetic dataset (see benchmarks.dataset; --database keeps it
+between runs), starts api/main.py on a copy of it, or targets a running
+server with --url, and sends search, availability, quote, book and cancel
+requests in the proportions of --mix from --concurrency clients. Cancels
+target bookings made earlier in the same run.
+
+The report holds the commit, parameters, overall and per-operation
+throughput and p50/p90/p99 latencies, and the status codes seen. With
+--baseline it is compared with an earlier report and the exit status is 1
+if throughput dropped or p99 latency grew by more than --tolerance.
+
+Usage: python -m benchmarks.replay [--requests 5000] [--concurrency 32]
+       [--mix search=35,availability=20,quote=25,book=15,cancel=5]
+       [--database bench.db] [--output report.json] [--baseline previous.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta
+
+import httpx
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from benchmarks.dataset import add_dataset_arguments, dataset_params, create_database
+from benchmarks.load_test import SERVERS, ROOT, percentile, wait_until_ready
+
+DEFAULT_MIX = "search=35,availability=20,quote=25,book=15,cancel=5"
+
+class Traffic:
+    """Request generators for each operation, sharing what the run has learned"""
+    
+    def __init__(self, hotels, rooms):
+        self.hotel_ids = [hotel['id'] for hotel in hotels]
+        self.locations = sorted({hotel['location'] for hotel in hotels})
+        self.rooms = rooms
+        # Bookings made by this run, available for cancel requests
+        self.created = []
+    
+    @staticmethod
+    def stay(rng, max_nights=7):
+        check_in = date.today() + timedelta(days=rng.randint(1, 240))
+        return check_in, check_in + timedelta(days=rng.randint(1, max_nights))
+    
+    def search(self, rng):
+        check_in, check_out = self.stay(rng)
+        params = f"check_in={check_in}&check_out={check_out}&guests={rng.randint(1, 4)}&limit=20"
+        if rng.random() < 0.6:
+            params += f"&location={self.locations[rng.randrange(len(self.locations))]}"
+        if rng.random() < 0.3:
+            params += f"&max_price={rng.choice((150, 250, 400))}"
+        return 'GET', f"/api/search?{params}", None
+    
+    def availability(self, rng):
+        check_in, check_out = self.stay(rng)
+        hotel_id = rng.choice(self.hotel_ids)
+        return 'GET', f"/api/hotels/{hotel_id}/available-rooms?check_in={check_in}&check_out={check_out}&guests={rng.randint(1, 2)}", None
+    
+    def quote(self, rng):
+        # Like the availability page: one stay priced for a page of rooms
+        check_in, check_out = self.stay(rng)
+        stays = [[rng.randint(1, self.rooms), str(check_in), str(check_out)] for _ in range(rng.randint(1, 20))]
+        return 'POST', '/api/calculate-price', {"stays": stays}
+    
+    def book(self, rng):
+        check_in, check_out = self.stay(rng, max_nights=5)
+        guest = rng.randint(1, 5000)
+        return 'POST', '/api/bookings', {
+            "room_id": rng.randint(1, self.rooms),
+            "guest_name": f"Replay Guest {guest}",
+            "guest_email": f"replay{guest}@example.com",
+            "check_in": str(check_in),
+            "check_out": str(check_out),
+        }
+    
+    def cancel(self, rng):
+        if not self.created:
+            return None
+        return 'DELETE', f"/api/bookings/{self.created.pop(rng.randrange(len(self.created)))}", None
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if name.strip() not in ('search', 'availability', 'quote', 'book', 'cancel'):
+            raise argparse.ArgumentTypeError(f"Unknown operation: {name}")
+        mix[name.strip()] = float(weight)
+    return mix
+
+def summarize(latencies, statuses, errors, seconds):
+    latencies = sorted(latencies)
+    if not latencies:
+        return {"requests": 0, "errors": errors}
+    return {
+        "requests": len(latencies),
+        "requests_per_sec": round(len(latencies) / seconds, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p90_ms": round(percentile(latencies, 0.90) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2),
+        "errors": errors,
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+    }
+
+async def replay(base_url, traffic, mix, args):
+    """Send args.warmup unrecorded then args.requests recorded requests; returns the report sections"""
+    names, weights = list(mix), list(mix.values())
+    latencies = defaultdict(list)
+    statuses = defaultdict(Counter)
+    errors = Counter()
+    remaining = iter(range(args.warmup + args.requests))
+    recorded_from = [None]
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+        async def client_loop(client_id):
+            rng = random.Random(args.seed * 1000 + client_id)
+            for sequence in remaining:
+                name = rng.choices(names, weights)[0]
+                request = getattr(traffic, name)(rng)
+                if request is None:
+                    # Nothing to cancel yet
+                    name, request = 'book', traffic.book(rng)
+                method, url, body = request
+                if sequence == args.warmup:
+                    recorded_from[0] = time.perf_counter()
+                record = sequence >= args.warmup
+                
+                start = time.perf_counter()
+                try:
+                    response = await client.request(method, url, json=body)
+                except httpx.HTTPError:
+                    if record:
+                        errors[name] += 1
+                    continue
+                elapsed = time.perf_counter() - start
+                
+                if name == 'book' and response.status_code == 201:
+                    traffic.created.append(response.json()['id'])
+                if record:
+                    latencies[name].append(elapsed)
+                    statuses[name][response.status_code] += 1
+                    if response.status_code >= 500:
+                        errors[name] += 1
+        
+        await asyncio.gather(*(client_loop(i) for i in range(args.concurrency)))
+        seconds = time.perf_counter() - (recorded_from[0] or time.perf_counter())
+    
+    operations = {
+        name: summarize(latencies[name], statuses[name], errors[name], seconds)
+        for name in names if latencies[name] or errors[name]
+    }
+    overall = summarize(
+        [value for values in latencies.values() for value in values],
+        sum(statuses.values(), Counter()), sum(errors.values()), seconds
+    )
+    overall["seconds"] = round(seconds, 2)
+    return overall, operations
+
+def git_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                               capture_output=True, text=True).stdout.strip()
+        return commit + ('-dirty' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(report, baseline, tolerance):
+    """Regressions of report against baseline, as printable lines"""
+    regressions = []
+    sections = [("overall", report["overall"], baseline.get("overall", {}))]
+    sections += [
+        (name, section, baseline.get("operations", {}).get(name, {}))
+        for name, section in report["operations"].items()
+    ]
+    print(f"{'operation':<14} {'req/s':>9} {'base':>9} {'p99 ms':>9} {'base':>9}")
+    for name, current, previous in sections:
+        if not previous.get("requests") or not current.get("requests"):
+            continue
+        print(f"{name:<14} {current['requests_per_sec']:>9} {previous['requests_per_sec']:>9} "
+              f"{current['p99_ms']:>9} {previous['p99_ms']:>9}")
+        if current["requests_per_sec"] < previous["requests_per_sec"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {previous['requests_per_sec']} -> {current['requests_per_sec']} req/s")
+        if current["p99_ms"] > previous["p99_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p99 {previous['p99_ms']} -> {current['p99_ms']} ms")
+    return regressions
+
+def run(base_url, args, mix):
+    catalog = httpx.get(f"{base_url}/api/hotels", timeout=60).json()
+    stats = httpx.get(f"{base_url}/api/stats", timeout=60).json()
+    traffic = Traffic(catalog, stats['rooms'])
+    return asyncio.run(replay(base_url, traffic, mix, args)), stats
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--warmup', type=int, default=200, help="requests sent before recording starts")
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX))
+    parser.add_argument('--server', choices=sorted(SERVERS), default='flask')
+    parser.add_argument('--url', help="replay against this running server instead of starting one")
+    parser.add_argument('--database', help="seeded SQLite file to reuse, created if missing")
+    parser.add_argument('--port', type=int, default=5200)
+    parser.add_argument('--no-cache', action='store_true', help="disable the response caches")
+    parser.add_argument('--output', help="write the JSON report here instead of stdout")
+    parser.add_argument('--baseline', help="earlier report to compare with")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="allowed relative regression")
+    add_dataset_arguments(parser)
+    args = parser.parse_args()
+    
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec='seconds'),
+        "server": args.url or args.server,
+        "concurrency": args.concurrency,
+        "mix": args.mix,
+        "cache": not args.no_cache,
+        "seed": args.seed,
+    }
+    
+    if args.url:
+        (overall, operations), stats = run(args.url.rstrip('/'), args, args.mix)
+    else:
+        with tempfile.TemporaryDirectory(prefix='hotel-replay-') as workdir:
+            template = args.database or os.path.join(workdir, 'template.db')
+            if not os.path.exists(template):
+                print(f"Seeding {template}...", file=sys.stderr)
+                summary = create_database(template, **dataset_params(args))
+                print(f"Seeded {summary['bookings']:,} bookings at {summary['rows_per_sec']:,} rows/s", file=sys.stderr)
+            # Run on a copy so every run starts from the same data
+            database = os.path.join(workdir, 'replay.db')
+            shutil.copy(template, database)
+            
+            port = args.port
+            env = dict(os.environ, DATABASE_URL=f"sqlite:///{database}")
+            if args.no_cache:
+                env.update(CATALOG_CACHE_TTL='0', AVAILABILITY_CACHE_TTL='0')
+            process = subprocess.Popen(
+                SERVERS[args.server](port), cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+            try:
+                base_url = f"http://127.0.0.1:{port}"
+                wait_until_ready(base_url, process, timeout=600)
+                (overall, operations), stats = run(base_url, args, args.mix)
+            finally:
+                process.terminate()
+                process.wait()
+    
+    report["dataset"] = {key: stats[key] for key in ('hotels', 'rooms', 'active_bookings')}
+    report["overall"] = overall
+    report["operations"] = operations
+    
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write(output + '\n')
+    else:
+        print(output)
+    print(f"{overall['requests']} requests in {overall['seconds']}s: {overall['requests_per_sec']} req/s, "
+          f"p50 {overall['p50_ms']} ms, p99 {overall['p99_ms']} ms, {overall['errors']} errors", file=sys.stderr)
+    
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = compare(report, json.load(baseline_file), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
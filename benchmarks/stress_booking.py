@@ -0,0 +1,91 @@
+"""Concurrent booking stress test
+
+Fires overlapping create_booking calls for a handful of rooms from many
+threads and fails (exit status 1) if any room ends up with two confirmed
+bookings whose stays overlap.
+
+Usage: python -m benchmarks.stress_booking [--threads 32] [--requests 2000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import date, timedelta
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.db import db, Booking, upgrade_db
+from src.logic import HotelBookingLogic
+from benchmarks.bench_availability import create_app, seed
+
+def find_overlaps():
+    """Return pairs of confirmed bookings for the same room with overlapping stays"""
+    first, second = db.aliased(Booking), db.aliased(Booking)
+    return db.session.query(first.id, second.id).filter(
+        first.room_id == second.room_id,
+        first.id < second.id,
+        first.status == 'confirmed',
+        second.status == 'confirmed',
+        first.check_in_date < second.check_out_date,
+        first.check_out_date > second.check_in_date
+    ).all()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--rooms', type=int, default=3)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory(prefix='hotel-stress-') as workdir:
+        app = create_app(f"sqlite:///{os.path.join(workdir, 'stress.db')}")
+        
+        with app.app_context():
+            db.create_all()
+            upgrade_db()
+            seed(num_hotels=1, num_rooms=args.rooms, num_bookings=0)
+        
+        outcomes = Counter()
+        outcomes_lock = threading.Lock()
+        start_barrier = threading.Barrier(args.threads)
+        
+        def worker(worker_id):
+            rng = random.Random(worker_id)
+            start_barrier.wait()
+            for _ in range(args.requests // args.threads):
+                check_in = date.today() + timedelta(days=rng.randint(1, 30))
+                check_out = check_in + timedelta(days=rng.randint(1, 5))
+                with app.app_context():
+                    booking, error = HotelBookingLogic.create_booking(
+                        rng.randint(1, args.rooms), "Stress", f"stress{worker_id}@example.com", check_in, check_out
+                    )
+                outcome = "booked" if booking else error.split(':')[0]
+                with outcomes_lock:
+                    outcomes[outcome] += 1
+        
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.threads)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        
+        with app.app_context():
+            overlaps = find_overlaps()
+        
+        total = sum(outcomes.values())
+        print(f"{total} requests from {args.threads} threads in {elapsed:.1f}s ({total / elapsed:.0f} req/s)")
+        for outcome, count in outcomes.most_common():
+            print(f"  {count:>6}  {outcome}")
+        print(f"Overlapping confirmed bookings: {len(overlaps)}")
+        
+        if overlaps:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,29 @@
 import streamlit as st
 import requests
 import pandas as pd
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, date, timedelta
+from urllib.parse import quote, urlencode
+from requests.adapters import HTTPAdapter
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from urllib3.util.retry import Retry
 import json
 
 # API base URL
 API_BASE_URL = "http://localhost:5001/api"
 
+# Seconds a cacheable GET response (hotels, rooms, availability) is reused across reruns
+API_CACHE_TTL = 30
+
+# POST endpoints that only compute a result and leave cached data valid
+READ_ONLY_POSTS = ('/calculate-price',)
+
+# Bookings fetched per "My Bookings" page
+BOOKINGS_PAGE_SIZE = 20
+
 def init_session_state():
     """Initialize session state variables"""
     if 'current_page' not in st.session_state:
@@ -16,43 +33,127 @@ def init_session_state():
     if 'selected_room' not in st.session_state:
         st.session_state.selected_room = None
 
-def call_api(endpoint, method='GET', data=None):
-    """Helper function to call API endpoints"""
+class ApiError(Exception):
+    """Error response from the API (raised inside cached calls so failures are not cached)"""
+
+_fetch_state = threading.local()
+
+@st.cache_resource
+def get_http_session():
+    """Pooled HTTP session shared by every rerun, so connections to the API are reused"""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=16,
+        max_retries=Retry(total=2, backoff_factor=0.2, allowed_methods=['GET'])
+    )
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def send_request(endpoint, method='GET', data=None, headers=None):
+    """Send one request and return the JSON body, raising ApiError for error responses"""
+    response = get_http_session().request(method, f"{API_BASE_URL}{endpoint}", json=data, headers=headers, timeout=30)
+    if response.ok:
+        return response.json()
     try:
-        url = f"{API_BASE_URL}{endpoint}"
-        
-        if method == 'GET':
-            response = requests.get(url)
-        elif method == 'POST':
-            response = requests.post(url, json=data)
-        elif method == 'DELETE':
-            response = requests.delete(url)
-        
-        if response.status_code == 200:
-            return response.json(), None
-        else:
-            return None, response.json().get('error', 'Unknown error occurred')
-    
+        message = response.json().get('error', 'Unknown error occurred')
+    except ValueError:
+        message = f"HTTP {response.status_code}"
+    raise ApiError(message)
+
+@st.cache_data(ttl=API_CACHE_TTL, show_spinner=False)
+def cached_get(endpoint):
+    """GET endpoint, reusing the response for API_CACHE_TTL seconds"""
+    _fetch_state.missed = True
+    return send_request(endpoint)
+
+def timed_call(endpoint, method='GET', data=None, cache=False, headers=None):
+    """Perform one API call, returning (data, error, debug entry)"""
+    _fetch_state.missed = False
+    start = time.perf_counter()
+    try:
+        result = cached_get(endpoint) if cache else send_request(endpoint, method, data, headers)
+        error = None
+    except ApiError as e:
+        result, error = None, str(e)
     except requests.exceptions.ConnectionError:
-        return None, "Cannot connect to the API server. Please make sure the backend is running."
+        result, error = None, "Cannot connect to the API server. Please make sure the backend is running."
     except Exception as e:
-        return None, str(e)
+        result, error = None, str(e)
+    
+    entry = {
+        "Method": method,
+        "Endpoint": endpoint,
+        "Time (ms)": round((time.perf_counter() - start) * 1000, 1),
+        "Cache": ("hit" if not _fetch_state.missed else "miss") if cache else "-",
+        "Error": error or "",
+    }
+    return result, error, entry
+
+def log_call(entry):
+    st.session_state.setdefault('api_calls', []).append(entry)
+
+def call_api(endpoint, method='GET', data=None, cache=False, headers=None):
+    """Helper function to call API endpoints"""
+    result, error, entry = timed_call(endpoint, method, data, cache, headers)
+    log_call(entry)
+    
+    # Bookings change availability, so drop cached responses after a write
+    if method != 'GET' and endpoint not in READ_ONLY_POSTS and not error:
+        cached_get.clear()
+        st.session_state.pop('guest_bookings', None)
+    return result, error
+
+def call_api_many(*calls):
+    """Run independent (endpoint, cache) GET calls concurrently; returns [(data, error), ...] in order"""
+    ctx = get_script_run_ctx()
+    
+    def run(call):
+        add_script_run_ctx(threading.current_thread(), ctx)
+        endpoint, cache = call
+        return timed_call(endpoint, cache=cache)
+    
+    with ThreadPoolExecutor(max_workers=len(calls)) as pool:
+        outcomes = list(pool.map(run, calls))
+    
+    for _, _, entry in outcomes:
+        log_call(entry)
+    return [(result, error) for result, error, _ in outcomes]
+
+def debug_panel(render_ms):
+    """Sidebar table of this run's API calls and the page render time"""
+    calls = st.session_state.get('api_calls', [])
+    with st.sidebar.expander("API debug", expanded=True):
+        hits = sum(1 for call in calls if call["Cache"] == "hit")
+        st.write(f"Page rendered in **{render_ms:.0f} ms** with {len(calls)} API calls ({hits} from cache)")
+        if calls:
+            st.dataframe(pd.DataFrame(calls), use_container_width=True, hide_index=True)
 
 def home_page():
     """Home page with overview"""
     st.title("🏨 Hotel Booking System")
     st.markdown("---")
     
-    col1, col2, col3 = st.columns(3)
-    
-    with col1:
-        st.metric("Hotels", "3", "Luxury Locations")
-    
-    with col2:
-        st.metric("Rooms", "9", "Various Types")
+    stats, error = call_api('/stats', cache=True)
     
-    with col3:
-        st.metric("Bookings", "All your needs", "24/7 Service")
+    if error:
+        st.error(f"Error fetching stats: {error}")
+    else:
+        col1, col2, col3, col4 = st.columns(4)
+        
+        with col1:
+            st.metric("Hotels", stats['hotels'])
+        
+        with col2:
+            st.metric("Rooms", stats['rooms'])
+        
+        with col3:
+            st.metric("Active Bookings", stats['active_bookings'], f"${stats['revenue']:,.2f} revenue")
+        
+        with col4:
+            st.metric("Occupancy Tonight", f"{stats['occupancy_rate_tonight']:.0%}",
+                      f"{stats['occupied_rooms_tonight']} rooms occupied")
     
     st.markdown("---")
     
@@ -81,7 +182,7 @@ def browse_hotels_page():
     st.markdown("---")
     
     # Fetch hotels from API
-    hotels, error = call_api('/hotels')
+    hotels, error = call_api('/hotels', cache=True)
     
     if error:
         st.error(f"Error fetching hotels: {error}")
@@ -120,7 +221,7 @@ def hotel_details_page():
     st.markdown("---")
     
     # Fetch rooms for this hotel
-    rooms, error = call_api(f"/hotels/{hotel['id']}/rooms")
+    rooms, error = call_api(f"/hotels/{hotel['id']}/rooms?expand=hotel", cache=True)
     
     if error:
         st.error(f"Error fetching rooms: {error}")
@@ -160,13 +261,22 @@ def hotel_details_page():
             
             st.markdown("---")
 
+def go_to_page(page):
+    st.session_state.current_page = page
+
+def start_booking(room, check_in, check_out):
+    st.session_state.current_page = "Book Room"
+    st.session_state.selected_room = room
+    st.session_state.check_in = check_in
+    st.session_state.check_out = check_out
+
 def check_availability_page():
     """Page to check room availability"""
     st.title("🔍 Check Room Availability")
     st.markdown("---")
     
     # Fetch hotels for selection
-    hotels, error = call_api('/hotels')
+    hotels, error = call_api('/hotels', cache=True)
     
     if error:
         st.error(f"Error fetching hotels: {error}")
@@ -181,7 +291,8 @@ def check_availability_page():
         col1, col2, col3 = st.columns(3)
         
         with col1:
-            hotel_options = {hotel['name']: hotel['id'] for hotel in hotels}
+            hotel_options = {"All Hotels": None}
+            hotel_options.update({hotel['name']: hotel['id'] for hotel in hotels})
             selected_hotel_name = st.selectbox("Select Hotel", list(hotel_options.keys()))
             hotel_id = hotel_options[selected_hotel_name]
         
@@ -193,46 +304,94 @@ def check_availability_page():
         
         guests = st.number_input("Number of Guests", min_value=1, max_value=10, value=2)
         
-        if st.form_submit_button("Check Availability", use_container_width=True):
-            if check_in >= check_out:
-                st.error("Check-out date must be after check-in date.")
+        col1, col2, col3 = st.columns(3)
+        
+        with col1:
+            location = st.text_input("Location", placeholder="Any location")
+        
+        with col2:
+            max_price = st.number_input("Max Price per Night", min_value=0, value=0, step=50, help="0 means no limit")
+        
+        with col3:
+            room_type = st.text_input("Room Type", placeholder="Any room type")
+        
+        submitted = st.form_submit_button("Check Availability", use_container_width=True)
+    
+    if submitted:
+        if check_in >= check_out:
+            st.error("Check-out date must be after check-in date.")
+        else:
+            if hotel_id is None:
+                # Search every hotel in one call
+                params = {'check_in': check_in, 'check_out': check_out, 'guests': guests, 'limit': 50, 'expand': 'hotel'}
+                if location:
+                    params['location'] = location
+                if max_price:
+                    params['max_price'] = max_price
+                if room_type:
+                    params['room_type'] = room_type
+                results, error = call_api(f"/search?{urlencode(params)}", cache=True)
+                available_rooms = results['rooms'] if results else None
+                month_calendar, calendar_error = None, None
             else:
-                # Call API to get available rooms
-                endpoint = f"/hotels/{hotel_id}/available-rooms?check_in={check_in}&check_out={check_out}&guests={guests}"
-                available_rooms, error = call_api(endpoint)
+                # Fetch available rooms and the month overview concurrently
+                endpoint = f"/hotels/{hotel_id}/available-rooms?check_in={check_in}&check_out={check_out}&guests={guests}&expand=hotel"
+                (available_rooms, error), (month_calendar, calendar_error) = call_api_many(
+                    (endpoint, True),
+                    (f"/hotels/{hotel_id}/calendar?month={check_in.strftime('%Y-%m')}&guests={guests}", True)
+                )
+                if available_rooms and max_price:
+                    available_rooms = [room for room in available_rooms if room['price_per_night'] <= max_price]
+                if available_rooms and room_type:
+                    available_rooms = [room for room in available_rooms if room['room_type'].lower() == room_type.lower()]
+            
+            if error:
+                st.error(f"Error checking availability: {error}")
+            else:
+                # Month overview: free rooms per night
+                if month_calendar and not calendar_error:
+                    st.subheader(f"Free rooms in {check_in.strftime('%B %Y')}")
+                    calendar_df = pd.DataFrame(month_calendar['days']).set_index('date')
+                    st.bar_chart(calendar_df['free_rooms'])
                 
-                if error:
-                    st.error(f"Error checking availability: {error}")
-                else:
-                    if available_rooms:
-                        st.success(f"Found {len(available_rooms)} available rooms!")
-                        
-                        # Display available rooms
-                        for room in available_rooms:
-                            with st.container():
-                                col1, col2, col3 = st.columns([2, 2, 1])
-                                
-                                with col1:
-                                    st.write(f"**{room['room_type']}** - Room {room['room_number']}")
-                                    st.write(f"Max Guests: {room['max_guests']}")
-                                
-                                with col2:
-                                    nights = (check_out - check_in).days
-                                    total_price = room['price_per_night'] * nights
-                                    st.write(f"**${room['price_per_night']}/night**")
-                                    st.write(f"Total: ${total_price:.2f} for {nights} nights")
-                                
-                                with col3:
-                                    if st.button("Book", key=f"avail_book_{room['id']}"):
-                                        st.session_state.current_page = "Book Room"
-                                        st.session_state.selected_room = room
-                                        st.session_state.check_in = check_in
-                                        st.session_state.check_out = check_out
-                                        st.rerun()
-                                
-                                st.markdown("---")
+                if available_rooms:
+                    # Quote every listed room in one batched call
+                    quotes, quote_error = call_api('/calculate-price', 'POST', {
+                        'stays': [[room['id'], str(check_in), str(check_out)] for room in available_rooms]
+                    })
+                    if quote_error:
+                        st.warning(f"Error calculating prices: {quote_error}")
+                    totals = {quote['room_id']: quote.get('total_price') for quote in quotes['quotes']} if quotes else {}
+                    
+                    if hotel_id is None and results['next_cursor']:
+                        st.success(f"Showing the {len(available_rooms)} cheapest available rooms!")
                     else:
-                        st.warning("No rooms available for the selected dates and criteria.")
+                        st.success(f"Found {len(available_rooms)} available rooms!")
+                    
+                    # Display available rooms
+                    for room in available_rooms:
+                        with st.container():
+                            col1, col2, col3 = st.columns([2, 2, 1])
+                            
+                            with col1:
+                                if hotel_id is None:
+                                    st.write(f"🏨 {room['hotel']['name']} - {room['hotel']['location']}")
+                                st.write(f"**{room['room_type']}** - Room {room['room_number']}")
+                                st.write(f"Max Guests: {room['max_guests']}")
+                            
+                            with col2:
+                                nights = (check_out - check_in).days
+                                st.write(f"**${room['price_per_night']}/night**")
+                                if totals.get(room['id']) is not None:
+                                    st.write(f"Total: ${totals[room['id']]:.2f} for {nights} nights")
+                            
+                            with col3:
+                                st.button("Book", key=f"avail_book_{room['id']}", on_click=start_booking,
+                                          args=(room, check_in, check_out))
+                            
+                            st.markdown("---")
+                else:
+                    st.warning("No rooms available for the selected dates and criteria.")
 
 def book_room_page():
     """Page to book a room"""
@@ -270,10 +429,15 @@ def book_room_page():
             st.session_state.check_out = check_out
         
         nights = (check_out - check_in).days
-        total_price = room['price_per_night'] * nights
+        quote, quote_error = call_api('/calculate-price', 'POST', {
+            'room_id': room['id'], 'check_in': str(check_in), 'check_out': str(check_out)
+        })
         
         st.write(f"**Nights:** {nights}")
-        st.write(f"**Total Price:** ${total_price:.2f}")
+        if quote_error:
+            st.error(f"Error calculating price: {quote_error}")
+        else:
+            st.write(f"**Total Price:** ${quote['total_price']:.2f}")
     
     st.markdown("---")
     
@@ -289,39 +453,62 @@ def book_room_page():
         with col2:
             guest_email = st.text_input("Email Address", placeholder="Enter your email")
         
-        if st.form_submit_button("Confirm Booking", use_container_width=True):
-            if not guest_name or not guest_email:
-                st.error("Please fill in all required fields.")
-            elif check_in >= check_out:
-                st.error("Check-out date must be after check-in date.")
+        submitted = st.form_submit_button("Confirm Booking", use_container_width=True)
+    
+    if submitted:
+        if not guest_name or not guest_email:
+            st.error("Please fill in all required fields.")
+        elif check_in >= check_out:
+            st.error("Check-out date must be after check-in date.")
+        else:
+            # Create booking
+            booking_data = {
+                'room_id': room['id'],
+                'guest_name': guest_name,
+                'guest_email': guest_email,
+                'check_in': check_in.isoformat(),
+                'check_out': check_out.isoformat()
+            }
+            
+            # Submitting the same booking again (e.g. after a timeout) replays
+            # the first confirmation instead of booking twice
+            pending = st.session_state.get('booking_request')
+            if not pending or pending['data'] != booking_data:
+                pending = st.session_state.booking_request = {'data': booking_data, 'key': str(uuid.uuid4())}
+            
+            booking, error = call_api('/bookings', method='POST', data=booking_data,
+                                      headers={'Idempotency-Key': pending['key']})
+            
+            if error:
+                st.error(f"Error creating booking: {error}")
             else:
-                # Create booking
-                booking_data = {
-                    'room_id': room['id'],
-                    'guest_name': guest_name,
-                    'guest_email': guest_email,
-                    'check_in': check_in.isoformat(),
-                    'check_out': check_out.isoformat()
-                }
+                st.success("🎉 Booking confirmed successfully!")
+                st.balloons()
                 
-                booking, error = call_api('/bookings', method='POST', data=booking_data)
+                # Show booking details
+                st.subheader("Booking Confirmation")
+                st.write(f"**Booking ID:** #{booking['id']}")
+                st.write(f"**Guest:** {booking['guest_name']}")
+                st.write(f"**Dates:** {booking['check_in_date']} to {booking['check_out_date']}")
+                st.write(f"**Total Paid:** ${booking['total_price']:.2f}")
                 
-                if error:
-                    st.error("🎉 Booking confirmed successfully!")
-                else:
-                    st.success("🎉 Booking confirmed successfully!")
-                    st.balloons()
-                    
-                    # Show booking details
-                    st.subheader("Booking Confirmation")
-                    st.write(f"**Booking ID:** #{booking['id']}")
-                    st.write(f"**Guest:** {booking['guest_name']}")
-                    st.write(f"**Dates:** {booking['check_in_date']} to {booking['check_out_date']}")
-                    st.write(f"**Total Paid:** ${booking['total_price']:.2f}")
-                    
-                    if st.button("Back to Home"):
-                        st.session_state.current_page = "Home"
-                        st.rerun()
+                st.button("Back to Home", on_click=go_to_page, args=("Home",))
+
+def fetch_guest_bookings(guest_email, cursor=None):
+    """One page of a guest's bookings, newest stay first, with room and hotel embedded"""
+    params = {"expand": "room,hotel", "limit": BOOKINGS_PAGE_SIZE}
+    if cursor:
+        params["cursor"] = cursor
+    return call_api(f"/bookings/guest/{quote(guest_email, safe='')}?{urlencode(params)}")
+
+def load_more_bookings():
+    loaded = st.session_state.guest_bookings
+    page, error = fetch_guest_bookings(loaded['email'], loaded['next_cursor'])
+    if error:
+        loaded['error'] = error
+    else:
+        loaded['bookings'] += page['bookings']
+        loaded['next_cursor'] = page['next_cursor']
 
 def my_bookings_page():
     """Page to view user's bookings"""
@@ -332,11 +519,25 @@ def my_bookings_page():
     guest_email = st.text_input("Enter your email to view bookings", placeholder="your.email@example.com")
     
     if guest_email:
-        bookings, error = call_api(f"/bookings/guest/{guest_email}")
+        # Pages loaded so far are kept across reruns until the email changes or a booking is written
+        email = guest_email.strip().lower()
+        loaded = st.session_state.get('guest_bookings')
+        error = None
+        if loaded is None or loaded['email'] != email:
+            page, error = fetch_guest_bookings(email)
+            if not error:
+                loaded = st.session_state.guest_bookings = {
+                    'email': email,
+                    'bookings': page['bookings'],
+                    'next_cursor': page['next_cursor'],
+                }
+        elif loaded.get('error'):
+            error = loaded.pop('error')
         
         if error:
             st.error(f"Error fetching bookings: {error}")
-        else:
+        if loaded and loaded['email'] == email:
+            bookings = loaded['bookings']
             if not bookings:
                 st.info("No bookings found for this email address.")
             else:
@@ -356,6 +557,9 @@ def my_bookings_page():
                 df = pd.DataFrame(booking_data)
                 st.dataframe(df, use_container_width=True)
                 
+                if loaded['next_cursor']:
+                    st.button("Load more bookings", on_click=load_more_bookings)
+                
                 # Booking actions
                 st.subheader("Booking Actions")
                 booking_id = st.number_input("Enter Booking ID to cancel", min_value=1, step=1)
@@ -384,6 +588,8 @@ def main():
     
     # Initialize session state
     init_session_state()
+    render_started = time.perf_counter()
+    st.session_state.api_calls = []
     
     # Sidebar navigation
     with st.sidebar:
@@ -410,6 +616,7 @@ def main():
         st.write("### About")
         st.write("Hotel Booking System v1.0")
         st.write("Built with Streamlit & Flask")
+        show_debug = st.checkbox("Show API debug panel")
     
     # Display current page
     if st.session_state.current_page == "Home":
@@ -424,6 +631,9 @@ def main():
         book_room_page()
     elif st.session_state.current_page == "My Bookings":
         my_bookings_page()
+    
+    if show_debug:
+        debug_panel((time.perf_counter() - render_started) * 1000)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
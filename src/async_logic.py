@@ -0,0 +1,232 @@
+from sqlalchemy.exc import IntegrityError
+from .db import db, Hotel, Room, Booking, HotelSchema, RoomSchema, schema_for, record_write
+from .cache import catalog_cache, availability_cache
+from .logic import HotelBookingLogic
+from .occupancy import occupancy_index
+from .partitions import archive_partitions
+from .pricing import pricing_engine
+
+class AsyncHotelBookingLogic:
+    """asyncio counterparts of the hot HotelBookingLogic paths for api/asgi.py
+    
+    Every method takes an AsyncSession. Statements, validation, caching and
+    invalidation are shared with HotelBookingLogic so both servers return the
+    same payloads; only the database round trips are awaited.
+    """
+    
+    @staticmethod
+    async def _catalog_entry(key, load):
+        """Async HotelBookingLogic._catalog_entry"""
+        async def loader():
+            return HotelBookingLogic._with_etag(await load())
+        
+        entry = await catalog_cache.get_or_load_async(key, loader)
+        return entry if entry is not None else (None, None)
+    
+    @staticmethod
+    async def get_all_hotels_payload(session, expand=frozenset()):
+        """Get all hotels serialized, as (payload, etag)"""
+        async def load():
+            hotels = await session.scalars(
+                db.select(Hotel).options(*HotelBookingLogic._eager_options(Hotel, expand))
+            )
+            return schema_for(HotelSchema, expand, many=True).dump(hotels.all())
+        return await AsyncHotelBookingLogic._catalog_entry(('hotels', expand), load)
+    
+    @staticmethod
+    async def get_hotel_payload(session, hotel_id, expand=frozenset()):
+        """Get a hotel serialized, as (payload, etag); (None, None) if not found"""
+        async def load():
+            hotel = await session.get(Hotel, hotel_id, options=HotelBookingLogic._eager_options(Hotel, expand))
+            return schema_for(HotelSchema, expand).dump(hotel) if hotel else None
+        return await AsyncHotelBookingLogic._catalog_entry(('hotel', hotel_id, expand), load)
+    
+    @staticmethod
+    async def get_hotel_rooms_payload(session, hotel_id, expand=frozenset()):
+        """Get the rooms of a hotel serialized, as (payload, etag)"""
+        async def load():
+            rooms = await session.scalars(
+                db.select(Room).where(Room.hotel_id == hotel_id).options(*HotelBookingLogic._eager_options(Room, expand))
+            )
+            return schema_for(RoomSchema, expand, many=True).dump(rooms.all())
+        return await AsyncHotelBookingLogic._catalog_entry(('hotel_rooms', hotel_id, expand), load)
+    
+    @staticmethod
+    async def get_room_payload(session, room_id, expand=frozenset()):
+        """Get a room serialized, as (payload, etag); (None, None) if not found"""
+        async def load():
+            room = await session.get(Room, room_id, options=HotelBookingLogic._eager_options(Room, expand))
+            return schema_for(RoomSchema, expand).dump(room) if room else None
+        return await AsyncHotelBookingLogic._catalog_entry(('room', room_id, expand), load)
+    
+    @staticmethod
+    async def get_available_rooms(session, hotel_id, check_in_date, check_out_date, guests=1, expand=()):
+        """Get available rooms for given dates and number of guests"""
+        # The occupancy index is built by the Flask app; use it once it is loaded
+        if occupancy_index.enabled:
+            occupancy_index.ensure_loaded_async()
+        if occupancy_index.enabled and occupancy_index.loaded and not occupancy_index.verify:
+            candidate_rooms = (await session.scalars(
+                HotelBookingLogic._candidate_rooms_statement(hotel_id, guests, expand)
+            )).all()
+            free_ids = set(occupancy_index.free_room_ids(
+                [room.id for room in candidate_rooms], check_in_date, check_out_date
+            ))
+            return [room for room in candidate_rooms if room.id in free_ids]
+        
+        rooms = await session.scalars(
+            HotelBookingLogic._available_rooms_statement(hotel_id, check_in_date, check_out_date, guests, expand)
+        )
+        return rooms.all()
+    
+    @staticmethod
+    async def get_available_rooms_payload(session, hotel_id, check_in_date, check_out_date, guests=1, expand=frozenset()):
+        """Get available rooms serialized, served from availability_cache when possible"""
+        async def load():
+            rooms = await AsyncHotelBookingLogic.get_available_rooms(
+                session, hotel_id, check_in_date, check_out_date, guests, expand
+            )
+            return schema_for(RoomSchema, expand, many=True).dump(rooms)
+        
+        return await availability_cache.get_or_load_async(
+            ('available_rooms', hotel_id, check_in_date, check_out_date, guests, expand),
+            load,
+            tag=hotel_id
+        )
+    
+    @staticmethod
+    async def _lock_room(session, room_id):
+        """Async HotelBookingLogic._lock_room"""
+        query = db.select(Room).where(Room.id == room_id)
+        if session.bind.dialect.name == 'sqlite':
+            await session.execute(db.text('BEGIN IMMEDIATE'))
+            query = query.execution_options(populate_existing=True)
+        else:
+            query = query.with_for_update()
+        return await session.scalar(query)
+    
+    @staticmethod
+    async def create_booking(session, room_id, guest_name, guest_email, check_in, check_out, idempotent=None):
+        """Create a new booking, storing idempotent's key in the same transaction"""
+        try:
+            room_id, error = HotelBookingLogic.parse_room_id(room_id)
+            if error:
+                return None, error
+            check_in_date, check_out_date, error = HotelBookingLogic._validate_stay(check_in, check_out)
+            if error:
+                return None, error
+            
+            # As in HotelBookingLogic.create_booking the index never refuses a booking
+            index_free = None
+            if occupancy_index.enabled:
+                occupancy_index.ensure_loaded_async()
+            if occupancy_index.enabled and occupancy_index.loaded:
+                index_free = occupancy_index.is_free(room_id, check_in_date, check_out_date)
+            
+            # Get and lock the room; the lock is released by the commit or rollback below
+            room = await AsyncHotelBookingLogic._lock_room(session, room_id)
+            if not room:
+                await session.rollback()
+                return None, "Room not found"
+            
+            if not room.is_available:
+                await session.rollback()
+                return None, "Room is not available"
+            
+            # Check for conflicting bookings while holding the lock
+            conflict = await session.scalar(HotelBookingLogic._conflict_statement(room_id, check_in_date, check_out_date))
+            if conflict is not None:
+                await session.rollback()
+                return None, "Room is not available for the selected dates"
+            
+            if index_free is False:
+                occupancy_index.expire()
+            
+            booking = Booking(
+                room_id=room_id,
+                guest_name=guest_name,
+                guest_email=guest_email,
+                check_in_date=check_in_date,
+                check_out_date=check_out_date,
+                total_price=pricing_engine.stay_price(room.price_per_night, check_in_date, check_out_date),
+                status='confirmed'
+            )
+            
+            hotel_id = room.hotel_id
+            session.add(booking)
+            if idempotent is not None:
+                await session.flush()
+                idempotent.record(session, booking)
+            await session.commit()
+            record_write(guest_email)
+            occupancy_index.add(booking)
+            HotelBookingLogic._invalidate_availability([(hotel_id, check_in_date, check_out_date)])
+            if idempotent is not None:
+                idempotent.remember()
+            
+            return booking, None
+        
+        except IntegrityError as e:
+            await session.rollback()
+            # exclusion_violation from the PostgreSQL bookings_no_overlap constraint
+            if getattr(e.orig, 'pgcode', None) == '23P01':
+                return None, "Room is not available for the selected dates"
+            return None, f"Error creating booking: {str(e)}"
+        except Exception as e:
+            await session.rollback()
+            return None, f"Error creating booking: {str(e)}"
+    
+    @staticmethod
+    async def get_booking_by_id(session, booking_id, expand=()):
+        """Get booking by ID"""
+        booking = await session.get(Booking, booking_id, options=HotelBookingLogic._eager_options(Booking, expand))
+        if booking is None:
+            archived = await AsyncHotelBookingLogic._archived_bookings(
+                session, lambda table: [table.c.id == booking_id], expand
+            )
+            booking = archived[0] if archived else None
+        return booking
+    
+    @staticmethod
+    async def cancel_booking(session, booking_id):
+        """Cancel a booking"""
+        try:
+            booking = await session.get(Booking, booking_id)
+            if not booking:
+                return False, "Booking not found"
+            
+            was_confirmed = booking.status == 'confirmed'
+            hotel_id = await session.scalar(db.select(Room.hotel_id).where(Room.id == booking.room_id))
+            booking.status = 'cancelled'
+            await session.commit()
+            record_write(booking.guest_email)
+            if was_confirmed:
+                occupancy_index.remove(booking)
+                HotelBookingLogic._invalidate_availability([(hotel_id, booking.check_in_date, booking.check_out_date)])
+            return True, None
+        
+        except Exception as e:
+            await session.rollback()
+            return False, f"Error cancelling booking: {str(e)}"
+    
+    @staticmethod
+    async def get_bookings_by_email(session, guest_email, expand=(), limit=50, cursor=None):
+        """Async HotelBookingLogic.get_bookings_by_email"""
+        criteria = HotelBookingLogic._guest_bookings_criteria(guest_email, cursor)
+        bookings = (await session.scalars(HotelBookingLogic._guest_bookings_statement(criteria, limit, expand))).all()
+        archived = []
+        if HotelBookingLogic._guest_archive_needed(bookings, limit):
+            archived = await AsyncHotelBookingLogic._archived_bookings(session, criteria, expand, limit + 1)
+        return HotelBookingLogic._guest_bookings_page(bookings, limit, archived)
+    
+    @staticmethod
+    async def _archived_bookings(session, criteria, expand=(), limit=None):
+        """Async HotelBookingLogic._archived_bookings"""
+        rows = await session.execute(
+            HotelBookingLogic._archived_bookings_statement(archive_partitions.tables()[1:], criteria, limit)
+        )
+        bookings = HotelBookingLogic._archived_booking_objects(rows.mappings())
+        statement = HotelBookingLogic._archived_rooms_statement(bookings, expand)
+        if statement is not None:
+            HotelBookingLogic._attach_rooms(bookings, (await session.scalars(statement)).unique())
+        return bookings
@@ -0,0 +1,156 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after `ttl` seconds
+    
+    Values are stored as-is, so callers cache already-serialized payloads
+    rather than ORM objects bound to a session. A ttl of 0 disables the cache.
+    
+    Entries may carry a tag (e.g. a hotel ID) so invalidate() can drop the
+    matching subset without scanning or flushing the whole cache.
+    """
+    
+    def __init__(self, max_entries=1024, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._tags = {}
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._tag_generations = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.invalidation_events = 0
+        self.max_fanout = 0
+    
+    @property
+    def enabled(self):
+        return self.ttl > 0 and self.max_entries > 0
+    
+    def _discard(self, key):
+        _, _, tag = self._entries.pop(key)
+        if tag is not None:
+            keys = self._tags[tag]
+            keys.discard(key)
+            if not keys:
+                del self._tags[tag]
+    
+    def _snapshot(self, tag):
+        return self._generation, self._tag_generations.get(tag, 0)
+    
+    def get(self, key):
+        """Return the cached value for key, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at, _ = entry
+            if expires_at <= time.monotonic():
+                self._discard(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+    
+    def set(self, key, value, generation=None, tag=None):
+        """Store value under key, unless it was invalidated since `generation` was read"""
+        if not self.enabled:
+            return
+        with self._lock:
+            if generation is not None and generation != self._snapshot(tag):
+                return
+            if key in self._entries:
+                self._discard(key)
+            self._entries[key] = (value, time.monotonic() + self.ttl, tag)
+            if tag is not None:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._discard(next(iter(self._entries)))
+                self.evictions += 1
+    
+    def get_or_load(self, key, loader, tag=None):
+        """Return the cached value for key, calling loader() to fill a miss"""
+        if not self.enabled:
+            return loader()
+        value = self.get(key)
+        if value is None:
+            # An invalidation while loader() runs means the value may already be stale
+            with self._lock:
+                generation = self._snapshot(tag)
+            value = loader()
+            if value is not None:
+                self.set(key, value, generation, tag)
+        return value
+    
+    async def get_or_load_async(self, key, loader, tag=None):
+        """get_or_load() for a coroutine function loader"""
+        if not self.enabled:
+            return await loader()
+        value = self.get(key)
+        if value is None:
+            with self._lock:
+                generation = self._snapshot(tag)
+            value = await loader()
+            if value is not None:
+                self.set(key, value, generation, tag)
+        return value
+    
+    def _record_invalidation(self, count):
+        self.invalidation_events += 1
+        self.invalidations += count
+        self.max_fanout = max(self.max_fanout, count)
+    
+    def invalidate(self, tag, predicate=None):
+        """Drop the entries tagged `tag` whose key satisfies predicate; returns how many"""
+        with self._lock:
+            self._tag_generations[tag] = self._tag_generations.get(tag, 0) + 1
+            keys = [key for key in self._tags.get(tag, ()) if predicate is None or predicate(key)]
+            for key in keys:
+                self._discard(key)
+            self._record_invalidation(len(keys))
+            return len(keys)
+    
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._record_invalidation(len(self._entries))
+            self._entries.clear()
+            self._tags.clear()
+    
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "invalidation_events": self.invalidation_events,
+                "max_fanout": self.max_fanout,
+                "avg_fanout": round(self.invalidations / self.invalidation_events, 2) if self.invalidation_events else None,
+            }
+
+catalog_cache = TTLCache(
+    max_entries=int(os.getenv('CATALOG_CACHE_SIZE', '1024')),
+    ttl=float(os.getenv('CATALOG_CACHE_TTL', '300'))
+)
+
+availability_cache = TTLCache(
+    max_entries=int(os.getenv('AVAILABILITY_CACHE_SIZE', '4096')),
+    ttl=float(os.getenv('AVAILABILITY_CACHE_TTL', '30'))
+)
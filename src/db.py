@@ -1,13 +1,94 @@
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
 from flask_marshmallow import Marshmallow
+import itertools
 import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache, wraps
 from dotenv import load_dotenv
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
 
 load_dotenv()
 
-db = SQLAlchemy()
+# Seconds after a write during which reads for the same guest email stay on the primary
+READ_YOUR_WRITES_SECONDS = float(os.getenv('REPLICA_READ_YOUR_WRITES_SECONDS', '5'))
+
+_replica_counter = itertools.count()
+
+class RoutingSession(Session):
+    """Session that sends reads made under use_replica() to a read replica
+    
+    Replicas are the binds named replica_<n> (see configure_db). Flushes and
+    everything outside use_replica() go to the primary, as do all reads when
+    no replica is configured. Each session sticks to one replica so a request
+    sees a single consistent snapshot.
+    """
+    
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self.info.get('use_replica') and not self._flushing:
+            replicas = [engine for key, engine in self._db.engines.items() if key and key.startswith('replica_')]
+            if replicas:
+                index = self.info.setdefault('replica_index', next(_replica_counter))
+                return replicas[index % len(replicas)]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 ma = Marshmallow()
 
+@contextmanager
+def use_replica(enabled=True):
+    """Route the reads in this block to a replica; use_replica(False) pins them to the primary"""
+    info = db.session.info
+    previous = info.get('use_replica', False)
+    info['use_replica'] = enabled
+    try:
+        yield
+    finally:
+        info['use_replica'] = previous
+
+def use_primary():
+    return use_replica(False)
+
+def read_only(func):
+    """Run a query-only function under use_replica()"""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with use_replica():
+            return func(*args, **kwargs)
+    return wrapper
+
+# Rows per transaction when upgrade_db backfills a new column
+BACKFILL_BATCH_SIZE = 10000
+
+def normalize_email(email):
+    """Canonical form of a guest email, used to match bookings made with any casing"""
+    return email.strip().lower()
+
+def _normalized_guest_email(context):
+    return normalize_email(context.get_current_parameters()['guest_email'])
+
+_recent_writes = {}
+_recent_writes_lock = threading.Lock()
+
+def record_write(guest_email):
+    """Note a committed write for guest_email so its reads stay on the primary for a while"""
+    now = time.monotonic()
+    with _recent_writes_lock:
+        _recent_writes[normalize_email(guest_email)] = now
+        # Keep the map bounded by dropping entries whose window has passed
+        if len(_recent_writes) > 10000:
+            for email, written_at in list(_recent_writes.items()):
+                if now - written_at > READ_YOUR_WRITES_SECONDS:
+                    del _recent_writes[email]
+
+def wrote_recently(guest_email):
+    with _recent_writes_lock:
+        written_at = _recent_writes.get(normalize_email(guest_email))
+    return written_at is not None and time.monotonic() - written_at <= READ_YOUR_WRITES_SECONDS
+
 class Hotel(db.Model):
     __tablename__ = 'hotels'
     
@@ -21,6 +102,11 @@ class Hotel(db.Model):
 
 class Room(db.Model):
     __tablename__ = 'rooms'
+    __table_args__ = (
+        db.Index('ix_rooms_hotel_id', 'hotel_id'),
+        # Cross-hotel search walks rooms cheapest first with keyset pagination
+        db.Index('ix_rooms_price_id', 'price_per_night', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     hotel_id = db.Column(db.Integer, db.ForeignKey('hotels.id'), nullable=False)
@@ -36,23 +122,100 @@ class Room(db.Model):
 
 class Booking(db.Model):
     __tablename__ = 'bookings'
+    __table_args__ = (
+        # Overlap/conflict checks: equality on room and status, range on dates
+        db.Index('ix_bookings_room_status_dates', 'room_id', 'status', 'check_in_date', 'check_out_date'),
+        # A guest's bookings, newest stay first, with keyset pagination
+        db.Index('ix_bookings_guest_email_normalized', 'guest_email_normalized', 'check_in_date', 'id'),
+        # Past stays still confirmed, and finished ones old enough to archive (src/lifecycle.py)
+        db.Index('ix_bookings_status_check_out', 'status', 'check_out_date'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     room_id = db.Column(db.Integer, db.ForeignKey('rooms.id'), nullable=False)
     guest_name = db.Column(db.String(100), nullable=False)
     guest_email = db.Column(db.String(100), nullable=False)
+    # Set on insert (also by bulk INSERTs); rows from before the column existed
+    # are filled in by upgrade_db
+    guest_email_normalized = db.Column(db.String(100), default=_normalized_guest_email)
     check_in_date = db.Column(db.Date, nullable=False)
     check_out_date = db.Column(db.Date, nullable=False)
     total_price = db.Column(db.Float, nullable=False)
     status = db.Column(db.String(20), default='confirmed')  # confirmed, cancelled, completed
     created_at = db.Column(db.DateTime, server_default=db.func.now())
 
+class BookingArchive(db.Model):
+    """Finished bookings moved out of the live bookings table by src/lifecycle.py
+    
+    Same columns as bookings (and the same IDs), so rows can be copied across
+    with INSERT ... SELECT. Looking a booking up by ID or a guest's bookings
+    falls back to it, and counters and rollup rebuilds include it so archiving
+    leaves totals unchanged. Stored partitioned by check-out date, see
+    src/partitions.py; the partition key is part of the primary key as
+    PostgreSQL requires.
+    """
+    __tablename__ = 'bookings_archive'
+    __table_args__ = (
+        db.Index('ix_bookings_archive_check_out', 'check_out_date'),
+        # A guest's archived bookings, merged into their history newest stay first
+        db.Index('ix_bookings_archive_guest_email_normalized', 'guest_email_normalized', 'check_in_date', 'id'),
+        {'postgresql_partition_by': 'RANGE (check_out_date)'},
+    )
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    room_id = db.Column(db.Integer, nullable=False)
+    guest_name = db.Column(db.String(100), nullable=False)
+    guest_email = db.Column(db.String(100), nullable=False)
+    guest_email_normalized = db.Column(db.String(100))
+    check_in_date = db.Column(db.Date, nullable=False)
+    check_out_date = db.Column(db.Date, primary_key=True)
+    total_price = db.Column(db.Float, nullable=False)
+    status = db.Column(db.String(20))
+    created_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, server_default=db.func.now())
+
+class IdempotencyKey(db.Model):
+    """Response of a POST /api/bookings sent with an Idempotency-Key header
+    
+    Written in the same transaction as the booking it created, so a key can
+    never create two bookings; see src/idempotency.py.
+    """
+    __tablename__ = 'idempotency_keys'
+    __table_args__ = (
+        # Expired keys are purged by age
+        db.Index('ix_idempotency_keys_created_at', 'created_at'),
+    )
+    
+    key = db.Column(db.String(255), primary_key=True)
+    # SHA-256 of the request body, so a reused key with a different body is rejected
+    fingerprint = db.Column(db.String(64), nullable=False)
+    status_code = db.Column(db.Integer, nullable=False)
+    response = db.Column(db.Text, nullable=False)
+    booking_id = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, server_default=db.func.now())
+
+class DailyRollup(db.Model):
+    """Nights sold, revenue and cancelled nights per hotel, room type and night
+    
+    Maintained incrementally from booking writes by src/rollups.py, so
+    reports read one row per day and group instead of expanding every stay.
+    """
+    __tablename__ = 'daily_rollups'
+    
+    day = db.Column(db.Date, primary_key=True)
+    hotel_id = db.Column(db.Integer, db.ForeignKey('hotels.id'), primary_key=True)
+    room_type = db.Column(db.String(50), primary_key=True)
+    nights_sold = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+    cancellations = db.Column(db.Integer, nullable=False, default=0)
+
 # Marshmallow Schemas for serialization
 class HotelSchema(ma.SQLAlchemyAutoSchema):
     class Meta:
         model = Hotel
-        include_relationships = True
         load_instance = True
+    
+    rooms = ma.List(ma.Nested(lambda: RoomSchema(exclude=('hotel',))))
 
 class RoomSchema(ma.SQLAlchemyAutoSchema):
     class Meta:
@@ -60,73 +223,306 @@ class RoomSchema(ma.SQLAlchemyAutoSchema):
         include_fk = True
         load_instance = True
     
-    hotel = ma.Nested(HotelSchema)
+    hotel = ma.Nested(lambda: HotelSchema(exclude=('rooms',)))
 
 class BookingSchema(ma.SQLAlchemyAutoSchema):
     class Meta:
         model = Booking
         include_fk = True
         load_instance = True
+        exclude = ('guest_email_normalized',)
     
     room = ma.Nested(RoomSchema)
 
-# Initialize schemas
-hotel_schema = HotelSchema()
-hotels_schema = HotelSchema(many=True)
-room_schema = RoomSchema()
-rooms_schema = RoomSchema(many=True)
-booking_schema = BookingSchema()
-bookings_schema = BookingSchema(many=True)
+# Nested relationships each schema can expand with ?expand=, as field paths.
+# Anything not expanded is left out so a dump never lazy-loads it.
+EXPANSIONS = {
+    HotelSchema: {'rooms': 'rooms'},
+    RoomSchema: {'hotel': 'hotel'},
+    BookingSchema: {'room': 'room', 'hotel': 'room.hotel'},
+}
+
+@lru_cache(maxsize=None)
+def schema_for(schema_class, expand=frozenset(), many=False):
+    """Get a (cached) schema instance that only nests the expanded relationships"""
+    paths = EXPANSIONS[schema_class]
+    expanded = {paths[name] for name in expand}
+    # Expanding a nested path implies expanding its parents
+    expanded |= {path.rsplit('.', 1)[0] for path in expanded if '.' in path}
+    excluded = [
+        path for path in paths.values()
+        if path not in expanded and ('.' not in path or path.rsplit('.', 1)[0] in expanded)
+    ]
+    return schema_class(many=many, exclude=excluded)
+
+# Initialize schemas (lean: no nested relationships)
+hotel_schema = schema_for(HotelSchema)
+hotels_schema = schema_for(HotelSchema, many=True)
+room_schema = schema_for(RoomSchema)
+rooms_schema = schema_for(RoomSchema, many=True)
+booking_schema = schema_for(BookingSchema)
+bookings_schema = schema_for(BookingSchema, many=True)
+
+def upgrade_db():
+    """Bring an existing database up to date with the current models
+    
+    db.create_all() only creates missing tables, so columns and indexes added
+    to tables that already exist in older hotel_booking.db files are created
+    here, and new columns are backfilled. On PostgreSQL this also adds the
+    booking overlap exclusion constraint. Archive partitions and the
+    all_bookings view are set up by src/partitions.py.
+    """
+    from .partitions import archive_partitions
+    
+    inspector = db.inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                column_type = column.type.compile(dialect=db.engine.dialect)
+                with db.engine.begin() as connection:
+                    connection.execute(db.text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+    
+    _backfill_normalized_emails()
+    # Before the index loop below, which would index a bookings_archive about to be replaced
+    archive_partitions.upgrade()
+    
+    # Superseded by ix_bookings_guest_email_normalized
+    with db.engine.begin() as connection:
+        connection.execute(db.text("DROP INDEX IF EXISTS ix_bookings_guest_email"))
+    
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=db.engine, checkfirst=True)
+    
+    if db.engine.dialect.name == 'postgresql':
+        # Database-level guarantee that confirmed stays of a room never overlap
+        with db.engine.begin() as connection:
+            connection.execute(db.text("CREATE EXTENSION IF NOT EXISTS btree_gist"))
+            exists = connection.execute(db.text(
+                "SELECT 1 FROM pg_constraint WHERE conname = 'bookings_no_overlap'"
+            )).first()
+            if not exists:
+                connection.execute(db.text(
+                    "ALTER TABLE bookings ADD CONSTRAINT bookings_no_overlap EXCLUDE USING gist "
+                    "(room_id WITH =, daterange(check_in_date, check_out_date) WITH &&) "
+                    "WHERE (status = 'confirmed')"
+                ))
+
+def _backfill_normalized_emails(batch_size=BACKFILL_BATCH_SIZE):
+    """Fill guest_email_normalized for bookings stored before it existed, one batch per transaction"""
+    last_id = 0
+    while True:
+        with db.engine.begin() as connection:
+            rows = connection.execute(
+                db.select(Booking.id, Booking.guest_email).where(
+                    Booking.id > last_id, Booking.guest_email_normalized.is_(None)
+                ).order_by(Booking.id).limit(batch_size)
+            ).all()
+            if not rows:
+                return
+            connection.execute(
+                db.update(Booking.__table__).where(Booking.id == db.bindparam('booking_id')).values(
+                    guest_email_normalized=db.bindparam('normalized')
+                ),
+                [{"booking_id": booking_id, "normalized": normalize_email(email)} for booking_id, email in rows]
+            )
+        last_id = rows[-1][0]
+
+def _flag(value):
+    return value is True or str(value).lower() in ('1', 'true', 'yes', 'on')
+
+# Engine settings and how to parse them; each is read from the Flask config,
+# then the environment, then DB_DEFAULTS for the backend
+DB_SETTINGS = {
+    'DB_POOL_SIZE': int,
+    'DB_MAX_OVERFLOW': int,
+    'DB_POOL_TIMEOUT': float,
+    'DB_POOL_RECYCLE': int,
+    'DB_POOL_PRE_PING': _flag,
+    'SQLITE_JOURNAL_MODE': str.upper,
+    'SQLITE_BUSY_TIMEOUT': int,
+    'SQLITE_SYNCHRONOUS': str.upper,
+}
+
+DB_DEFAULTS = {
+    # Local file: no stale connections to ping or recycle; WAL lets readers
+    # run alongside the single writer, and writers wait instead of failing
+    'sqlite': {
+        'DB_POOL_SIZE': 5,
+        'DB_MAX_OVERFLOW': 10,
+        'DB_POOL_TIMEOUT': 30,
+        'DB_POOL_RECYCLE': -1,
+        'DB_POOL_PRE_PING': False,
+        'SQLITE_JOURNAL_MODE': 'WAL',
+        'SQLITE_BUSY_TIMEOUT': 5000,
+        'SQLITE_SYNCHRONOUS': 'NORMAL',
+    },
+    # Database servers drop idle connections, so check and recycle them
+    'server': {
+        'DB_POOL_SIZE': 5,
+        'DB_MAX_OVERFLOW': 10,
+        'DB_POOL_TIMEOUT': 30,
+        'DB_POOL_RECYCLE': 1800,
+        'DB_POOL_PRE_PING': True,
+    },
+}
+
+SQLITE_JOURNAL_MODES = ('DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF')
+SQLITE_SYNCHRONOUS_MODES = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+
+def _is_memory_database(url):
+    return url.get_backend_name() == 'sqlite' and (
+        url.database in (None, '', ':memory:') or url.query.get('mode') == 'memory'
+    )
+
+def database_settings(url, config=None):
+    """Resolve DB_SETTINGS for the database at url from config, the environment and backend defaults"""
+    backend = make_url(url).get_backend_name()
+    settings = dict(DB_DEFAULTS['sqlite' if backend == 'sqlite' else 'server'])
+    for name, parse in DB_SETTINGS.items():
+        value = (config or {}).get(name, os.getenv(name))
+        if value is not None and value != '':
+            settings[name] = parse(value)
+    
+    if settings.get('SQLITE_JOURNAL_MODE', 'WAL') not in SQLITE_JOURNAL_MODES:
+        raise ValueError(f"SQLITE_JOURNAL_MODE must be one of {', '.join(SQLITE_JOURNAL_MODES)}")
+    if settings.get('SQLITE_SYNCHRONOUS', 'NORMAL') not in SQLITE_SYNCHRONOUS_MODES:
+        raise ValueError(f"SQLITE_SYNCHRONOUS must be one of {', '.join(SQLITE_SYNCHRONOUS_MODES)}")
+    return settings
+
+def engine_options(url, settings):
+    """create_engine() keyword arguments for the pool settings"""
+    options = {
+        'pool_pre_ping': settings['DB_POOL_PRE_PING'],
+        'pool_recycle': settings['DB_POOL_RECYCLE'],
+    }
+    # In-memory SQLite uses a single shared connection rather than a sized pool
+    if not _is_memory_database(make_url(url)):
+        options.update(
+            pool_size=settings['DB_POOL_SIZE'],
+            max_overflow=settings['DB_MAX_OVERFLOW'],
+            pool_timeout=settings['DB_POOL_TIMEOUT'],
+        )
+    return options
+
+def configure_engine(engine, settings):
+    """Apply the per-connection settings (SQLite pragmas) to every new connection of engine"""
+    if engine.dialect.name != 'sqlite':
+        return
+    
+    pragmas = [
+        f"PRAGMA busy_timeout = {settings['SQLITE_BUSY_TIMEOUT']}",
+        f"PRAGMA synchronous = {settings['SQLITE_SYNCHRONOUS']}",
+    ]
+    if not _is_memory_database(engine.url):
+        pragmas.insert(0, f"PRAGMA journal_mode = {settings['SQLITE_JOURNAL_MODE']}")
+    
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+def configure_db(app):
+    """Register db with app, applying the pool and SQLite settings from app.config or the environment
+    
+    DATABASE_REPLICA_URLS (config or environment, comma separated) adds read
+    replicas as the binds replica_0, replica_1, ... for RoutingSession.
+    Archive partition databases are attached to the primary (src/partitions.py).
+    """
+    url = app.config['SQLALCHEMY_DATABASE_URI']
+    settings = database_settings(url, app.config)
+    # Explicit SQLALCHEMY_ENGINE_OPTIONS still take precedence
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        **engine_options(url, settings),
+        **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+    }
+    
+    replica_urls = app.config.get('DATABASE_REPLICA_URLS', os.getenv('DATABASE_REPLICA_URLS', ''))
+    if isinstance(replica_urls, str):
+        replica_urls = [replica_url.strip() for replica_url in replica_urls.split(',') if replica_url.strip()]
+    binds = app.config.setdefault('SQLALCHEMY_BINDS', {})
+    for index, replica_url in enumerate(replica_urls):
+        binds[f'replica_{index}'] = {'url': replica_url, **engine_options(replica_url, database_settings(replica_url, app.config))}
+    
+    db.init_app(app)
+    
+    from .partitions import archive_partitions
+    
+    with app.app_context():
+        for key, engine in db.engines.items():
+            configure_engine(engine, settings if key is None else database_settings(engine.url, app.config))
+        archive_partitions.configure(db.engine)
+    return settings
+
+# asyncio drivers for create_async_db_engine, keyed by backend name
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+    'mysql': 'mysql+aiomysql',
+}
+
+def create_async_db_engine(url, config=None):
+    """Create an asyncio engine for the same database as url (e.g. db.engine.url)"""
+    # Imported here so the Flask app does not need the asyncio extras installed
+    from sqlalchemy.ext.asyncio import create_async_engine
+    
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No asyncio driver configured for {backend}")
+    settings = database_settings(url, config)
+    engine = create_async_engine(url.set(drivername=ASYNC_DRIVERS[backend]), **engine_options(url, settings))
+    configure_engine(engine.sync_engine, settings)
+    # Archived bookings are read through it too
+    from .partitions import archive_partitions
+    archive_partitions.configure(engine.sync_engine)
+    return engine
 
 def init_db(app):
     """Initialize database with sample data"""
-    db.init_app(app)
+    configure_db(app)
     
     with app.app_context():
         db.create_all()
+        upgrade_db()
         
         # Create sample data if no hotels exist
         if Hotel.query.count() == 0:
-            # Create sample hotels
-            hotel1 = Hotel(
-                name="Grand Plaza Hotel",
-                location="New York, NY",
-                description="Luxury hotel in the heart of Manhattan"
-            )
-            hotel2 = Hotel(
-                name="Ocean View Resort",
-                location="Miami, FL",
-                description="Beachfront resort with stunning ocean views"
-            )
-            hotel3 = Hotel(
-                name="Mountain Retreat",
-                location="Denver, CO",
-                description="Cozy hotel nestled in the Rocky Mountains"
-            )
-            
-            db.session.add_all([hotel1, hotel2, hotel3])
-            db.session.commit()
+            hotels_data = [
+                {"name": "Grand Plaza Hotel", "location": "New York, NY",
+                 "description": "Luxury hotel in the heart of Manhattan"},
+                {"name": "Ocean View Resort", "location": "Miami, FL",
+                 "description": "Beachfront resort with stunning ocean views"},
+                {"name": "Mountain Retreat", "location": "Denver, CO",
+                 "description": "Cozy hotel nestled in the Rocky Mountains"},
+            ]
             
-            # Create sample rooms for each hotel
+            # Sample rooms, keyed by their hotel's position in hotels_data
             rooms_data = [
                 # Hotel 1 rooms
-                {"hotel_id": 1, "room_number": "101", "room_type": "Single", "price_per_night": 99.99, "max_guests": 1},
-                {"hotel_id": 1, "room_number": "102", "room_type": "Double", "price_per_night": 149.99, "max_guests": 2},
-                {"hotel_id": 1, "room_number": "201", "room_type": "Suite", "price_per_night": 299.99, "max_guests": 4},
+                (0, {"room_number": "101", "room_type": "Single", "price_per_night": 99.99, "max_guests": 1}),
+                (0, {"room_number": "102", "room_type": "Double", "price_per_night": 149.99, "max_guests": 2}),
+                (0, {"room_number": "201", "room_type": "Suite", "price_per_night": 299.99, "max_guests": 4}),
                 
                 # Hotel 2 rooms
-                {"hotel_id": 2, "room_number": "101", "room_type": "Single", "price_per_night": 129.99, "max_guests": 1},
-                {"hotel_id": 2, "room_number": "102", "room_type": "Double", "price_per_night": 199.99, "max_guests": 2},
-                {"hotel_id": 2, "room_number": "201", "room_type": "Ocean View Suite", "price_per_night": 399.99, "max_guests": 4},
+                (1, {"room_number": "101", "room_type": "Single", "price_per_night": 129.99, "max_guests": 1}),
+                (1, {"room_number": "102", "room_type": "Double", "price_per_night": 199.99, "max_guests": 2}),
+                (1, {"room_number": "201", "room_type": "Ocean View Suite", "price_per_night": 399.99, "max_guests": 4}),
                 
                 # Hotel 3 rooms
-                {"hotel_id": 3, "room_number": "101", "room_type": "Single", "price_per_night": 79.99, "max_guests": 1},
-                {"hotel_id": 3, "room_number": "102", "room_type": "Double", "price_per_night": 119.99, "max_guests": 2},
-                {"hotel_id": 3, "room_number": "201", "room_type": "Mountain View Suite", "price_per_night": 199.99, "max_guests": 4},
+                (2, {"room_number": "101", "room_type": "Single", "price_per_night": 79.99, "max_guests": 1}),
+                (2, {"room_number": "102", "room_type": "Double", "price_per_night": 119.99, "max_guests": 2}),
+                (2, {"room_number": "201", "room_type": "Mountain View Suite", "price_per_night": 199.99, "max_guests": 4}),
             ]
             
-            for room_data in rooms_data:
-                room = Room(**room_data)
-                db.session.add(room)
-            
-            db.session.commit()
\ No newline at end of file
+            # One executemany INSERT per table, in a single transaction
+            hotel_ids = db.session.scalars(
+                db.insert(Hotel).returning(Hotel.id, sort_by_parameter_order=True), hotels_data
+            ).all()
+            db.session.execute(
+                db.insert(Room), [dict(room_data, hotel_id=hotel_ids[hotel]) for hotel, room_data in rooms_data]
+            )
+            db.session.commit()
@@ -0,0 +1,155 @@
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from .cache import TTLCache
+from .db import db, IdempotencyKey, booking_schema
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+def fingerprint(payload):
+    """SHA-256 of a JSON request body, independent of key order and whitespace"""
+    canonical = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+class IdempotentRequest:
+    """A booking POST sent with an Idempotency-Key, passed to create_booking"""
+    __slots__ = ('store', 'key', 'fingerprint', 'body')
+    
+    def __init__(self, store, key, fingerprint):
+        self.store = store
+        self.key = key
+        self.fingerprint = fingerprint
+        self.body = None
+    
+    def record(self, session, booking):
+        """Add the key and the 201 response for booking (flushed, so it has an id) to session's transaction"""
+        self.body = json.dumps(booking_schema.dump(booking))
+        session.add(IdempotencyKey(
+            key=self.key, fingerprint=self.fingerprint, status_code=201, response=self.body, booking_id=booking.id
+        ))
+    
+    def remember(self):
+        """Keep the committed response in memory for the retries to come"""
+        self.store.remember(self.key, (self.fingerprint, 201, self.body))
+
+class IdempotencyStore:
+    """Stored responses of POST /api/bookings, by Idempotency-Key
+    
+    A retry carrying the key of a booking that was created gets the original
+    201 body back, from an in-memory LRU or else the idempotency_keys table,
+    without the room lock, conflict query or insert. The key row is written
+    in the booking's own transaction, so concurrent retries cannot both
+    book: the loser fails on the conflict check (or the key's primary key),
+    after which the route looks the key up again and replays the winner.
+    Only created bookings are stored; a request that failed can be retried
+    with the same key.
+    
+    Keys are kept at least `ttl` seconds (IDEMPOTENCY_TTL_SECONDS); older
+    rows are purged by the booking lifecycle job.
+    """
+    
+    def __init__(self, max_entries=10000, ttl=86400):
+        self.ttl = ttl
+        self._responses = TTLCache(max_entries=max_entries, ttl=ttl)
+        self.database_hits = 0
+        self.mismatches = 0
+        self.recorded = 0
+        self.purged = 0
+        self._lock = threading.Lock()
+    
+    def begin(self, key, payload):
+        """Check the header value and fingerprint the body; returns (IdempotentRequest, error)"""
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return None, f"{IDEMPOTENCY_HEADER} must be 1 to {MAX_KEY_LENGTH} characters"
+        return IdempotentRequest(self, key, fingerprint(payload)), None
+    
+    def remember(self, key, entry):
+        self._responses.set(key, entry)
+        with self._lock:
+            self.recorded += 1
+    
+    def lookup(self, request):
+        """The stored (status, body) for request's key, or None; returns (response, error)"""
+        entry = self._responses.get(request.key)
+        if entry is None:
+            row = db.session.get(IdempotencyKey, request.key)
+            entry = self._load(row)
+        return self._replay(request, entry)
+    
+    async def lookup_async(self, session, request):
+        """lookup() on an AsyncSession"""
+        entry = self._responses.get(request.key)
+        if entry is None:
+            entry = self._load(await session.get(IdempotencyKey, request.key))
+        return self._replay(request, entry)
+    
+    def _load(self, row):
+        if row is None:
+            return None
+        entry = (row.fingerprint, row.status_code, row.response)
+        self._responses.set(row.key, entry)
+        with self._lock:
+            self.database_hits += 1
+        return entry
+    
+    def _replay(self, request, entry):
+        if entry is None:
+            return None, None
+        stored_fingerprint, status, body = entry
+        if stored_fingerprint != request.fingerprint:
+            with self._lock:
+                self.mismatches += 1
+            return None, f"{IDEMPOTENCY_HEADER} was already used for a different request"
+        return (status, body), None
+    
+    def purge(self, now=None):
+        """Delete keys older than ttl; returns how many"""
+        # created_at is the database's CURRENT_TIMESTAMP, in UTC
+        now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+        with db.engine.begin() as connection:
+            purged = connection.execute(
+                db.delete(IdempotencyKey).where(IdempotencyKey.created_at < now - timedelta(seconds=self.ttl))
+            ).rowcount
+        with self._lock:
+            self.purged += purged
+        return purged
+    
+    def stats(self):
+        memory = self._responses.stats()
+        with self._lock:
+            return {
+                "ttl_seconds": self.ttl,
+                "cached": memory["entries"],
+                "max_cached": memory["max_entries"],
+                "memory_hits": memory["hits"],
+                "database_hits": self.database_hits,
+                "mismatches": self.mismatches,
+                "recorded": self.recorded,
+                "purged": self.purged,
+            }
+    
+    def metrics(self):
+        """Store counters as Prometheus samples"""
+        stats = self.stats()
+        samples = [
+            ('idempotency_memory_hits_total', 'counter', "Idempotency-Key lookups answered from memory", stats["memory_hits"]),
+            ('idempotency_database_hits_total', 'counter', "Idempotency-Key lookups answered from the table",
+             stats["database_hits"]),
+            ('idempotency_mismatches_total', 'counter', "Idempotency-Keys reused for a different request",
+             stats["mismatches"]),
+            ('idempotency_recorded_total', 'counter', "Booking responses stored under an Idempotency-Key",
+             stats["recorded"]),
+            ('idempotency_cached_keys', 'gauge', "Idempotency-Keys held in memory", stats["cached"]),
+        ]
+        lines = []
+        for name, kind, help_text, value in samples:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {value}"]
+        return lines
+
+idempotency_store = IdempotencyStore(
+    max_entries=int(os.getenv('IDEMPOTENCY_CACHE_SIZE', '10000')),
+    ttl=float(os.getenv('IDEMPOTENCY_TTL_SECONDS', '86400'))
+)
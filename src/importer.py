@@ -0,0 +1,450 @@
+import csv
+import json
+import logging
+import os
+import time
+from datetime import date
+import numpy as np
+from .db import db, Hotel, Room, Booking, use_primary, normalize_email
+from .logic import HotelBookingLogic
+from .occupancy import occupancy_index
+from .pricing import pricing_engine
+from .stats import dashboard_stats
+from . import rollups
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('csv', 'ndjson')
+BOOKING_STATUSES = ('confirmed', 'cancelled', 'completed')
+
+# Rows written per transaction
+IMPORT_BATCH_SIZE = 5000
+
+# Rejected records kept (with their line numbers) in each summary
+MAX_REPORTED_ERRORS = 20
+
+# Natural keys of one bookings chunk, joined against bookings to find the
+# stored rows and the confirmed stays they overlap; a row-value IN over
+# thousands of keys scans the whole table
+_booking_keys = db.Table(
+    'import_booking_keys', db.MetaData(),
+    db.Column('room_id', db.Integer),
+    db.Column('guest_email_normalized', db.String(100)),
+    db.Column('check_in_date', db.Date),
+    db.Column('check_out_date', db.Date),
+    prefixes=['TEMPORARY'],
+)
+
+def detect_format(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        return 'csv'
+    if extension in ('.ndjson', '.jsonl', '.json'):
+        return 'ndjson'
+    raise ValueError(f"Cannot tell the format of {path}; pass csv or ndjson")
+
+def read_records(path, format=None):
+    """Stream (line_number, record) pairs from a CSV file with a header row or an NDJSON file
+    
+    record is a dict, or None for an NDJSON line that is not a JSON object.
+    """
+    format = format or detect_format(path)
+    with open(path, newline='', encoding='utf-8-sig') as source:
+        if format == 'csv':
+            reader = csv.DictReader(source)
+            for record in reader:
+                yield reader.line_num, record
+        else:
+            for line_number, line in enumerate(source, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    record = None
+                yield line_number, record if isinstance(record, dict) else None
+
+def _value(record, name, required=True):
+    value = record.get(name)
+    if isinstance(value, str):
+        value = value.strip()
+    if value is None or value == '':
+        if required:
+            raise ValueError(f"{name} is required")
+        return None
+    return value
+
+def _number(record, name, kind, required=True):
+    value = _value(record, name, required)
+    if value is None:
+        return None
+    try:
+        number = kind(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a number, got {value!r}")
+    if number < 0:
+        raise ValueError(f"{name} cannot be negative")
+    return number
+
+def _date(record, *names):
+    for name in names:
+        value = _value(record, name, required=False)
+        if value is not None:
+            try:
+                return date.fromisoformat(str(value))
+            except ValueError:
+                raise ValueError(f"{name} must be a YYYY-MM-DD date, got {value!r}")
+    raise ValueError(f"{names[0]} is required")
+
+def _boolean(record, name, default):
+    value = _value(record, name, required=False)
+    if value is None:
+        return default
+    if isinstance(value, bool):
+        return value
+    if str(value).lower() in ('1', 'true', 'yes', 'y'):
+        return True
+    if str(value).lower() in ('0', 'false', 'no', 'n'):
+        return False
+    raise ValueError(f"{name} must be true or false, got {value!r}")
+
+class CatalogImporter:
+    """Streaming, idempotent import of hotels, rooms and bookings
+    
+    Records are read in chunks of batch_size and each chunk is written in
+    one transaction with executemany INSERT and UPDATE statements. Rows are
+    matched on natural keys, so importing the same file twice changes
+    nothing:
+    
+    - hotels on (name, location)
+    - rooms on (hotel, room_number); the hotel is given as hotel_id or as
+      hotel_name and hotel_location
+    - bookings on (room, guest_email, check_in, check_out), the email
+      compared case-insensitively like guest lookups; the room is given as
+      room_id or as hotel_name, hotel_location and room_number
+      
+    Existing rows are updated only when an imported value differs. Records
+    that fail validation are counted and reported rather than aborting the
+    import, as are bookings that would confirm a stay overlapping another
+    confirmed one of the room. Bookings without a total_price are priced by
+    the pricing engine.
+    
+    The writes bypass the ORM flush events that maintain the daily rollup,
+    dashboard counters, occupancy index and response caches, so call
+    refresh_derived_state() once the files are in.
+    """
+    
+    def __init__(self, batch_size=IMPORT_BATCH_SIZE, progress=None):
+        self.batch_size = batch_size
+        self.progress = progress
+        self._hotels = None
+        self._rooms = None
+        self._hotel_ids = None
+        self._room_ids = None
+        self._catalog_changed = False
+        self._rooms_regrouped = False
+        self._booking_range = None
+    
+    def _load_keys(self):
+        """Natural key -> (id, values) maps of the hotels and rooms already stored"""
+        if self._hotels is not None:
+            return
+        with use_primary():
+            self._hotels = {
+                (name, location): (hotel_id, (name, location, description))
+                for hotel_id, name, location, description in db.session.execute(
+                    db.select(Hotel.id, Hotel.name, Hotel.location, Hotel.description)
+                )
+            }
+            self._rooms = {}
+            for room_id, *values in db.session.execute(db.select(Room.id, *self._room_columns())):
+                self._rooms[(values[0], values[1])] = (room_id, tuple(values))
+        self._hotel_ids = {hotel_id for hotel_id, _ in self._hotels.values()}
+        self._room_ids = {room_id for room_id, _ in self._rooms.values()}
+    
+    @staticmethod
+    def _room_columns():
+        return (Room.hotel_id, Room.room_number, Room.room_type, Room.price_per_night,
+                Room.max_guests, Room.is_available, Room.description)
+    
+    @staticmethod
+    def _booking_columns():
+        return (Booking.room_id, Booking.guest_email, Booking.check_in_date, Booking.check_out_date,
+                Booking.guest_name, Booking.total_price, Booking.status)
+    
+    def _hotel_id(self, record):
+        hotel_id = _number(record, 'hotel_id', int, required=False)
+        if hotel_id is not None:
+            if hotel_id not in self._hotel_ids:
+                raise ValueError(f"Unknown hotel_id {hotel_id}")
+            return hotel_id
+        key = (_value(record, 'hotel_name'), _value(record, 'hotel_location'))
+        if key not in self._hotels:
+            raise ValueError(f"Unknown hotel {key[0]!r} in {key[1]!r}")
+        return self._hotels[key][0]
+    
+    def _parse_hotel(self, record):
+        values = (_value(record, 'name'), _value(record, 'location'), _value(record, 'description', required=False))
+        return values[:2], values
+    
+    def _parse_room(self, record):
+        hotel_id = self._hotel_id(record)
+        values = (
+            hotel_id,
+            str(_value(record, 'room_number')),
+            _value(record, 'room_type'),
+            _number(record, 'price_per_night', float),
+            _number(record, 'max_guests', int),
+            _boolean(record, 'is_available', True),
+            _value(record, 'description', required=False),
+        )
+        if values[4] < 1:
+            raise ValueError("max_guests must be at least 1")
+        return values[:2], values
+    
+    def _parse_booking(self, record):
+        room_id = _number(record, 'room_id', int, required=False)
+        if room_id is None:
+            key = (self._hotel_id(record), str(_value(record, 'room_number')))
+            if key not in self._rooms:
+                raise ValueError(f"Unknown room {key[1]!r} in hotel {key[0]}")
+            room_id = self._rooms[key][0]
+        elif room_id not in self._room_ids:
+            raise ValueError(f"Unknown room_id {room_id}")
+        check_in_date = _date(record, 'check_in', 'check_in_date')
+        check_out_date = _date(record, 'check_out', 'check_out_date')
+        if check_out_date <= check_in_date:
+            raise ValueError("Check-out date must be after check-in date")
+        status = _value(record, 'status', required=False) or 'confirmed'
+        if status not in BOOKING_STATUSES:
+            raise ValueError(f"status must be one of {', '.join(BOOKING_STATUSES)}")
+        values = (
+            room_id,
+            _value(record, 'guest_email'),
+            check_in_date,
+            check_out_date,
+            _value(record, 'guest_name'),
+            _number(record, 'total_price', float, required=False),
+            status,
+        )
+        return (room_id, normalize_email(values[1]), check_in_date, check_out_date), values
+    
+    def import_hotels(self, records):
+        return self._import('hotels', records, self._parse_hotel, self._write_hotels)
+    
+    def import_rooms(self, records):
+        return self._import('rooms', records, self._parse_room, self._write_rooms)
+    
+    def import_bookings(self, records):
+        return self._import('bookings', records, self._parse_booking, self._write_bookings)
+    
+    def import_file(self, kind, path, format=None):
+        """Import a hotels, rooms or bookings file; returns the summary of import_<kind>"""
+        return getattr(self, f'import_{kind}')(read_records(path, format))
+    
+    def _import(self, kind, records, parse, write):
+        """Parse and write records chunk by chunk; returns counts, timing and the first errors"""
+        self._load_keys()
+        summary = {"kind": kind, "read": 0, "inserted": 0, "updated": 0, "unchanged": 0, "rejected": 0, "errors": []}
+        started = time.perf_counter()
+        chunk = {}
+        lines = {}
+        
+        def reject(line_number, error):
+            summary["rejected"] += 1
+            if len(summary["errors"]) < MAX_REPORTED_ERRORS:
+                summary["errors"].append({"line": line_number, "error": error})
+        
+        def flush():
+            # write() drops the records it rejects from the chunk
+            records = len(chunk)
+            inserted, updated, rejected = write(chunk)
+            summary["inserted"] += inserted
+            summary["updated"] += updated
+            summary["unchanged"] += records - inserted - updated - len(rejected)
+            for key, error in rejected:
+                reject(lines[key], error)
+            chunk.clear()
+            lines.clear()
+            if self.progress:
+                self.progress(kind, summary["read"], time.perf_counter() - started)
+        
+        for line_number, record in records:
+            summary["read"] += 1
+            try:
+                if record is None:
+                    raise ValueError("Malformed record")
+                key, values = parse(record)
+            except ValueError as e:
+                reject(line_number, str(e))
+                continue
+            # A key repeated within the file: the last record wins
+            chunk.pop(key, None)
+            chunk[key] = values
+            lines[key] = line_number
+            if len(chunk) >= self.batch_size:
+                flush()
+        if chunk:
+            flush()
+        
+        seconds = time.perf_counter() - started
+        summary["seconds"] = round(seconds, 2)
+        summary["rows_per_sec"] = round(summary["read"] / seconds) if seconds else 0
+        logger.info("Imported %s: %d read, %d inserted, %d updated, %d rejected in %.2fs",
+                    kind, summary["read"], summary["inserted"], summary["updated"], summary["rejected"], seconds)
+        return summary
+    
+    @staticmethod
+    def _split(chunk, existing):
+        """Split chunk into rows to insert and (id, values) pairs whose stored values differ"""
+        inserts, updates = [], []
+        for key, values in chunk.items():
+            stored = existing.get(key)
+            if stored is None:
+                inserts.append(values)
+            elif stored[1] != values:
+                updates.append((stored[0], values))
+        return inserts, updates
+    
+    def _write(self, model, columns, inserts, updates, returning=None):
+        """INSERT and UPDATE one chunk in a single transaction; returns the inserted rows' IDs"""
+        names = [column.key for column in columns]
+        try:
+            ids = []
+            if inserts:
+                rows = [dict(zip(names, values)) for values in inserts]
+                if returning:
+                    ids = db.session.scalars(
+                        db.insert(model).returning(model.id, sort_by_parameter_order=True), rows
+                    ).all()
+                else:
+                    db.session.execute(db.insert(model), rows)
+            if updates:
+                db.session.execute(
+                    db.update(model), [dict(zip(names, values), id=row_id) for row_id, values in updates]
+                )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return ids
+    
+    def _write_hotels(self, chunk):
+        inserts, updates = self._split(chunk, self._hotels)
+        ids = self._write(Hotel, (Hotel.name, Hotel.location, Hotel.description), inserts, updates, returning=True)
+        for hotel_id, values in list(zip(ids, inserts)) + updates:
+            self._hotels[values[:2]] = (hotel_id, values)
+        self._hotel_ids.update(ids)
+        self._catalog_changed |= bool(inserts or updates)
+        return len(inserts), len(updates), []
+    
+    def _write_rooms(self, chunk):
+        inserts, updates = self._split(chunk, self._rooms)
+        ids = self._write(Room, self._room_columns(), inserts, updates, returning=True)
+        # Rollup rows are grouped by the room's type (the hotel is part of the key)
+        self._rooms_regrouped |= any(self._rooms[values[:2]][1][2] != values[2] for _, values in updates)
+        for room_id, values in list(zip(ids, inserts)) + updates:
+            self._rooms[values[:2]] = (room_id, values)
+        self._room_ids.update(ids)
+        if inserts or updates:
+            self._catalog_changed = True
+            # Bookings priced later in this import need the new base prices
+            pricing_engine.invalidate()
+        return len(inserts), len(updates), []
+    
+    @staticmethod
+    def _overlapping(chunk, existing, overlaps):
+        """(key, error) for the chunk rows that would confirm a stay overlapping another confirmed one
+        
+        overlaps maps a key to the IDs of the stored confirmed bookings its
+        stay overlaps. Stays confirmed earlier in the chunk count as well.
+        """
+        # Stored bookings this chunk is about to cancel or complete no longer block
+        released = {existing[key][0] for key, values in chunk.items() if key in existing and values[6] != 'confirmed'}
+        confirmed = {}
+        rejected = []
+        for key, values in chunk.items():
+            stored = existing.get(key)
+            if values[6] != 'confirmed' or (stored is not None and stored[1][6] == 'confirmed'):
+                continue
+            room_id, _, check_in_date, check_out_date = key
+            stays = confirmed.setdefault(room_id, [])
+            blocking = overlaps.get(key, set()) - released - ({stored[0]} if stored else set())
+            if blocking or any(start < check_out_date and end > check_in_date for start, end in stays):
+                rejected.append((key, "Room is not available for the selected dates"))
+            else:
+                stays.append((check_in_date, check_out_date))
+        return rejected
+    
+    def _write_bookings(self, chunk):
+        keys = list(chunk)
+        columns = self._booking_columns()
+        existing = {}
+        overlaps = {}
+        with use_primary():
+            connection = db.session.connection()
+            _booking_keys.create(connection, checkfirst=True)
+            connection.execute(_booking_keys.delete())
+            connection.execute(_booking_keys.insert(), [dict(zip(_booking_keys.c.keys(), key)) for key in keys])
+            rows = connection.execute(
+                db.select(Booking.id, Booking.guest_email_normalized, *columns).join(_booking_keys, db.and_(
+                    Booking.room_id == _booking_keys.c.room_id,
+                    # Lets the join use ix_bookings_room_status_dates past the status column
+                    Booking.status.in_(BOOKING_STATUSES),
+                    Booking.check_in_date == _booking_keys.c.check_in_date,
+                    Booking.check_out_date == _booking_keys.c.check_out_date,
+                    Booking.guest_email_normalized == _booking_keys.c.guest_email_normalized,
+                ))
+            )
+            for booking_id, normalized, *values in rows:
+                existing[(values[0], normalized, values[2], values[3])] = (booking_id, tuple(values))
+            # The same invariant every other write path keeps (and bookings_no_overlap enforces on PostgreSQL)
+            rows = connection.execute(
+                db.select(*_booking_keys.c, Booking.id).join(Booking, db.and_(
+                    Booking.room_id == _booking_keys.c.room_id,
+                    Booking.status == 'confirmed',
+                    Booking.check_in_date < _booking_keys.c.check_out_date,
+                    Booking.check_out_date > _booking_keys.c.check_in_date,
+                ))
+            )
+            for *key, booking_id in rows:
+                overlaps.setdefault(tuple(key), set()).add(booking_id)
+        
+        rejected = self._overlapping(chunk, existing, overlaps)
+        for key, _ in rejected:
+            del chunk[key]
+        
+        # Missing prices are quoted like new bookings
+        unpriced = [key for key, values in chunk.items() if values[5] is None]
+        if unpriced:
+            totals, _ = pricing_engine.quote(*zip(*[(key[0], key[2], key[3]) for key in unpriced]))
+            for key, total in zip(unpriced, totals.tolist()):
+                chunk[key] = chunk[key][:5] + (0.0 if np.isnan(total) else total,) + chunk[key][6:]
+        
+        inserts, updates = self._split(chunk, existing)
+        self._write(Booking, columns, inserts, updates)
+        if inserts or updates:
+            # The dates are part of the key, so updates keep the stored nights
+            changed = inserts + [values for _, values in updates]
+            first = min(values[2] for values in changed)
+            last = max(values[3] for values in changed)
+            if self._booking_range:
+                first, last = min(first, self._booking_range[0]), max(last, self._booking_range[1])
+            self._booking_range = (first, last)
+        return len(inserts), len(updates), rejected
+    
+    def refresh_derived_state(self):
+        """Rebuild what booking and catalog writes normally maintain through flush events"""
+        if self._catalog_changed:
+            HotelBookingLogic.invalidate_catalog()
+        if self._rooms_regrouped:
+            rollups.backfill()
+        elif self._booking_range:
+            rollups.backfill(*self._booking_range)
+        if self._catalog_changed or self._booking_range:
+            dashboard_stats.load()
+            if occupancy_index.enabled and occupancy_index.loaded:
+                occupancy_index.load()
+        db.session.remove()
+        self._catalog_changed = self._rooms_regrouped = False
+        self._booking_range = None
@@ -0,0 +1,224 @@
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+from .db import db, Booking
+from .idempotency import idempotency_store
+from .occupancy import occupancy_index
+from .partitions import archive_partitions
+
+logger = logging.getLogger(__name__)
+
+# Statuses a booking ends in; only these are archived
+FINISHED_STATUSES = ('completed', 'cancelled')
+
+class BookingLifecycle:
+    """Background job that moves bookings through the end of their life
+    
+    Every `interval` seconds a daemon thread marks confirmed bookings whose
+    check-out date has arrived as completed, and, when archive_after_days is
+    set, moves completed and cancelled bookings that checked out more than
+    that many days ago into the archive partitions (src/partitions.py). Both
+    steps work in batches of batch_size rows, one short transaction each, so
+    booking writes are never blocked for long. Each run also purges expired
+    Idempotency-Keys (src/idempotency.py).
+    
+    Completed stays drop out of the status = 'confirmed' range of the overlap
+    index, so conflict and availability queries stop reading past stays.
+    Revenue and the daily rollup count confirmed and completed stays alike,
+    so completing a stay changes neither; archived rows are read by counter
+    reloads and rollup rebuilds. Archived bookings are no longer returned by
+    the booking endpoints.
+    
+    The updates are bulk statements that bypass the session listeners, so
+    completed stays are removed from the occupancy index here.
+    """
+    
+    def __init__(self, enabled=True, interval=3600, batch_size=1000, archive_after_days=0):
+        self.enabled = enabled
+        self.interval = interval
+        self.batch_size = batch_size
+        self.archive_after_days = archive_after_days
+        self.runs = 0
+        self.errors = 0
+        self.completed = 0
+        self.archived = 0
+        self.last_run = None
+        self._lock = threading.Lock()
+        self._run_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+    
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+    
+    def start(self, app):
+        """Run the job now and then every interval seconds, in app's context"""
+        with self._lock:
+            if self.running:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, args=(app,), name='booking-lifecycle', daemon=True)
+            self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join()
+        self._thread = None
+        # Let run_once work again when called directly
+        self._stop.clear()
+    
+    def _run(self, app):
+        while True:
+            with app.app_context():
+                try:
+                    self.run_once()
+                except Exception:
+                    with self._lock:
+                        self.errors += 1
+                    logger.exception("Booking lifecycle run failed")
+                finally:
+                    db.session.remove()
+            if self._stop.wait(self.interval):
+                return
+    
+    def run_once(self, today=None):
+        """Complete past stays, archive old finished bookings and purge expired idempotency keys; returns what was done"""
+        today = today or date.today()
+        # Runs from the scheduler and the admin endpoint never overlap
+        with self._run_lock:
+            started = time.perf_counter()
+            completed = self._complete_past_stays(today)
+            archived = 0
+            if self.archive_after_days:
+                archived = self._archive_finished(today - timedelta(days=self.archive_after_days))
+            expired_keys = idempotency_store.purge()
+            seconds = time.perf_counter() - started
+        
+        with self._lock:
+            self.runs += 1
+            self.completed += completed
+            self.archived += archived
+            self.last_run = {
+                "finished_at": time.time(),
+                "seconds": round(seconds, 3),
+                "completed": completed,
+                "archived": archived,
+                "expired_idempotency_keys": expired_keys,
+            }
+        if completed or archived:
+            logger.info("Completed %d past stays and archived %d bookings in %.2fs", completed, archived, seconds)
+        return dict(self.last_run)
+    
+    def _complete_past_stays(self, today):
+        bookings = Booking.__table__
+        completed = 0
+        finished = []
+        try:
+            # stop() ends a long run between batches
+            while not self._stop.is_set():
+                with db.engine.begin() as connection:
+                    stays = connection.execute(
+                        db.select(bookings.c.room_id, bookings.c.id, bookings.c.check_in_date).where(
+                            bookings.c.status == 'confirmed', bookings.c.check_out_date <= today
+                        ).limit(self.batch_size)
+                    ).all()
+                    if not stays:
+                        break
+                    # A booking cancelled since the SELECT keeps its status
+                    result = connection.execute(
+                        bookings.update().where(
+                            bookings.c.id.in_([booking_id for _, booking_id, _ in stays]),
+                            bookings.c.status == 'confirmed'
+                        ).values(status='completed')
+                    )
+                    completed += result.rowcount
+                finished += stays
+                if len(stays) < self.batch_size:
+                    break
+        finally:
+            # Past stays never make a room unavailable, so the index can catch
+            # up once per run (each room is rebuilt once) instead of per batch
+            occupancy_index.remove_stays(finished)
+        return completed
+    
+    def _archive_finished(self, cutoff):
+        """Move finished bookings that checked out before cutoff into their archive partitions"""
+        bookings = Booking.__table__
+        finished = db.and_(bookings.c.status.in_(FINISHED_STATUSES), bookings.c.check_out_date < cutoff)
+        with db.engine.connect() as connection:
+            first = connection.scalar(db.select(db.func.min(bookings.c.check_out_date)).where(finished))
+        if first is None:
+            return 0
+        archive_partitions.ensure(first, cutoff - timedelta(days=1))
+        
+        columns = [column.name for column in bookings.columns]
+        archived = 0
+        while not self._stop.is_set():
+            with db.engine.begin() as connection:
+                rows = connection.execute(
+                    db.select(bookings.c.id, bookings.c.check_out_date).where(finished).limit(self.batch_size)
+                ).all()
+                if not rows:
+                    break
+                partitions = defaultdict(list)
+                for booking_id, check_out_date in rows:
+                    partitions[archive_partitions.table_for(check_out_date)].append(booking_id)
+                for partition, ids in partitions.items():
+                    # In WAL mode a transaction is only atomic per attached file, so a
+                    # crash can leave rows copied but not deleted; the next run copies
+                    # them again over the first copies
+                    connection.execute(partition.insert().prefix_with('OR REPLACE', dialect='sqlite').from_select(
+                        columns, db.select(*bookings.columns).where(bookings.c.id.in_(ids))
+                    ))
+                connection.execute(bookings.delete().where(bookings.c.id.in_([booking_id for booking_id, _ in rows])))
+                archived += len(rows)
+            if len(rows) < self.batch_size:
+                break
+        return archived
+    
+    def snapshot(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "running": self.running,
+                "interval_seconds": self.interval,
+                "batch_size": self.batch_size,
+                "archive_after_days": self.archive_after_days,
+                "runs": self.runs,
+                "errors": self.errors,
+                "completed": self.completed,
+                "archived": self.archived,
+                "last_run": dict(self.last_run) if self.last_run else None,
+            }
+    
+    def metrics(self):
+        """Job counters as Prometheus samples"""
+        status = self.snapshot()
+        last_run = status["last_run"] or {}
+        samples = [
+            ('booking_lifecycle_runs_total', 'counter', "Booking lifecycle job runs", status["runs"]),
+            ('booking_lifecycle_errors_total', 'counter', "Booking lifecycle job runs that failed", status["errors"]),
+            ('booking_lifecycle_completed_total', 'counter', "Past stays marked completed", status["completed"]),
+            ('booking_lifecycle_archived_total', 'counter', "Bookings moved to the archive", status["archived"]),
+            ('booking_lifecycle_last_run_timestamp_seconds', 'gauge', "When the last run finished",
+             last_run.get("finished_at", 0)),
+            ('booking_lifecycle_last_run_duration_seconds', 'gauge', "How long the last run took",
+             last_run.get("seconds", 0)),
+        ]
+        lines = []
+        for name, kind, help_text, value in samples:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {value}"]
+        return lines
+
+booking_lifecycle = BookingLifecycle(
+    enabled=os.getenv('LIFECYCLE_ENABLED', '1') != '0',
+    interval=float(os.getenv('LIFECYCLE_INTERVAL_SECONDS', '3600')),
+    batch_size=int(os.getenv('LIFECYCLE_BATCH_SIZE', '1000')),
+    archive_after_days=int(os.getenv('LIFECYCLE_ARCHIVE_AFTER_DAYS', '0'))
+)
@@ -1,102 +1,430 @@
-from datetime import datetime, date
-from .db import db, Hotel, Room, Booking, hotel_schema, room_schema, booking_schema, rooms_schema, bookings_schema
+import base64
+import calendar
+import hashlib
+import json
+import numpy as np
+from datetime import datetime, date, timedelta
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+from .db import (db, Hotel, Room, Booking, HotelSchema, RoomSchema, schema_for, read_only, use_replica,
+                 use_primary, record_write, wrote_recently, normalize_email,
+                 hotel_schema, room_schema, booking_schema, rooms_schema, bookings_schema)
+from .cache import catalog_cache, availability_cache
+from .occupancy import occupancy_index
+from .partitions import archive_partitions
+from .stats import dashboard_stats
+from .pricing import pricing_engine
+from . import rollups
+
+# Longest date range /api/reports/occupancy answers in one request
+MAX_REPORT_DAYS = 3660
+
+# Longest stay /api/calculate-price quotes
+MAX_QUOTE_NIGHTS = 365
 
 class HotelBookingLogic:
     @staticmethod
-    def get_all_hotels():
+    def _encode_cursor(values):
+        """Encode keyset pagination values as an opaque cursor string"""
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+    
+    @staticmethod
+    def _decode_cursor(cursor, types):
+        """Decode a cursor produced by _encode_cursor, one value per entry of `types`
+        
+        Each value must be an instance of its entry (a type or tuple of types);
+        raises ValueError if the cursor is invalid.
+        """
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except (ValueError, TypeError):
+            raise ValueError("Invalid cursor")
+        if not isinstance(values, list) or len(values) != len(types) or any(
+            isinstance(value, bool) or not isinstance(value, value_type) for value, value_type in zip(values, types)
+        ):
+            raise ValueError("Invalid cursor")
+        return values
+    
+    @staticmethod
+    def _overlaps(check_in_date, check_out_date):
+        """Filter for bookings whose stay overlaps the given [check_in, check_out) range"""
+        return db.and_(
+            Booking.check_in_date < check_out_date,
+            Booking.check_out_date > check_in_date
+        )
+    
+    @staticmethod
+    def _eager_options(model, expand):
+        """Loader options for the relationships a response will expand"""
+        options = []
+        if model is Hotel and 'rooms' in expand:
+            options.append(db.selectinload(Hotel.rooms))
+        elif model is Room and 'hotel' in expand:
+            options.append(db.joinedload(Room.hotel))
+        elif model is Booking and 'hotel' in expand:
+            options.append(db.joinedload(Booking.room).joinedload(Room.hotel))
+        elif model is Booking and 'room' in expand:
+            options.append(db.joinedload(Booking.room))
+        return options
+    
+    @staticmethod
+    @read_only
+    def get_all_hotels(expand=()):
         """Get all hotels"""
-        hotels = Hotel.query.all()
+        hotels = Hotel.query.options(*HotelBookingLogic._eager_options(Hotel, expand)).all()
         return hotels
     
     @staticmethod
-    def get_hotel_by_id(hotel_id):
+    @read_only
+    def get_hotel_by_id(hotel_id, expand=()):
         """Get hotel by ID"""
-        hotel = Hotel.query.get(hotel_id)
+        hotel = db.session.get(Hotel, hotel_id, options=HotelBookingLogic._eager_options(Hotel, expand))
         return hotel
     
     @staticmethod
-    def get_rooms_by_hotel(hotel_id):
+    @read_only
+    def get_rooms_by_hotel(hotel_id, expand=()):
         """Get all rooms for a specific hotel"""
-        rooms = Room.query.filter_by(hotel_id=hotel_id).all()
+        rooms = Room.query.filter_by(hotel_id=hotel_id).options(*HotelBookingLogic._eager_options(Room, expand)).all()
         return rooms
     
     @staticmethod
-    def get_room_by_id(room_id):
+    @read_only
+    def get_room_by_id(room_id, expand=()):
         """Get room by ID"""
-        room = Room.query.get(room_id)
+        room = db.session.get(Room, room_id, options=HotelBookingLogic._eager_options(Room, expand))
         return room
     
     @staticmethod
-    def get_available_rooms(hotel_id, check_in, check_out, guests=1):
+    def _catalog_entry(key, load):
+        """Serialized catalog payload and its ETag, served from catalog_cache when possible
+        
+        load() returns the payload to cache, or None if the row does not exist;
+        misses are not cached so a newly created row shows up immediately.
+        """
+        entry = catalog_cache.get_or_load(key, lambda: HotelBookingLogic._with_etag(load()))
+        return entry if entry is not None else (None, None)
+    
+    @staticmethod
+    def _with_etag(payload):
+        """Pair a serialized payload with a strong ETag of its JSON form, or None for a missing row"""
+        if payload is None:
+            return None
+        body = json.dumps(payload, sort_keys=True, separators=(',', ':'))
+        return payload, hashlib.sha1(body.encode()).hexdigest()
+    
+    @staticmethod
+    def get_all_hotels_payload(expand=frozenset()):
+        """Get all hotels serialized, as (payload, etag)"""
+        return HotelBookingLogic._catalog_entry(
+            ('hotels', expand),
+            lambda: schema_for(HotelSchema, expand, many=True).dump(HotelBookingLogic.get_all_hotels(expand))
+        )
+    
+    @staticmethod
+    def get_hotel_payload(hotel_id, expand=frozenset()):
+        """Get a hotel serialized, as (payload, etag); (None, None) if not found"""
+        def load():
+            hotel = HotelBookingLogic.get_hotel_by_id(hotel_id, expand)
+            return schema_for(HotelSchema, expand).dump(hotel) if hotel else None
+        return HotelBookingLogic._catalog_entry(('hotel', hotel_id, expand), load)
+    
+    @staticmethod
+    def get_hotel_rooms_payload(hotel_id, expand=frozenset()):
+        """Get the rooms of a hotel serialized, as (payload, etag)"""
+        return HotelBookingLogic._catalog_entry(
+            ('hotel_rooms', hotel_id, expand),
+            lambda: schema_for(RoomSchema, expand, many=True).dump(HotelBookingLogic.get_rooms_by_hotel(hotel_id, expand))
+        )
+    
+    @staticmethod
+    def get_room_payload(room_id, expand=frozenset()):
+        """Get a room serialized, as (payload, etag); (None, None) if not found"""
+        def load():
+            room = HotelBookingLogic.get_room_by_id(room_id, expand)
+            return schema_for(RoomSchema, expand).dump(room) if room else None
+        return HotelBookingLogic._catalog_entry(('room', room_id, expand), load)
+    
+    @staticmethod
+    def invalidate_catalog():
+        """Drop cached hotel and room payloads, e.g. after writing catalog rows outside the ORM"""
+        catalog_cache.clear()
+        availability_cache.clear()
+        pricing_engine.invalidate()
+    
+    @staticmethod
+    def _invalidate_availability(stays):
+        """Drop cached availability overlapping any of the (hotel_id, check_in, check_out) stays"""
+        by_hotel = {}
+        for hotel_id, check_in_date, check_out_date in stays:
+            by_hotel.setdefault(hotel_id, []).append((check_in_date, check_out_date))
+        for hotel_id, ranges in by_hotel.items():
+            # Keys are ('available_rooms', hotel_id, check_in, check_out, guests, expand)
+            availability_cache.invalidate(
+                hotel_id,
+                lambda key: any(key[2] < end and key[3] > start for start, end in ranges)
+            )
+    
+    @staticmethod
+    def _candidate_rooms_statement(hotel_id, guests, expand=()):
+        """SELECT of the bookable rooms of a hotel that fit the party, ignoring bookings"""
+        return db.select(Room).where(
+            Room.hotel_id == hotel_id,
+            Room.is_available == True,
+            Room.max_guests >= guests
+        ).options(*HotelBookingLogic._eager_options(Room, expand))
+    
+    @staticmethod
+    def _available_rooms_statement(hotel_id, check_in_date, check_out_date, guests, expand=()):
+        """SELECT of the available rooms as a single anti-join"""
+        # A room is available when no overlapping confirmed booking matches it
+        return HotelBookingLogic._candidate_rooms_statement(hotel_id, guests, expand).outerjoin(Booking, db.and_(
+            Booking.room_id == Room.id,
+            Booking.status == 'confirmed',
+            HotelBookingLogic._overlaps(check_in_date, check_out_date)
+        )).where(Booking.id.is_(None))
+    
+    @staticmethod
+    def _conflict_statement(room_id, check_in_date, check_out_date):
+        """SELECT of one confirmed booking of the room overlapping the given dates"""
+        return db.select(Booking.id).where(
+            Booking.room_id == room_id,
+            Booking.status == 'confirmed',
+            HotelBookingLogic._overlaps(check_in_date, check_out_date)
+        ).limit(1)
+    
+    @staticmethod
+    def _query_available_rooms(hotel_id, check_in_date, check_out_date, guests, expand=()):
+        """Resolve available rooms in SQL with a single anti-join"""
+        return db.session.scalars(
+            HotelBookingLogic._available_rooms_statement(hotel_id, check_in_date, check_out_date, guests, expand)
+        ).all()
+    
+    @staticmethod
+    def _has_conflict(room_id, check_in_date, check_out_date):
+        """Check whether a room has a confirmed booking overlapping the given dates"""
+        conflicting_booking = db.session.scalar(
+            HotelBookingLogic._conflict_statement(room_id, check_in_date, check_out_date)
+        )
+        return conflicting_booking is not None
+    
+    @staticmethod
+    def _lock_rooms(room_ids):
+        """Load rooms by ID and serialize bookings for them until the transaction ends"""
+        query = Room.query.filter(Room.id.in_(room_ids))
+        if db.session.get_bind().dialect.name == 'sqlite':
+            # SQLite has no row locks: take the database write lock up front so
+            # the conflict check and the insert run as one serialized unit
+            db.session.execute(db.text('BEGIN IMMEDIATE'))
+            query = query.populate_existing()
+        else:
+            # SELECT ... FOR UPDATE on the room rows, in ID order to avoid deadlocks
+            query = query.order_by(Room.id).with_for_update()
+        return {room.id: room for room in query}
+    
+    @staticmethod
+    def _lock_room(room_id):
+        """Load a room and serialize bookings for it until the transaction ends"""
+        return HotelBookingLogic._lock_rooms([room_id]).get(room_id)
+    
+    @staticmethod
+    def parse_room_id(value):
+        """Accept an integer room_id or its decimal string, returning (room_id, error)"""
+        if isinstance(value, str) and value.strip().isdigit():
+            value = int(value)
+        if not isinstance(value, int) or isinstance(value, bool):
+            return None, "room_id must be an integer"
+        return value, None
+    
+    @staticmethod
+    def _validate_stay(check_in, check_out):
+        """Parse and validate booking dates, returning (check_in_date, check_out_date, error)"""
+        # Convert string dates to date objects if necessary
+        check_in_date = datetime.strptime(check_in, '%Y-%m-%d').date() if isinstance(check_in, str) else check_in
+        check_out_date = datetime.strptime(check_out, '%Y-%m-%d').date() if isinstance(check_out, str) else check_out
+        
+        # Validate dates
+        if check_in_date >= check_out_date:
+            return check_in_date, check_out_date, "Check-out date must be after check-in date"
+        
+        if check_in_date < date.today():
+            return check_in_date, check_out_date, "Check-in date cannot be in the past"
+        
+        return check_in_date, check_out_date, None
+    
+    @staticmethod
+    @read_only
+    def get_available_rooms(hotel_id, check_in, check_out, guests=1, expand=()):
         """Get available rooms for given dates and number of guests"""
         check_in_date = datetime.strptime(check_in, '%Y-%m-%d').date() if isinstance(check_in, str) else check_in
         check_out_date = datetime.strptime(check_out, '%Y-%m-%d').date() if isinstance(check_out, str) else check_out
         
-        # Find rooms that are available and can accommodate the number of guests
-        available_rooms = Room.query.filter(
+        if not occupancy_index.enabled:
+            return HotelBookingLogic._query_available_rooms(hotel_id, check_in_date, check_out_date, guests, expand)
+        
+        # Fetch candidate rooms and drop the occupied ones using the in-memory index
+        occupancy_index.ensure_loaded()
+        candidate_rooms = db.session.scalars(
+            HotelBookingLogic._candidate_rooms_statement(hotel_id, guests, expand)
+        ).all()
+        free_ids = set(occupancy_index.free_room_ids(
+            [room.id for room in candidate_rooms], check_in_date, check_out_date
+        ))
+        available_rooms = [room for room in candidate_rooms if room.id in free_ids]
+        
+        if occupancy_index.verify:
+            # Compare with the primary, which the index tracks; a lagging replica would differ
+            with use_primary():
+                db_available_rooms = HotelBookingLogic._query_available_rooms(hotel_id, check_in_date, check_out_date, guests, expand)
+            index_ids = sorted(room.id for room in available_rooms)
+            db_ids = sorted(room.id for room in db_available_rooms)
+            if index_ids != db_ids:
+                occupancy_index.report_mismatch("get_available_rooms", index_ids, db_ids)
+                return db_available_rooms
+        
+        return available_rooms
+    
+    @staticmethod
+    def get_available_rooms_payload(hotel_id, check_in, check_out, guests=1, expand=frozenset()):
+        """Get available rooms serialized, served from availability_cache when possible"""
+        check_in_date = datetime.strptime(check_in, '%Y-%m-%d').date() if isinstance(check_in, str) else check_in
+        check_out_date = datetime.strptime(check_out, '%Y-%m-%d').date() if isinstance(check_out, str) else check_out
+        
+        return availability_cache.get_or_load(
+            ('available_rooms', hotel_id, check_in_date, check_out_date, guests, expand),
+            lambda: schema_for(RoomSchema, expand, many=True).dump(
+                HotelBookingLogic.get_available_rooms(hotel_id, check_in_date, check_out_date, guests, expand)
+            ),
+            tag=hotel_id
+        )
+    
+    @staticmethod
+    @read_only
+    def get_availability_calendar(hotel_id, year, month, guests=1):
+        """Get the number of free rooms for each night of a month"""
+        first_day = date(year, month, 1)
+        days = calendar.monthrange(year, month)[1]
+        
+        room_ids = [room_id for (room_id,) in db.session.query(Room.id).filter(
             Room.hotel_id == hotel_id,
             Room.is_available == True,
             Room.max_guests >= guests
-        ).all()
+        )]
         
-        # Filter out rooms that have conflicting bookings
-        final_available_rooms = []
-        for room in available_rooms:
-            conflicting_booking = Booking.query.filter(
-                Booking.room_id == room.id,
+        if occupancy_index.enabled:
+            occupancy_index.ensure_loaded()
+            free_rooms = occupancy_index.free_counts(room_ids, first_day, days)
+        else:
+            # Mark occupied nights from the confirmed stays overlapping the month
+            occupied = [set() for _ in range(days)]
+            stays = db.session.query(Booking.room_id, Booking.check_in_date, Booking.check_out_date).join(Room).filter(
+                Room.id.in_(room_ids),
                 Booking.status == 'confirmed',
-                db.or_(
-                    db.and_(Booking.check_in_date <= check_in_date, Booking.check_out_date > check_in_date),
-                    db.and_(Booking.check_in_date < check_out_date, Booking.check_out_date >= check_out_date),
-                    db.and_(Booking.check_in_date >= check_in_date, Booking.check_out_date <= check_out_date)
-                )
-            ).first()
-            
-            if not conflicting_booking:
-                final_available_rooms.append(room)
+                HotelBookingLogic._overlaps(first_day, first_day + timedelta(days=days))
+            )
+            for room_id, check_in_date, check_out_date in stays:
+                for night in range(max((check_in_date - first_day).days, 0), min((check_out_date - first_day).days, days)):
+                    occupied[night].add(room_id)
+            free_rooms = [len(room_ids) - len(rooms) for rooms in occupied]
         
-        return final_available_rooms
+        return {
+            "hotel_id": hotel_id,
+            "month": first_day.strftime('%Y-%m'),
+            "total_rooms": len(room_ids),
+            "days": [
+                {"date": (first_day + timedelta(days=night)).isoformat(), "free_rooms": free_rooms[night]}
+                for night in range(days)
+            ]
+        }
     
     @staticmethod
-    def create_booking(room_id, guest_name, guest_email, check_in, check_out):
-        """Create a new booking"""
+    @read_only
+    def search_available_rooms(check_in, check_out, guests=1, location=None, min_price=None, max_price=None,
+                               room_type=None, limit=20, cursor=None):
+        """Search available rooms across all hotels, cheapest first, one page at a time"""
+        check_in_date = datetime.strptime(check_in, '%Y-%m-%d').date() if isinstance(check_in, str) else check_in
+        check_out_date = datetime.strptime(check_out, '%Y-%m-%d').date() if isinstance(check_out, str) else check_out
+        
+        # One query: filters, anti-join on overlapping confirmed bookings and
+        # keyset pagination on (price_per_night, id)
+        query = Room.query.join(Room.hotel).outerjoin(Booking, db.and_(
+            Booking.room_id == Room.id,
+            Booking.status == 'confirmed',
+            HotelBookingLogic._overlaps(check_in_date, check_out_date)
+        )).filter(
+            Room.is_available == True,
+            Room.max_guests >= guests,
+            Booking.id.is_(None)
+        ).options(db.contains_eager(Room.hotel))
+        
+        if location:
+            query = query.filter(Hotel.location.ilike(f"%{location}%"))
+        if room_type:
+            query = query.filter(Room.room_type.ilike(room_type))
+        if min_price is not None:
+            query = query.filter(Room.price_per_night >= min_price)
+        if max_price is not None:
+            query = query.filter(Room.price_per_night <= max_price)
+        if cursor:
+            last_price, last_id = HotelBookingLogic._decode_cursor(cursor, ((int, float), int))
+            query = query.filter(db.tuple_(Room.price_per_night, Room.id) > (last_price, last_id))
+        
+        # Fetch one extra row to know whether another page exists
+        rooms = query.order_by(Room.price_per_night, Room.id).limit(limit + 1).all()
+        
+        next_cursor = None
+        if len(rooms) > limit:
+            rooms = rooms[:limit]
+            next_cursor = HotelBookingLogic._encode_cursor([rooms[-1].price_per_night, rooms[-1].id])
+        
+        return rooms, next_cursor
+    
+    @staticmethod
+    def create_booking(room_id, guest_name, guest_email, check_in, check_out, idempotent=None):
+        """Create a new booking
+        
+        idempotent (a src.idempotency.IdempotentRequest) stores the key and the
+        response in the booking's transaction, so one key never books twice.
+        """
         try:
-            # Convert string dates to date objects if necessary
-            check_in_date = datetime.strptime(check_in, '%Y-%m-%d').date() if isinstance(check_in, str) else check_in
-            check_out_date = datetime.strptime(check_out, '%Y-%m-%d').date() if isinstance(check_out, str) else check_out
+            check_in_date, check_out_date, error = HotelBookingLogic._validate_stay(check_in, check_out)
+            if error:
+                return None, error
             
-            # Validate dates
-            if check_in_date >= check_out_date:
-                return None, "Check-out date must be after check-in date"
+            # The index misses writes made by other processes until it reloads,
+            # so it never refuses a booking; the locked check below decides
+            index_free = None
+            if occupancy_index.enabled:
+                occupancy_index.ensure_loaded()
+                index_free = occupancy_index.is_free(room_id, check_in_date, check_out_date)
             
-            if check_in_date < date.today():
-                return None, "Check-in date cannot be in the past"
-            
-            # Get room and calculate total price
-            room = Room.query.get(room_id)
+            # Get and lock the room; the lock is released by the commit or rollback below
+            db.session.rollback()
+            room = HotelBookingLogic._lock_room(room_id)
             if not room:
+                db.session.rollback()
                 return None, "Room not found"
             
             if not room.is_available:
+                db.session.rollback()
                 return None, "Room is not available"
             
-            # Check for conflicting bookings
-            conflicting_booking = Booking.query.filter(
-                Booking.room_id == room_id,
-                Booking.status == 'confirmed',
-                db.or_(
-                    db.and_(Booking.check_in_date <= check_in_date, Booking.check_out_date > check_in_date),
-                    db.and_(Booking.check_in_date < check_out_date, Booking.check_out_date >= check_out_date),
-                    db.and_(Booking.check_in_date >= check_in_date, Booking.check_out_date <= check_out_date)
-                )
-            ).first()
-            
-            if conflicting_booking:
+            # Check for conflicting bookings while holding the lock
+            if HotelBookingLogic._has_conflict(room_id, check_in_date, check_out_date):
+                db.session.rollback()
+                if occupancy_index.verify and index_free:
+                    occupancy_index.report_mismatch("create_booking", False, True)
                 return None, "Room is not available for the selected dates"
             
-            # Calculate number of nights and total price
-            nights = (check_out_date - check_in_date).days
-            total_price = room.price_per_night * nights
+            if index_free is False:
+                # Freed elsewhere, e.g. cancelled by another worker: reload the index
+                occupancy_index.expire()
+                if occupancy_index.verify:
+                    occupancy_index.report_mismatch("create_booking", True, False)
+            
+            total_price = pricing_engine.stay_price(room.price_per_night, check_in_date, check_out_date)
             
             # Create booking
             booking = Booking(
@@ -109,25 +437,203 @@ class HotelBookingLogic:
                 status='confirmed'
             )
             
+            hotel_id = room.hotel_id
             db.session.add(booking)
+            if idempotent is not None:
+                db.session.flush()
+                idempotent.record(db.session, booking)
             db.session.commit()
+            record_write(guest_email)
+            occupancy_index.add(booking)
+            HotelBookingLogic._invalidate_availability([(hotel_id, check_in_date, check_out_date)])
+            if idempotent is not None:
+                idempotent.remember()
             
             return booking, None
             
+        except IntegrityError as e:
+            db.session.rollback()
+            # exclusion_violation from the PostgreSQL bookings_no_overlap constraint
+            if getattr(e.orig, 'pgcode', None) == '23P01':
+                return None, "Room is not available for the selected dates"
+            return None, f"Error creating booking: {str(e)}"
         except Exception as e:
             db.session.rollback()
             return None, f"Error creating booking: {str(e)}"
     
     @staticmethod
-    def get_all_bookings():
+    def _abort_bulk(results):
+        """Mark the valid items of a rejected all-or-nothing batch as not created"""
+        return [result or (None, "Not created: another booking in the batch failed") for result in results]
+    
+    @staticmethod
+    def create_bookings_bulk(items, atomic=True):
+        """Create many bookings in one transaction
+        
+        Returns one (booking, error) pair per item, in order. With atomic=True
+        nothing is inserted unless every item is valid and conflict-free;
+        otherwise the valid items are inserted and the rest report an error.
+        """
+        results = [None] * len(items)
+        stays = {}
+        
+        # Validate every item before touching the database
+        for i, item in enumerate(items):
+            missing = [field for field in ('room_id', 'guest_name', 'guest_email', 'check_in', 'check_out') if field not in item]
+            if missing:
+                results[i] = (None, f"Missing required field: {missing[0]}")
+                continue
+            room_id, error = HotelBookingLogic.parse_room_id(item['room_id'])
+            if error:
+                results[i] = (None, error)
+                continue
+            try:
+                check_in_date, check_out_date, error = HotelBookingLogic._validate_stay(item['check_in'], item['check_out'])
+            except (ValueError, TypeError):
+                error = "Invalid date format. Use YYYY-MM-DD"
+            if error:
+                results[i] = (None, error)
+                continue
+            stays[i] = (room_id, check_in_date, check_out_date)
+        
+        if atomic and len(stays) < len(items):
+            return HotelBookingLogic._abort_bulk(results)
+        if not stays:
+            return results
+        
+        try:
+            room_ids = sorted({room_id for room_id, _, _ in stays.values()})
+            db.session.rollback()
+            rooms = HotelBookingLogic._lock_rooms(room_ids)
+            
+            # One query for every confirmed booking that could conflict with the batch
+            taken = {}
+            existing = db.session.query(Booking.room_id, Booking.check_in_date, Booking.check_out_date).filter(
+                Booking.room_id.in_(room_ids),
+                Booking.status == 'confirmed',
+                HotelBookingLogic._overlaps(
+                    min(check_in_date for _, check_in_date, _ in stays.values()),
+                    max(check_out_date for _, _, check_out_date in stays.values())
+                )
+            )
+            for room_id, check_in_date, check_out_date in existing:
+                taken.setdefault(room_id, []).append((check_in_date, check_out_date))
+            
+            bookings = {}
+            for i, (room_id, check_in_date, check_out_date) in stays.items():
+                room = rooms.get(room_id)
+                if not room:
+                    results[i] = (None, "Room not found")
+                elif not room.is_available:
+                    results[i] = (None, "Room is not available")
+                elif any(start < check_out_date and end > check_in_date for start, end in taken.get(room_id, [])):
+                    results[i] = (None, "Room is not available for the selected dates")
+                else:
+                    # Later items in the batch must not overlap this one either
+                    taken.setdefault(room_id, []).append((check_in_date, check_out_date))
+                    bookings[i] = Booking(
+                        room_id=room_id,
+                        guest_name=items[i]['guest_name'],
+                        guest_email=items[i]['guest_email'],
+                        check_in_date=check_in_date,
+                        check_out_date=check_out_date,
+                        status='confirmed'
+                    )
+            
+            # Price every accepted stay in one batched call
+            if bookings:
+                totals = pricing_engine.stay_prices(
+                    [rooms[booking.room_id].price_per_night for booking in bookings.values()],
+                    [booking.check_in_date for booking in bookings.values()],
+                    [booking.check_out_date for booking in bookings.values()]
+                )
+                for booking, total_price in zip(bookings.values(), totals):
+                    booking.total_price = float(total_price)
+            
+            if atomic and len(bookings) < len(stays):
+                db.session.rollback()
+                return HotelBookingLogic._abort_bulk(results)
+            
+            changed = [
+                (rooms[booking.room_id].hotel_id, booking.check_in_date, booking.check_out_date)
+                for booking in bookings.values()
+            ]
+            db.session.add_all(bookings.values())
+            db.session.commit()
+            
+            for i, booking in bookings.items():
+                record_write(items[i]['guest_email'])
+                occupancy_index.add(booking)
+                results[i] = (booking, None)
+            HotelBookingLogic._invalidate_availability(changed)
+            return results
+        
+        except Exception as e:
+            db.session.rollback()
+            error = f"Error creating bookings: {str(e)}"
+            return [result if result and result[1] else (None, error) for result in results]
+    
+    @staticmethod
+    @read_only
+    def get_all_bookings(expand=()):
         """Get all bookings"""
-        bookings = Booking.query.all()
+        bookings = Booking.query.options(*HotelBookingLogic._eager_options(Booking, expand)).all()
         return bookings
     
     @staticmethod
-    def get_booking_by_id(booking_id):
+    def _filtered_bookings(status=None, hotel_id=None, date_from=None, date_to=None, expand=()):
+        """Bookings query with optional status, hotel and stay-date filters, in ID order"""
+        query = Booking.query.options(*HotelBookingLogic._eager_options(Booking, expand))
+        if status:
+            query = query.filter(Booking.status == status)
+        if hotel_id is not None:
+            query = query.join(Room, Booking.room_id == Room.id).filter(Room.hotel_id == hotel_id)
+        # Keep bookings whose stay overlaps [date_from, date_to)
+        if date_from:
+            query = query.filter(Booking.check_out_date > date_from)
+        if date_to:
+            query = query.filter(Booking.check_in_date < date_to)
+        return query.order_by(Booking.id)
+    
+    @staticmethod
+    @read_only
+    def get_bookings_page(status=None, hotel_id=None, date_from=None, date_to=None, limit=50, cursor=None, expand=()):
+        """Get one page of bookings using keyset pagination on the booking ID"""
+        query = HotelBookingLogic._filtered_bookings(status, hotel_id, date_from, date_to, expand)
+        if cursor:
+            (last_id,) = HotelBookingLogic._decode_cursor(cursor, (int,))
+            query = query.filter(Booking.id > last_id)
+        
+        # Fetch one extra row to know whether another page exists
+        bookings = query.limit(limit + 1).all()
+        
+        next_cursor = None
+        if len(bookings) > limit:
+            bookings = bookings[:limit]
+            next_cursor = HotelBookingLogic._encode_cursor([bookings[-1].id])
+        
+        return bookings, next_cursor
+    
+    @staticmethod
+    def iter_bookings(status=None, hotel_id=None, date_from=None, date_to=None, expand=(), batch_size=1000):
+        """Yield every matching booking from a server-side cursor, batch_size rows at a time"""
+        with use_replica():
+            query = HotelBookingLogic._filtered_bookings(status, hotel_id, date_from, date_to, expand)
+            for booking in query.execution_options(stream_results=True).yield_per(batch_size):
+                yield booking
+    
+    @staticmethod
+    def get_booking_by_id(booking_id, expand=()):
         """Get booking by ID"""
-        booking = Booking.query.get(booking_id)
+        options = HotelBookingLogic._eager_options(Booking, expand)
+        with use_replica():
+            booking = db.session.get(Booking, booking_id, options=options)
+        if booking is None:
+            # A booking created moments ago may not have reached the replica yet
+            booking = db.session.get(Booking, booking_id, options=options)
+        if booking is None:
+            archived = HotelBookingLogic._archived_bookings(lambda table: [table.c.id == booking_id], expand)
+            booking = archived[0] if archived else None
         return booking
     
     @staticmethod
@@ -138,8 +644,15 @@ class HotelBookingLogic:
             if not booking:
                 return False, "Booking not found"
             
+            was_confirmed = booking.status == 'confirmed'
+            stay = (booking.room.hotel_id, booking.check_in_date, booking.check_out_date)
+            guest_email = booking.guest_email
             booking.status = 'cancelled'
             db.session.commit()
+            record_write(guest_email)
+            if was_confirmed:
+                occupancy_index.remove(booking)
+                HotelBookingLogic._invalidate_availability([stay])
             return True, None
             
         except Exception as e:
@@ -147,26 +660,256 @@ class HotelBookingLogic:
             return False, f"Error cancelling booking: {str(e)}"
     
     @staticmethod
-    def get_bookings_by_email(guest_email):
-        """Get all bookings for a guest email"""
-        bookings = Booking.query.filter_by(guest_email=guest_email).all()
+    def _archived_bookings_statement(tables, criteria, limit=None):
+        """Select the archived bookings matching criteria(table) from archive tables, newest stay first"""
+        columns = [column.name for column in Booking.__table__.columns]
+        parts = []
+        for table in tables:
+            part = db.select(*(table.c[name] for name in columns)).where(*criteria(table))
+            if limit is not None:
+                part = part.order_by(table.c.check_in_date.desc(), table.c.id.desc()).limit(limit)
+            parts.append(part)
+        if len(parts) == 1:
+            return parts[0]
+        # Each part wrapped, as SQLite does not allow ORDER BY/LIMIT inside a compound SELECT
+        archived = db.union_all(*(db.select(part.subquery()) for part in parts)).subquery()
+        statement = db.select(archived).order_by(archived.c.check_in_date.desc(), archived.c.id.desc())
+        return statement.limit(limit) if limit is not None else statement
+    
+    @staticmethod
+    def _archived_booking_objects(rows):
+        """Transient Booking objects for archived rows, never added to the session"""
+        return [Booking(**row) for row in rows]
+    
+    @staticmethod
+    def _archived_rooms_statement(bookings, expand):
+        """Select the rooms an expand of archived bookings needs, or None"""
+        if not bookings or not ({'room', 'hotel'} & set(expand)):
+            return None
+        return db.select(Room).where(Room.id.in_({booking.room_id for booking in bookings})).options(
+            *HotelBookingLogic._eager_options(Room, expand)
+        )
+    
+    @staticmethod
+    def _attach_rooms(bookings, rooms):
+        # Without the backref event, which would cascade the booking into the room's session
+        rooms = {room.id: room for room in rooms}
+        for booking in bookings:
+            set_committed_value(booking, 'room', rooms.get(booking.room_id))
+    
+    @staticmethod
+    def _archived_bookings(criteria, expand=(), limit=None, replica=True):
+        """Bookings the lifecycle job moved to the archive partitions, matching criteria(table)
+        
+        Lets the by-ID and guest lookups find a booking after it is archived.
+        """
+        tables = archive_partitions.tables()[1:]
+        # Per-year partition files are only attached on the primary
+        with use_replica(replica and all(table.schema is None for table in tables)):
+            rows = db.session.execute(HotelBookingLogic._archived_bookings_statement(tables, criteria, limit)).mappings()
+            bookings = HotelBookingLogic._archived_booking_objects(rows)
+            statement = HotelBookingLogic._archived_rooms_statement(bookings, expand)
+            if statement is not None:
+                HotelBookingLogic._attach_rooms(bookings, db.session.scalars(statement).unique())
         return bookings
     
     @staticmethod
+    def _guest_bookings_criteria(guest_email, cursor):
+        """criteria(table) for the bookings after cursor of a guest, raising ValueError for a bad cursor"""
+        normalized = normalize_email(guest_email)
+        if cursor:
+            last_check_in, last_id = HotelBookingLogic._decode_cursor(cursor, (str, int))
+            try:
+                last_check_in = date.fromisoformat(last_check_in)
+            except (TypeError, ValueError):
+                raise ValueError("Invalid cursor")
+        
+        def criteria(table):
+            conditions = [table.c.guest_email_normalized == normalized]
+            if cursor:
+                conditions.append(db.tuple_(table.c.check_in_date, table.c.id) < (last_check_in, last_id))
+            return conditions
+        return criteria
+    
+    @staticmethod
+    def _guest_bookings_statement(criteria, limit, expand):
+        """Select a page of a guest's live bookings, newest stay first"""
+        statement = db.select(Booking).where(*criteria(Booking.__table__)).options(
+            *HotelBookingLogic._eager_options(Booking, expand)
+        )
+        # Fetch one extra row to know whether another page exists
+        return statement.order_by(Booking.check_in_date.desc(), Booking.id.desc()).limit(limit + 1)
+    
+    @staticmethod
+    def _guest_archive_needed(bookings, limit):
+        """Whether archived bookings may belong on a page of live ones from _guest_bookings_statement"""
+        # Only stays that checked out before today are archived, so they sort
+        # after a full page of live stays that check in today or later
+        return len(bookings) <= limit or bookings[limit].check_in_date < date.today()
+    
+    @staticmethod
+    def _guest_bookings_page(bookings, limit, archived=()):
+        """Merge in archived bookings and trim the extra row, returning (bookings, next_cursor)"""
+        if archived:
+            # A booking can be in both for a moment if archiving was interrupted
+            live_ids = {booking.id for booking in bookings}
+            bookings = sorted(
+                bookings + [booking for booking in archived if booking.id not in live_ids],
+                key=lambda booking: (booking.check_in_date, booking.id), reverse=True
+            )[:limit + 1]
+        next_cursor = None
+        if len(bookings) > limit:
+            bookings = bookings[:limit]
+            next_cursor = HotelBookingLogic._encode_cursor([bookings[-1].check_in_date.isoformat(), bookings[-1].id])
+        return bookings, next_cursor
+    
+    @staticmethod
+    def get_bookings_by_email(guest_email, expand=(), limit=50, cursor=None):
+        """Get one page of a guest's bookings, archived ones included, matching the email case-insensitively"""
+        criteria = HotelBookingLogic._guest_bookings_criteria(guest_email, cursor)
+        statement = HotelBookingLogic._guest_bookings_statement(criteria, limit, expand)
+        # Guests who just booked or cancelled read from the primary to see their change
+        replica = not wrote_recently(guest_email)
+        with use_replica(replica):
+            bookings = db.session.scalars(statement).all()
+        archived = []
+        if HotelBookingLogic._guest_archive_needed(bookings, limit):
+            archived = HotelBookingLogic._archived_bookings(criteria, expand, limit + 1, replica)
+        return HotelBookingLogic._guest_bookings_page(bookings, limit, archived)
+    
+    @staticmethod
+    @read_only
     def calculate_booking_price(room_id, check_in, check_out):
         """Calculate price for a potential booking"""
+        results, error = HotelBookingLogic.calculate_prices([(room_id, check_in, check_out)])
+        if error:
+            return None, error
+        return results[0].get('total_price'), results[0].get('error')
+    
+    @staticmethod
+    def _parse_quote_date(value):
+        """A date, or exactly a YYYY-MM-DD string, as a date; raises ValueError for anything else"""
+        if isinstance(value, datetime):
+            raise ValueError(value)
+        if isinstance(value, date):
+            return value
+        # fromisoformat alone would also take e.g. 20261101 and 2026-W44-1
+        if not isinstance(value, str) or len(value) != 10 or value[4] != '-' or value[7] != '-':
+            raise ValueError(value)
+        return date.fromisoformat(value)
+    
+    @staticmethod
+    @read_only
+    def calculate_prices(stays):
+        """Calculate prices for many (room_id, check_in, check_out) stays in one batched call
+        
+        Returns (results, error) with one dict per stay, in order, holding
+        either total_price and nights or a per-stay error.
+        """
         try:
-            check_in_date = datetime.strptime(check_in, '%Y-%m-%d').date() if isinstance(check_in, str) else check_in
-            check_out_date = datetime.strptime(check_out, '%Y-%m-%d').date() if isinstance(check_out, str) else check_out
+            room_ids = []
+            for room_id, _, _ in stays:
+                room_id, error = HotelBookingLogic.parse_room_id(room_id)
+                if error:
+                    return None, error
+                room_ids.append(room_id)
+            room_ids = np.array(room_ids, dtype=np.int64)
+            try:
+                check_ins = [HotelBookingLogic._parse_quote_date(check_in) for _, check_in, _ in stays]
+                check_outs = [HotelBookingLogic._parse_quote_date(check_out) for _, _, check_out in stays]
+            except (TypeError, ValueError):
+                return None, "Invalid date format. Use YYYY-MM-DD"
+            if any((check_out - check_in).days > MAX_QUOTE_NIGHTS for check_in, check_out in zip(check_ins, check_outs)):
+                return None, f"Stays are limited to {MAX_QUOTE_NIGHTS} nights"
             
-            room = Room.query.get(room_id)
-            if not room:
-                return None, "Room not found"
-            
-            nights = (check_out_date - check_in_date).days
-            total_price = room.price_per_night * nights
-            
-            return total_price, None
+            totals, nights = pricing_engine.quote(
+                room_ids,
+                np.array([check_in.toordinal() for check_in in check_ins], dtype=np.int64),
+                np.array([check_out.toordinal() for check_out in check_outs], dtype=np.int64)
+            )
             
+            results = []
+            for room_id, check_in, check_out, total_price, stay_nights in zip(
+                room_ids.tolist(), check_ins, check_outs, totals.tolist(), nights.tolist()
+            ):
+                result = {"room_id": room_id, "check_in": check_in.isoformat(), "check_out": check_out.isoformat()}
+                if stay_nights <= 0:
+                    result["error"] = "Check-out date must be after check-in date"
+                elif total_price != total_price:
+                    result["error"] = "Room not found"
+                else:
+                    result["total_price"] = total_price
+                    result["nights"] = stay_nights
+                results.append(result)
+            return results, None
+        
+        except (TypeError, ValueError) as e:
+            return None, f"Invalid stay: {str(e)}"
         except Exception as e:
-            return None, f"Error calculating price: {str(e)}"
\ No newline at end of file
+            return None, f"Error calculating price: {str(e)}"
+    
+    @staticmethod
+    @read_only
+    def get_occupancy_report(start, end, hotel_id=None, group_by='day'):
+        """Get nights sold, revenue, cancellations and occupancy for nights in [start, end) from the daily rollup"""
+        try:
+            start_date = datetime.strptime(start, '%Y-%m-%d').date()
+            end_date = datetime.strptime(end, '%Y-%m-%d').date()
+        except (TypeError, ValueError):
+            return None, "start and end are required, in YYYY-MM-DD format"
+        
+        if start_date >= end_date:
+            return None, "end must be after start"
+        if (end_date - start_date).days > MAX_REPORT_DAYS:
+            return None, f"Reports cover at most {MAX_REPORT_DAYS} days"
+        
+        groups = tuple(name.strip() for name in group_by.split(',') if name.strip())
+        unknown = set(groups) - set(rollups.ROLLUP_GROUPS)
+        if unknown:
+            return None, f"Cannot group by: {', '.join(sorted(unknown))}"
+        
+        return rollups.occupancy_report(start_date, end_date, hotel_id, groups), None
+    
+    @staticmethod
+    def get_dashboard_stats():
+        """Get hotel, room, booking, occupancy and revenue totals from the maintained counters"""
+        dashboard_stats.ensure_loaded()
+        return dashboard_stats.snapshot()
+
+@event.listens_for(Session, 'before_flush')
+def _track_catalog_changes(session, flush_context, instances):
+    """Remember that this transaction writes hotel or room rows"""
+    changed = list(session.new) + list(session.deleted) + [obj for obj in session.dirty if session.is_modified(obj)]
+    if any(isinstance(obj, (Hotel, Room)) for obj in changed):
+        session.info['catalog_changed'] = True
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_catalog_on_commit(session):
+    if session.info.pop('catalog_changed', False):
+        HotelBookingLogic.invalidate_catalog()
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_catalog_changes(session):
+    session.info.pop('catalog_changed', None)
+
+@event.listens_for(Session, 'before_flush')
+def _track_stats_changes(session, flush_context, instances):
+    """Queue this flush's dashboard counter deltas until the transaction commits"""
+    deltas = dashboard_stats.flush_deltas(session)
+    if deltas:
+        session.info.setdefault('stats_deltas', []).extend(deltas)
+
+@event.listens_for(Session, 'after_commit')
+def _apply_stats_on_commit(session):
+    deltas = session.info.pop('stats_deltas', None)
+    if deltas:
+        dashboard_stats.apply(deltas)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_stats_changes(session):
+    session.info.pop('stats_deltas', None)
+
+@event.listens_for(Session, 'after_flush')
+def _update_rollups(session, flush_context):
+    """Keep daily_rollups in step with the bookings written by this flush, in the same transaction"""
+    rollups.record_flush(session)
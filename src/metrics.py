@@ -0,0 +1,281 @@
+import contextvars
+import logging
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+slow_query_logger = logging.getLogger(__name__ + '.slow_query')
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+
+# Longest statement and parameter text written to the slow query log
+SLOW_QUERY_TEXT_LIMIT = 2000
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus model, one series per label set"""
+    
+    def __init__(self, name, help_text, label_names=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+    
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # Per-bucket counts (the last one is +Inf), then the sum
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+    
+    def series(self):
+        with self._lock:
+            return {labels: (list(counts), total) for labels, (counts, total) in self._series.items()}
+    
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total) in sorted(self.series().items()):
+            label_text = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, labels))
+            prefix = label_text + ',' if label_text else ''
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{self.name}_bucket{{{prefix}le="{le}"}} {cumulative}')
+            suffix = f"{{{label_text}}}" if label_text else ''
+            lines.append(f"{self.name}_sum{suffix} {total}")
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class RequestStats:
+    """SQL work done on behalf of one request"""
+    __slots__ = ('statements', 'sql_seconds')
+    
+    def __init__(self):
+        self.statements = 0
+        self.sql_seconds = 0.0
+
+class Metrics:
+    """Request and SQL instrumentation rendered in the Prometheus text format
+    
+    Web servers call start_request() when a request begins and
+    finish_request() when its response is ready; SQLAlchemy cursor events
+    (installed by instrument_sql) add each statement's duration to the
+    request in progress, found through a context variable so it follows
+    both threads and asyncio tasks. Statements slower than
+    slow_query_seconds are logged with their parameters.
+    
+    Extra sources (e.g. cache counters) register a collector returning
+    ready-made exposition lines.
+    """
+    
+    def __init__(self, enabled=True, slow_query_seconds=0.1):
+        self.enabled = enabled
+        self.slow_query_seconds = slow_query_seconds
+        self.request_duration = Histogram(
+            'http_request_duration_seconds', "Time to produce the response, per route",
+            ('route', 'method', 'status')
+        )
+        self.request_statements = Histogram(
+            'http_request_sql_statements', "SQL statements executed per request, per route",
+            ('route', 'method'), buckets=COUNT_BUCKETS
+        )
+        self.request_sql_duration = Histogram(
+            'http_request_sql_duration_seconds', "Time spent in SQL per request, per route",
+            ('route', 'method')
+        )
+        self.statement_duration = Histogram(
+            'db_statement_duration_seconds', "Duration of individual SQL statements"
+        )
+        self.slow_statements = 0
+        self.server_errors = Counter()
+        self._collectors = []
+        self._lock = threading.Lock()
+        self._current = contextvars.ContextVar('request_stats', default=None)
+        self._sql_instrumented = False
+    
+    def start_request(self):
+        """Begin collecting SQL statistics for the current request; pass the result to finish_request"""
+        stats = RequestStats()
+        self._current.set(stats)
+        return stats, time.perf_counter()
+    
+    def finish_request(self, started, route, method, status):
+        stats, started_at = started
+        self._current.set(None)
+        if not self.enabled:
+            return
+        self.request_duration.observe(time.perf_counter() - started_at, route, method, str(status))
+        self.request_statements.observe(stats.statements, route, method)
+        self.request_sql_duration.observe(stats.sql_seconds, route, method)
+        if status >= 500:
+            with self._lock:
+                self.server_errors[(route, method)] += 1
+    
+    def add_collector(self, collector):
+        self._collectors.append(collector)
+    
+    def instrument_sql(self):
+        """Time every SQL statement run by any engine"""
+        if self._sql_instrumented:
+            return
+        self._sql_instrumented = True
+        
+        @event.listens_for(Engine, 'before_cursor_execute')
+        def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault('metrics_started', []).append(time.perf_counter())
+        
+        @event.listens_for(Engine, 'after_cursor_execute')
+        def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            started = conn.info.get('metrics_started')
+            if not started:
+                return
+            self.record_statement(time.perf_counter() - started.pop(), statement, parameters)
+        
+        @event.listens_for(Engine, 'handle_error')
+        def _handle_error(exception_context):
+            started = exception_context.connection.info.get('metrics_started') if exception_context.connection else None
+            if started:
+                started.pop()
+    
+    def record_statement(self, seconds, statement, parameters):
+        if not self.enabled:
+            return
+        self.statement_duration.observe(seconds)
+        stats = self._current.get()
+        if stats is not None:
+            stats.statements += 1
+            stats.sql_seconds += seconds
+        if seconds >= self.slow_query_seconds:
+            with self._lock:
+                self.slow_statements += 1
+            slow_query_logger.warning(
+                "Slow query (%.1f ms): %s | parameters: %s",
+                seconds * 1000, statement[:SLOW_QUERY_TEXT_LIMIT], repr(parameters)[:SLOW_QUERY_TEXT_LIMIT]
+            )
+    
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for histogram in (self.request_duration, self.request_statements, self.request_sql_duration, self.statement_duration):
+            lines.extend(histogram.render())
+        with self._lock:
+            slow_statements = self.slow_statements
+            server_errors = dict(self.server_errors)
+        lines += [
+            "# HELP db_slow_statements_total SQL statements slower than the slow query threshold",
+            "# TYPE db_slow_statements_total counter",
+            f"db_slow_statements_total {slow_statements}",
+            "# HELP http_server_errors_total Responses with a 5xx status, per route",
+            "# TYPE http_server_errors_total counter",
+        ]
+        lines += [
+            f'http_server_errors_total{{route="{_escape(route)}",method="{method}"}} {count}'
+            for (route, method), count in sorted(server_errors.items())
+        ]
+        for collector in self._collectors:
+            lines.extend(collector())
+        return '\n'.join(lines) + '\n'
+
+class SamplingProfiler:
+    """Statistical profiler that samples every thread's stack at a fixed interval
+    
+    Runs in a daemon thread only while enabled, so it can be switched on in a
+    running server to see where request time goes and switched off again.
+    Samples are aggregated as collapsed stacks ("outer;inner;leaf"), the
+    input format of flame graph tools.
+    """
+    
+    def __init__(self, interval=0.005, max_depth=64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = 0
+        self.started_at = None
+        self._stacks = Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+    
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+    
+    def start(self, interval=None):
+        with self._lock:
+            if interval:
+                self.interval = interval
+            if self.running:
+                return
+            self._stop.clear()
+            self.started_at = time.time()
+            self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+            self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join()
+        self._thread = None
+    
+    def reset(self):
+        with self._lock:
+            self._stacks.clear()
+            self.samples = 0
+    
+    @staticmethod
+    def _label(frame):
+        code = frame.f_code
+        return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            stacks = []
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                labels = []
+                while frame is not None and len(labels) < self.max_depth:
+                    labels.append(self._label(frame))
+                    frame = frame.f_back
+                stacks.append(';'.join(reversed(labels)))
+            with self._lock:
+                self._stacks.update(stacks)
+                self.samples += 1
+    
+    def snapshot(self, limit=50):
+        """Status and the `limit` most sampled stacks"""
+        with self._lock:
+            top = self._stacks.most_common(limit)
+            return {
+                "running": self.running,
+                "interval_ms": self.interval * 1000,
+                "started_at": self.started_at,
+                "samples": self.samples,
+                "stacks": [{"stack": stack, "count": count} for stack, count in top],
+            }
+    
+    def collapsed(self):
+        """Every sampled stack as "frames count" lines, for flamegraph.pl and speedscope"""
+        with self._lock:
+            return ''.join(f"{stack} {count}\n" for stack, count in self._stacks.most_common())
+
+metrics = Metrics(
+    enabled=os.getenv('METRICS_ENABLED', '1') != '0',
+    slow_query_seconds=float(os.getenv('SLOW_QUERY_MS', '100')) / 1000
+)
+
+profiler = SamplingProfiler(interval=float(os.getenv('PROFILER_INTERVAL_MS', '5')) / 1000)
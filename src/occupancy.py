@@ -0,0 +1,370 @@
+import asyncio
+import bisect
+import logging
+import os
+import threading
+import time
+from array import array
+from datetime import date
+from .db import db, Booking, use_primary
+
+logger = logging.getLogger(__name__)
+
+class RoomOccupancy:
+    """Confirmed stays of a single room as parallel arrays sorted by check-in
+    
+    Dates are stored as proleptic ordinals. max_ends[i] is the latest check-out
+    among the first i + 1 stays, so an overlap query is one bisect even if the
+    stored stays themselves overlap (e.g. legacy double bookings).
+    """
+    __slots__ = ('starts', 'ends', 'max_ends', 'booking_ids')
+    
+    def __init__(self):
+        self.starts = array('l')
+        self.ends = array('l')
+        self.max_ends = array('l')
+        self.booking_ids = array('q')
+    
+    def __len__(self):
+        return len(self.starts)
+    
+    def _refresh_max_ends(self, position):
+        """Recompute the running check-out maximum from position onwards"""
+        running = self.max_ends[position - 1] if position > 0 else 0
+        for i in range(position, len(self.ends)):
+            running = max(running, self.ends[i])
+            self.max_ends[i] = running
+    
+    def add(self, booking_id, start, end):
+        position = bisect.bisect_left(self.starts, start)
+        while position < len(self.starts) and self.starts[position] == start:
+            if self.booking_ids[position] == booking_id:
+                return
+            position += 1
+        self.starts.insert(position, start)
+        self.ends.insert(position, end)
+        self.max_ends.insert(position, end)
+        self.booking_ids.insert(position, booking_id)
+        self._refresh_max_ends(position)
+    
+    def remove(self, booking_id, start):
+        position = bisect.bisect_left(self.starts, start)
+        while position < len(self.starts) and self.starts[position] == start:
+            if self.booking_ids[position] == booking_id:
+                del self.starts[position]
+                del self.ends[position]
+                del self.max_ends[position]
+                del self.booking_ids[position]
+                self._refresh_max_ends(position)
+                return True
+            position += 1
+        return False
+    
+    def remove_many(self, stays):
+        """Remove a set of (booking_id, start) stays in one pass; returns how many were stored"""
+        keep = [i for i in range(len(self.starts)) if (self.booking_ids[i], self.starts[i]) not in stays]
+        removed = len(self.starts) - len(keep)
+        if removed:
+            self.starts = array('l', (self.starts[i] for i in keep))
+            self.ends = array('l', (self.ends[i] for i in keep))
+            self.booking_ids = array('q', (self.booking_ids[i] for i in keep))
+            self.max_ends = array('l', self.ends)
+            self._refresh_max_ends(0)
+        return removed
+    
+    def overlaps(self, start, end):
+        """True if any stored stay overlaps the half-open range [start, end)"""
+        # Stays starting before `end` are candidates; one of them overlaps iff
+        # the latest check-out among them is after `start`
+        position = bisect.bisect_left(self.starts, end)
+        return position > 0 and self.max_ends[position - 1] > start
+    
+    def stays(self):
+        return set(zip(self.booking_ids, self.starts, self.ends))
+    
+    def bitmap(self, origin, horizon):
+        """Occupancy bits for nights origin .. origin + horizon - 1 (bit 0 = origin)"""
+        bits = 0
+        limit = origin + horizon
+        # Stays before `first` check out on or before origin; stays from `last`
+        # on check in after the horizon
+        first = bisect.bisect_right(self.max_ends, origin)
+        last = bisect.bisect_left(self.starts, limit)
+        for i in range(first, last):
+            start, end = max(self.starts[i], origin), min(self.ends[i], limit)
+            if start < end:
+                bits |= ((1 << (end - start)) - 1) << (start - origin)
+        return bits
+
+class OccupancyIndex:
+    """In-process index of confirmed bookings keyed by room
+    
+    Built from the database on first use and kept up to date by
+    HotelBookingLogic after each committed booking or cancellation. The index
+    only sees writes made through this process, so like the dashboard
+    counters it is reloaded every `reload_seconds` (OCCUPANCY_RELOAD_SECONDS)
+    to pick up other processes, the importer and direct database edits, and
+    sooner when a booking finds it stale (expire()). A room the index calls
+    occupied is never refused on that alone: create_booking always decides
+    with the locked SQL conflict check. Set OCCUPANCY_INDEX=0 to fall back to
+    SQL, or OCCUPANCY_INDEX_VERIFY=1 to cross-check every answer against the
+    database and log mismatches.
+    
+    Alongside the intervals each room has a per-night occupancy bitmap over a
+    rolling horizon starting today, so "free for these nights" is a single
+    mask test per room and a month calendar is a walk over the set bits.
+    """
+    
+    def __init__(self, enabled=True, verify=False, horizon_days=730, reload_seconds=60):
+        self.enabled = enabled
+        self.verify = verify
+        self.horizon_days = horizon_days
+        self.reload_seconds = reload_seconds
+        self.loaded = False
+        self.app = None
+        self._loading = False
+        self._loaded_at = 0.0
+        self._reload_lock = threading.Lock()
+        self._pending = []
+        self._rooms = {}
+        self._bitmaps = {}
+        self._origin = date.today().toordinal()
+        self._lock = threading.RLock()
+    
+    def load(self):
+        """(Re)build the index from all confirmed bookings"""
+        with self._lock:
+            self._loading = True
+            self._pending = []
+        
+        # Replicas may lag behind the writes replayed below, so read the primary
+        rooms = {}
+        try:
+            with use_primary():
+                rows = db.session.query(
+                    Booking.room_id, Booking.id, Booking.check_in_date, Booking.check_out_date
+                ).filter(
+                    Booking.status == 'confirmed'
+                ).order_by(Booking.room_id, Booking.check_in_date).yield_per(10000)
+                
+                for room_id, booking_id, check_in_date, check_out_date in rows:
+                    occupancy = rooms.get(room_id)
+                    if occupancy is None:
+                        occupancy = rooms[room_id] = RoomOccupancy()
+                    # Rows arrive sorted by check-in, so appending keeps the arrays ordered
+                    start, end = check_in_date.toordinal(), check_out_date.toordinal()
+                    running = max(end, occupancy.max_ends[-1]) if len(occupancy) else end
+                    occupancy.starts.append(start)
+                    occupancy.ends.append(end)
+                    occupancy.max_ends.append(running)
+                    occupancy.booking_ids.append(booking_id)
+        except Exception:
+            # The writes queued meanwhile are lost, so the index can no longer
+            # be trusted: the next read rebuilds it from scratch
+            with self._lock:
+                self._pending = []
+                self._loading = False
+                self.loaded = False
+            raise
+        
+        with self._lock:
+            self._rooms = rooms
+            # Replay bookings committed while the snapshot was being read
+            for apply in self._pending:
+                apply()
+            self._pending = []
+            self._loading = False
+            self._rebuild_bitmaps()
+            self.loaded = True
+            self._loaded_at = time.monotonic()
+    
+    def _rebuild_bitmaps(self):
+        self._origin = date.today().toordinal()
+        self._bitmaps = {
+            room_id: occupancy.bitmap(self._origin, self.horizon_days)
+            for room_id, occupancy in self._rooms.items()
+        }
+    
+    def _roll(self):
+        """Move the bitmap horizon forward when the date has changed"""
+        if date.today().toordinal() != self._origin:
+            self._rebuild_bitmaps()
+    
+    def _in_horizon(self, start, end):
+        return self._origin <= start and end <= self._origin + self.horizon_days
+    
+    @property
+    def stale(self):
+        return not self.loaded or (
+            not self._loading and time.monotonic() - self._loaded_at >= self.reload_seconds
+        )
+    
+    def expire(self):
+        """Reload on the next ensure_loaded(), e.g. after the database disagreed with the index"""
+        self._loaded_at = 0.0
+    
+    def ensure_loaded(self):
+        # The lock is not held while reading bookings: threads waiting on it
+        # may be holding pooled connections the load itself needs
+        if not self.loaded:
+            self.load()
+        elif self.stale and self._reload_lock.acquire(blocking=False):
+            # One thread reloads; the others keep answering from the current index
+            try:
+                self.load()
+            finally:
+                self._reload_lock.release()
+    
+    def _reload_in_app(self):
+        # Runs in an executor thread holding _reload_lock, taken by ensure_loaded_async()
+        try:
+            with self.app.app_context():
+                try:
+                    self.load()
+                finally:
+                    db.session.remove()
+        except Exception:
+            logger.exception("Reloading the occupancy index failed")
+        finally:
+            self._reload_lock.release()
+    
+    def ensure_loaded_async(self):
+        """ensure_loaded() for the asyncio server: a stale index reloads in a worker thread
+        
+        The current index keeps answering meanwhile, and callers fall back to
+        SQL while it is not loaded (e.g. after a failed reload); needs self.app
+        (the Flask app, for its database session).
+        """
+        if self.stale and self.app is not None and self._reload_lock.acquire(blocking=False):
+            asyncio.get_running_loop().run_in_executor(None, self._reload_in_app)
+    
+    def _add(self, room_id, booking_id, start, end):
+        occupancy = self._rooms.get(room_id)
+        if occupancy is None:
+            occupancy = self._rooms[room_id] = RoomOccupancy()
+        occupancy.add(booking_id, start, end)
+        self._bitmaps[room_id] = occupancy.bitmap(self._origin, self.horizon_days)
+    
+    def _remove(self, room_id, booking_id, start):
+        occupancy = self._rooms.get(room_id)
+        if occupancy is not None and occupancy.remove(booking_id, start):
+            self._bitmaps[room_id] = occupancy.bitmap(self._origin, self.horizon_days)
+    
+    def add(self, booking):
+        """Record a committed confirmed booking"""
+        args = (booking.room_id, booking.id, booking.check_in_date.toordinal(), booking.check_out_date.toordinal())
+        with self._lock:
+            if self._loading:
+                self._pending.append(lambda: self._add(*args))
+            elif self.loaded:
+                self._add(*args)
+    
+    def remove(self, booking):
+        """Forget a booking that is no longer confirmed"""
+        args = (booking.room_id, booking.id, booking.check_in_date.toordinal())
+        with self._lock:
+            if self._loading:
+                self._pending.append(lambda: self._remove(*args))
+            elif self.loaded:
+                self._remove(*args)
+    
+    def _remove_many(self, room_id, stays):
+        occupancy = self._rooms.get(room_id)
+        if occupancy is not None and occupancy.remove_many(stays):
+            self._bitmaps[room_id] = occupancy.bitmap(self._origin, self.horizon_days)
+    
+    def remove_stays(self, stays):
+        """Forget (room_id, booking_id, check_in) stays changed by bulk statements"""
+        by_room = {}
+        for room_id, booking_id, check_in_date in stays:
+            by_room.setdefault(room_id, set()).add((booking_id, check_in_date.toordinal()))
+        with self._lock:
+            for room_id, removals in by_room.items():
+                if self._loading:
+                    self._pending.append(lambda room_id=room_id, removals=removals: self._remove_many(room_id, removals))
+                elif self.loaded:
+                    self._remove_many(room_id, removals)
+    
+    def is_free(self, room_id, check_in_date, check_out_date):
+        """True if the room has no confirmed stay overlapping [check_in, check_out)"""
+        with self._lock:
+            occupancy = self._rooms.get(room_id)
+            if occupancy is None:
+                return True
+            return not occupancy.overlaps(check_in_date.toordinal(), check_out_date.toordinal())
+    
+    def free_room_ids(self, room_ids, check_in_date, check_out_date):
+        """Return the subset of room_ids free for every night in [check_in, check_out)"""
+        start, end = check_in_date.toordinal(), check_out_date.toordinal()
+        with self._lock:
+            self._roll()
+            if start >= end or not self._in_horizon(start, end):
+                return [room_id for room_id in room_ids if self.is_free(room_id, check_in_date, check_out_date)]
+            mask = ((1 << (end - start)) - 1) << (start - self._origin)
+            bitmaps = self._bitmaps
+            return [room_id for room_id in room_ids if not bitmaps.get(room_id, 0) & mask]
+    
+    def free_counts(self, room_ids, first_day, days):
+        """Number of free rooms among room_ids for each of `days` nights from first_day"""
+        start = first_day.toordinal()
+        counts = [len(room_ids)] * days
+        with self._lock:
+            self._roll()
+            if self._in_horizon(start, start + days):
+                window = (1 << days) - 1
+                offset = start - self._origin
+                for room_id in room_ids:
+                    occupied = (self._bitmaps.get(room_id, 0) >> offset) & window
+                    # Walk only the set bits (occupied nights)
+                    while occupied:
+                        lowest = occupied & -occupied
+                        counts[lowest.bit_length() - 1] -= 1
+                        occupied ^= lowest
+            else:
+                for room_id in room_ids:
+                    occupancy = self._rooms.get(room_id)
+                    if occupancy is None:
+                        continue
+                    for night in range(days):
+                        if occupancy.overlaps(start + night, start + night + 1):
+                            counts[night] -= 1
+        return counts
+    
+    def check_consistency(self):
+        """Compare the index with the database
+        
+        Returns a dict mapping room_id to the (booking_id, check_in, check_out)
+        ordinals that are only in the database ("missing") or only in the
+        index ("stale"). An empty dict means the index is consistent.
+        """
+        expected = {}
+        with use_primary():
+            rows = db.session.query(
+                Booking.room_id, Booking.id, Booking.check_in_date, Booking.check_out_date
+            ).filter(Booking.status == 'confirmed').yield_per(10000)
+            for room_id, booking_id, check_in_date, check_out_date in rows:
+                expected.setdefault(room_id, set()).add(
+                    (booking_id, check_in_date.toordinal(), check_out_date.toordinal())
+                )
+        
+        differences = {}
+        with self._lock:
+            for room_id in set(expected) | set(self._rooms):
+                actual = self._rooms[room_id].stays() if room_id in self._rooms else set()
+                wanted = expected.get(room_id, set())
+                if actual != wanted:
+                    differences[room_id] = {
+                        "missing": sorted(wanted - actual),
+                        "stale": sorted(actual - wanted),
+                    }
+        return differences
+    
+    def report_mismatch(self, context, index_answer, db_answer):
+        logger.warning("Occupancy index mismatch in %s: index=%r database=%r", context, index_answer, db_answer)
+
+occupancy_index = OccupancyIndex(
+    enabled=os.getenv('OCCUPANCY_INDEX', '1') != '0',
+    verify=os.getenv('OCCUPANCY_INDEX_VERIFY', '0') == '1',
+    horizon_days=int(os.getenv('OCCUPANCY_CALENDAR_DAYS', '730')),
+    reload_seconds=float(os.getenv('OCCUPANCY_RELOAD_SECONDS', '60'))
+)
@@ -0,0 +1,268 @@
+import logging
+import os
+import re
+import sqlite3
+import threading
+from datetime import date
+from sqlalchemy import MetaData, event
+from .db import db, Booking, BookingArchive
+
+logger = logging.getLogger(__name__)
+
+# Columns of the all_bookings reporting view; archived_at is NULL for live bookings
+VIEW_COLUMNS = [column.name for column in Booking.__table__.columns] + ['archived_at']
+
+# Lightweight handle on the view for Core queries (it is not part of db.metadata)
+all_bookings = db.table('all_bookings', *(
+    db.column(name, (BookingArchive.__table__.c[name]).type) for name in VIEW_COLUMNS
+))
+
+def _month_start(day):
+    return date(day.year, day.month, 1)
+
+def _next_month(day):
+    return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+class ArchivePartitions:
+    """Where archived bookings are stored, partitioned by check-out date
+    
+    On PostgreSQL bookings_archive is a natively partitioned table with one
+    range partition per check-out month, created on demand by ensure(), so
+    the planner prunes the months a query cannot touch. On a SQLite file
+    database each check-out year lives in its own file next to the main one
+    (hotel_booking.bookings_2024.db) that is attached to every connection as
+    the schema bookings_2024; the check-out index inside narrows it to the
+    months queried. The plain bookings_archive table in the main database
+    stays as the default partition: it holds rows archived before
+    partitioning, and everything when partitioning is off (ARCHIVE_PARTITIONS=0)
+    or the database is in memory.
+    
+    tables(start, end) routes a query to the live bookings table plus the
+    partitions that can hold check-out dates in the range, and table_for()
+    picks the partition a booking is archived into. The all_bookings view
+    unions the live table with every partition for reporting; on SQLite it
+    is a TEMP view, because a view in the main database cannot read attached
+    ones. Partitions are only attached on the primary engine (and the asyncio
+    engine of api/asgi.py), which archive lookups therefore read.
+    """
+    
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._path = None
+        self._years = set()
+        self._months = set()
+        self._generation = 0
+        self._metadata = MetaData()
+        self._tables = {}
+        self._attach_limit = None
+        self._lock = threading.Lock()
+    
+    @property
+    def dialect(self):
+        return db.engine.dialect.name
+    
+    @property
+    def per_year(self):
+        return self._path is not None
+    
+    def configure(self, engine):
+        """Attach the partition databases to every connection of a SQLite file engine"""
+        database = engine.url.database
+        if not self.enabled or engine.dialect.name != 'sqlite' or database in (None, '', ':memory:') \
+                or engine.url.query.get('mode') == 'memory':
+            return
+        self._path = os.path.abspath(database)
+        self.refresh()
+        
+        @event.listens_for(engine, 'checkout')
+        def attach_partitions(dbapi_connection, connection_record, connection_proxy):
+            # Connections come back from the pool with no transaction open,
+            # which ATTACH requires; only new partitions are attached here
+            if connection_record.info.get('archive_generation') != self._generation:
+                self._attach(dbapi_connection, connection_record.info)
+    
+    def _file(self, year):
+        stem, extension = os.path.splitext(self._path)
+        return f"{stem}.bookings_{year}{extension or '.db'}"
+    
+    def refresh(self):
+        """Pick up partition files created by other processes"""
+        if not self.per_year:
+            return
+        stem, extension = os.path.splitext(os.path.basename(self._path))
+        pattern = re.compile(re.escape(stem) + r'\.bookings_(\d{4})' + re.escape(extension or '.db') + '$')
+        found = {
+            int(match.group(1)) for match in map(pattern.match, os.listdir(os.path.dirname(self._path))) if match
+        }
+        with self._lock:
+            if not found <= self._years:
+                self._years |= found
+                self._generation += 1
+    
+    def _attach(self, dbapi_connection, info):
+        with self._lock:
+            years, generation = sorted(self._years), self._generation
+        attached = info.setdefault('archive_years', set())
+        cursor = dbapi_connection.cursor()
+        try:
+            # Fetched separately: the aiosqlite adapter's execute() returns None
+            cursor.execute("PRAGMA main.journal_mode")
+            journal_mode = cursor.fetchone()[0]
+            cursor.execute("PRAGMA main.synchronous")
+            synchronous = cursor.fetchone()[0]
+            for year in years:
+                if year in attached:
+                    continue
+                cursor.execute(f"ATTACH DATABASE ? AS bookings_{year}", (self._file(year),))
+                # Pragmas are per database file, attached ones included
+                cursor.execute(f"PRAGMA bookings_{year}.journal_mode = {journal_mode}")
+                cursor.execute(f"PRAGMA bookings_{year}.synchronous = {synchronous}")
+                attached.add(year)
+            cursor.execute("DROP VIEW IF EXISTS temp.all_bookings")
+            cursor.execute(f"CREATE TEMP VIEW all_bookings AS {self._view_sql(years)}")
+        finally:
+            cursor.close()
+        info['archive_generation'] = generation
+    
+    def _view_sql(self, years):
+        live = ', '.join(VIEW_COLUMNS[:-1])
+        columns = ', '.join(VIEW_COLUMNS)
+        parts = [f"SELECT {live}, NULL AS archived_at FROM main.bookings", f"SELECT {columns} FROM main.bookings_archive"]
+        parts += [f"SELECT {columns} FROM bookings_{year}.bookings_archive" for year in years]
+        return ' UNION ALL '.join(parts)
+    
+    def _year_table(self, year):
+        table = self._tables.get(year)
+        if table is None:
+            table = self._tables[year] = BookingArchive.__table__.to_metadata(self._metadata, schema=f'bookings_{year}')
+        return table
+    
+    def ensure(self, first, last):
+        """Create the partitions for check-out dates from first to last, inclusive"""
+        if self.dialect == 'postgresql':
+            self._ensure_months(first, last)
+            return
+        if not self.per_year:
+            return
+        self.refresh()
+        missing = [year for year in range(first.year, last.year + 1) if year not in self._years]
+        if not missing:
+            return
+        if self._attach_limit is None:
+            with db.engine.connect() as connection:
+                self._attach_limit = connection.connection.driver_connection.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+        with self._lock:
+            if len(self._years) + len(missing) > self._attach_limit:
+                raise RuntimeError(
+                    f"SQLite attaches at most {self._attach_limit} databases; "
+                    f"cannot add archive partitions for {', '.join(map(str, missing))}"
+                )
+            self._years.update(missing)
+            self._generation += 1
+        # Checking out the connection attaches the new years, creating their files
+        with db.engine.begin() as connection:
+            for year in missing:
+                self._year_table(year).create(connection, checkfirst=True)
+        logger.info("Created archive partitions for %s", ', '.join(map(str, missing)))
+    
+    def _ensure_months(self, first, last):
+        month = _month_start(first)
+        with db.engine.begin() as connection:
+            while month <= last:
+                if month not in self._months:
+                    connection.execute(db.text(
+                        f"CREATE TABLE IF NOT EXISTS bookings_archive_{month:%Y_%m} PARTITION OF bookings_archive "
+                        f"FOR VALUES FROM ('{month}') TO ('{_next_month(month)}')"
+                    ))
+                    self._months.add(month)
+                month = _next_month(month)
+    
+    def table_for(self, check_out_date):
+        """The table a booking checking out on check_out_date is archived into (see ensure)"""
+        if self.per_year:
+            return self._year_table(check_out_date.year)
+        return BookingArchive.__table__
+    
+    def tables(self, start=None, end=None):
+        """Live bookings and the archive partitions that can hold check-out dates in [start, end)"""
+        tables = [Booking.__table__, BookingArchive.__table__]
+        if self.per_year:
+            self.refresh()
+            tables += [
+                self._year_table(year) for year in sorted(self._years)
+                if (start is None or year >= start.year) and (end is None or date(year, 1, 1) < end)
+            ]
+        return tables
+    
+    def upgrade(self):
+        """Create the partitioned storage and the all_bookings view (called by upgrade_db)"""
+        if self.dialect != 'postgresql':
+            if self.per_year:
+                # Indexes added to the archive after a year's file was created
+                with db.engine.begin() as connection:
+                    for year in sorted(self._years):
+                        for index in self._year_table(year).indexes:
+                            index.create(connection, checkfirst=True)
+            return
+        with db.engine.begin() as connection:
+            kind = connection.scalar(db.text("SELECT relkind FROM pg_class WHERE oid = to_regclass('bookings_archive')"))
+            if kind == 'r':
+                # A plain table from before partitioning: move its rows into a partitioned one
+                connection.execute(db.text("ALTER TABLE bookings_archive RENAME TO bookings_archive_unpartitioned"))
+                connection.execute(db.text(
+                    "ALTER TABLE bookings_archive_unpartitioned RENAME CONSTRAINT bookings_archive_pkey "
+                    "TO bookings_archive_unpartitioned_pkey"
+                ))
+                BookingArchive.__table__.create(connection)
+                bounds = connection.execute(db.text(
+                    "SELECT min(check_out_date), max(check_out_date) FROM bookings_archive_unpartitioned"
+                )).one()
+        if kind == 'r':
+            if bounds[0] is not None:
+                self._ensure_months(*bounds)
+            columns = ', '.join(column.name for column in BookingArchive.__table__.columns)
+            with db.engine.begin() as connection:
+                connection.execute(db.text(
+                    f"INSERT INTO bookings_archive ({columns}) SELECT {columns} FROM bookings_archive_unpartitioned"
+                ))
+                connection.execute(db.text("DROP TABLE bookings_archive_unpartitioned"))
+        with db.engine.begin() as connection:
+            live = ', '.join(VIEW_COLUMNS[:-1])
+            connection.execute(db.text(
+                f"CREATE OR REPLACE VIEW all_bookings AS SELECT {live}, NULL::timestamp AS archived_at FROM bookings "
+                f"UNION ALL SELECT {', '.join(VIEW_COLUMNS)} FROM bookings_archive"
+            ))
+    
+    def snapshot(self):
+        """Every partition with its check-out range and row count"""
+        if self.dialect == 'postgresql':
+            rows = db.session.execute(db.text(
+                "SELECT child.relname, pg_get_expr(child.relpartbound, child.oid), child.reltuples::bigint "
+                "FROM pg_inherits JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+                "WHERE pg_inherits.inhparent = 'bookings_archive'::regclass ORDER BY child.relname"
+            )).all()
+            return {
+                "backend": "postgresql",
+                "partitions": [{"name": name, "bounds": bounds, "estimated_rows": rows} for name, bounds, rows in rows],
+            }
+        
+        def summary(name, table, path=None):
+            rows, first, last = db.session.execute(db.select(
+                db.func.count(), db.func.min(table.c.check_out_date), db.func.max(table.c.check_out_date)
+            ).select_from(table)).one()
+            return {
+                "name": name,
+                "file": path,
+                "rows": rows,
+                "first_check_out": first.isoformat() if first else None,
+                "last_check_out": last.isoformat() if last else None,
+            }
+        
+        self.refresh()
+        partitions = [summary('default', BookingArchive.__table__)]
+        partitions += [
+            summary(f'bookings_{year}', self._year_table(year), self._file(year)) for year in sorted(self._years)
+        ]
+        return {"backend": self.dialect, "per_year_files": self.per_year, "partitions": partitions}
+
+archive_partitions = ArchivePartitions(enabled=os.getenv('ARCHIVE_PARTITIONS', '1') != '0')
@@ -0,0 +1,195 @@
+import json
+import os
+import threading
+import time
+from datetime import date
+import numpy as np
+from .db import db, Room, use_primary
+
+# date.toordinal() of 1970-01-01, the datetime64 epoch
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# Nights added on each side when the rate calendar has to grow
+CALENDAR_PADDING_DAYS = 366
+
+# Widest range of nights the rate calendar covers (besides padding); stays
+# priced together must fit in it
+MAX_CALENDAR_DAYS = 20 * 366
+
+def load_rules(path=None):
+    """Read pricing rules from a JSON file, or return the neutral defaults if path is empty"""
+    if not path:
+        return {}
+    with open(path) as rules_file:
+        return json.load(rules_file)
+
+class PricingEngine:
+    """Nightly rate calendar and batched stay quotes
+    
+    A night costs the room's price_per_night times that night's factor: the
+    product of the month ("seasons", keyed 1-12), weekday ("weekdays", 0 is
+    Monday) and exact date ("dates", YYYY-MM-DD) multipliers in the rules.
+    The stay total is then scaled by the highest "length_of_stay" tier it
+    reaches, given as [min_nights, multiplier] pairs. Anything not listed is
+    1.0, so without rules a stay costs price_per_night * nights as before.
+    
+    Night factors are held as a NumPy calendar with a running sum, so a stay
+    total is base[room] * (cumulative[check_out] - cumulative[check_in]) and
+    any number of quotes is a few array operations. Base prices live in an
+    array indexed by room ID, reloaded after catalog changes made by this
+    process and, for changes made by other processes or the importer, once
+    they are `reload_seconds` (PRICING_RELOAD_SECONDS) old.
+    """
+    
+    def __init__(self, rules=None, reload_seconds=300):
+        rules = rules or {}
+        self.reload_seconds = reload_seconds
+        self.seasons = np.ones(12)
+        for month, multiplier in rules.get('seasons', {}).items():
+            if not 1 <= int(month) <= 12:
+                raise ValueError(f"Invalid pricing season month: {month}")
+            self.seasons[int(month) - 1] = float(multiplier)
+        self.weekdays = np.ones(7)
+        for weekday, multiplier in rules.get('weekdays', {}).items():
+            if not 0 <= int(weekday) <= 6:
+                raise ValueError(f"Invalid pricing weekday: {weekday}")
+            self.weekdays[int(weekday)] = float(multiplier)
+        self.dates = {
+            date.fromisoformat(day).toordinal(): float(multiplier)
+            for day, multiplier in rules.get('dates', {}).items()
+        }
+        tiers = sorted((int(nights), float(multiplier)) for nights, multiplier in rules.get('length_of_stay', []))
+        self.stay_thresholds = np.array([nights for nights, _ in tiers], dtype=np.int64)
+        self.stay_multipliers = np.array([multiplier for _, multiplier in tiers])
+        
+        self._base_prices = None
+        self._loaded_at = 0.0
+        self._generation = 0
+        self._reload_lock = threading.Lock()
+        # (first ordinal, cumulative factors) with cumulative[i] = sum of the first i nights
+        self._calendar = (0, np.zeros(1))
+        self._lock = threading.Lock()
+    
+    def load(self):
+        """(Re)load room base prices from the database, returning the price array"""
+        with self._lock:
+            generation = self._generation
+        
+        with use_primary():
+            rows = db.session.execute(db.select(Room.id, Room.price_per_night)).all()
+        ids = np.array([room_id for room_id, _ in rows], dtype=np.int64)
+        prices = np.full(int(ids.max()) + 1 if len(ids) else 0, np.nan)
+        prices[ids] = [price for _, price in rows]
+        
+        with self._lock:
+            # A catalog change while reading means these prices may be stale
+            if generation == self._generation:
+                self._base_prices = prices
+                self._loaded_at = time.monotonic()
+        return prices
+    
+    def invalidate(self):
+        """Forget base prices, e.g. after rooms were added or repriced"""
+        with self._lock:
+            self._generation += 1
+            self._base_prices = None
+    
+    def base_prices(self):
+        prices = self._base_prices
+        if prices is None:
+            return self.load()
+        if time.monotonic() - self._loaded_at >= self.reload_seconds and self._reload_lock.acquire(blocking=False):
+            # One thread reloads; the others keep quoting from the current prices
+            try:
+                return self.load()
+            finally:
+                self._reload_lock.release()
+        return prices
+    
+    def _night_factors(self, first, last):
+        """Factors for the nights with ordinals first .. last - 1"""
+        ordinals = np.arange(first, last, dtype=np.int64)
+        months = (ordinals - EPOCH_ORDINAL).astype('datetime64[D]').astype('datetime64[M]').astype(np.int64) % 12
+        factors = self.seasons[months] * self.weekdays[(ordinals - 1) % 7]
+        for ordinal, multiplier in self.dates.items():
+            if first <= ordinal < last:
+                factors[ordinal - first] *= multiplier
+        return factors
+    
+    def _cumulative(self, first, last):
+        """The calendar, grown if needed to cover nights first .. last - 1
+        
+        Raises ValueError if they span more than MAX_CALENDAR_DAYS; a calendar
+        that would grow beyond that is rebuilt around the new range instead.
+        """
+        origin, cumulative = self._calendar
+        if origin <= first and last <= origin + len(cumulative) - 1:
+            return origin, cumulative
+        if last - first > MAX_CALENDAR_DAYS:
+            raise ValueError(f"Stays priced together must fall within {MAX_CALENDAR_DAYS} days")
+        with self._lock:
+            origin, cumulative = self._calendar
+            end = origin + len(cumulative) - 1
+            if len(cumulative) > 1 and max(last, end) - min(first, origin) <= MAX_CALENDAR_DAYS + 2 * CALENDAR_PADDING_DAYS:
+                first, last = min(first, origin), max(last, end)
+            first, last = first - CALENDAR_PADDING_DAYS, last + CALENDAR_PADDING_DAYS
+            cumulative = np.concatenate(([0.0], np.cumsum(self._night_factors(first, last))))
+            self._calendar = (first, cumulative)
+            return first, cumulative
+    
+    @staticmethod
+    def _ordinals(days):
+        """Convert dates, datetime64 values or ordinals to an int64 ordinal array"""
+        days = np.asarray(days)
+        if days.dtype == object:
+            return np.array([day.toordinal() for day in days.ravel()], dtype=np.int64).reshape(days.shape)
+        if np.issubdtype(days.dtype, np.datetime64):
+            return days.astype('datetime64[D]').astype(np.int64) + EPOCH_ORDINAL
+        return days.astype(np.int64)
+    
+    def _totals(self, base, starts, ends):
+        """Stay totals for base nightly prices over [starts, ends); starts < ends everywhere"""
+        if not len(base):
+            return np.zeros(0)
+        origin, cumulative = self._cumulative(int(starts.min()), int(ends.max()))
+        totals = base * (cumulative[ends - origin] - cumulative[starts - origin])
+        if len(self.stay_thresholds):
+            tier = np.searchsorted(self.stay_thresholds, ends - starts, side='right') - 1
+            totals *= np.where(tier >= 0, self.stay_multipliers[np.maximum(tier, 0)], 1.0)
+        return np.round(totals, 2)
+    
+    def quote(self, room_ids, check_ins, check_outs):
+        """Price many stays at once
+        
+        Takes equal-length sequences of room IDs and check-in/check-out dates
+        (date objects, datetime64 or ordinals) and returns (totals, nights)
+        arrays. Totals are NaN for unknown rooms and stays of no nights.
+        """
+        room_ids = np.asarray(room_ids)
+        if len(room_ids) and not np.issubdtype(room_ids.dtype, np.integer):
+            raise ValueError("room IDs must be integers")
+        room_ids = room_ids.astype(np.int64)
+        starts, ends = self._ordinals(check_ins), self._ordinals(check_outs)
+        nights = ends - starts
+        prices = self.base_prices()
+        
+        known = (nights > 0) & (room_ids >= 0) & (room_ids < len(prices))
+        base = prices[room_ids[known]]
+        known[known] = ~np.isnan(base)
+        
+        totals = np.full(len(room_ids), np.nan)
+        totals[known] = self._totals(base[~np.isnan(base)], starts[known], ends[known])
+        return totals, nights
+    
+    def stay_prices(self, prices_per_night, check_ins, check_outs):
+        """Totals for stays at given nightly base prices (e.g. of rooms locked for booking)"""
+        return self._totals(np.asarray(prices_per_night, dtype=float), self._ordinals(check_ins), self._ordinals(check_outs))
+    
+    def stay_price(self, price_per_night, check_in_date, check_out_date):
+        """Total for one stay, as quote() would compute it"""
+        return float(self.stay_prices([price_per_night], [check_in_date], [check_out_date])[0])
+
+pricing_engine = PricingEngine(
+    load_rules(os.getenv('PRICING_RULES')),
+    reload_seconds=float(os.getenv('PRICING_RELOAD_SECONDS', '300'))
+)
@@ -0,0 +1,250 @@
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from sqlalchemy import inspect
+from sqlalchemy.dialects import postgresql, sqlite
+from .db import db, Room, Booking, DailyRollup, use_primary
+from .partitions import archive_partitions
+from .stats import REVENUE_STATUSES
+
+logger = logging.getLogger(__name__)
+
+# Columns a report can group by, and the counters summed for each group
+ROLLUP_GROUPS = ('day', 'hotel_id', 'room_type')
+ROLLUP_COUNTERS = ('nights_sold', 'revenue', 'cancellations')
+
+# Dialects with INSERT ... ON CONFLICT DO UPDATE; others update, then insert
+UPSERT_INSERTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+UPSERT_BATCH_SIZE = 5000
+
+def _nights(status, check_in_date, check_out_date, total_price):
+    """(night, nights_sold, revenue, cancellations) for each night of a stay with this status"""
+    sold = status in REVENUE_STATUSES
+    cancelled = status == 'cancelled'
+    if not (sold or cancelled) or not check_in_date or not check_out_date or check_out_date <= check_in_date:
+        return
+    nights = (check_out_date - check_in_date).days
+    # Revenue is spread evenly over the nights of the stay
+    nightly_revenue = (total_price or 0) / nights if sold else 0.0
+    for offset in range(nights):
+        yield check_in_date + timedelta(days=offset), int(sold), nightly_revenue, int(cancelled)
+
+def _booking_state(booking, previous=False):
+    """(room_id, status, check_in, check_out, total_price), as flushed before if previous"""
+    state = inspect(booking)
+    values = []
+    for name in ('room_id', 'status', 'check_in_date', 'check_out_date', 'total_price'):
+        history = state.attrs[name].history
+        values.append(history.deleted[0] if previous and history.deleted else getattr(booking, name))
+    # The column default applies on INSERT; rooms are keyed by integer ID
+    values[1] = values[1] or 'confirmed'
+    if isinstance(values[0], str) and values[0].strip().isdigit():
+        values[0] = int(values[0])
+    return tuple(values)
+
+def _room_groups(session, room_ids):
+    """Map room IDs to (hotel_id, room_type), from the identity map where possible"""
+    groups = {}
+    for obj in session.identity_map.values():
+        if isinstance(obj, Room):
+            # Read only loaded attributes; touching expired ones would query mid-flush
+            state = inspect(obj)
+            room_id = state.identity[0] if state.identity else None
+            if room_id in room_ids and 'hotel_id' in state.dict and 'room_type' in state.dict:
+                groups[room_id] = (state.dict['hotel_id'], state.dict['room_type'])
+    missing = set(room_ids) - set(groups)
+    if missing:
+        rows = session.connection().execute(
+            db.select(Room.id, Room.hotel_id, Room.room_type).where(Room.id.in_(missing))
+        )
+        groups.update((room_id, (hotel_id, room_type)) for room_id, hotel_id, room_type in rows)
+    return groups
+
+def _upsert(connection, totals):
+    """Add {(day, hotel_id, room_type): [nights_sold, revenue, cancellations]} to the rollup rows"""
+    table = DailyRollup.__table__
+    rows = [
+        dict(zip(ROLLUP_GROUPS + ROLLUP_COUNTERS, key + tuple(counters)))
+        for key, counters in totals.items() if any(counters)
+    ]
+    insert = UPSERT_INSERTS.get(connection.dialect.name)
+    if insert is None:
+        for row in rows:
+            key = [table.c[name] == row[name] for name in ROLLUP_GROUPS]
+            updated = connection.execute(
+                table.update().where(*key).values({name: table.c[name] + row[name] for name in ROLLUP_COUNTERS})
+            )
+            if updated.rowcount == 0:
+                connection.execute(table.insert().values(row))
+        return len(rows)
+    
+    # One cached single-row statement run with executemany; a multi-row
+    # VALUES clause would be compiled afresh for every batch
+    statement = insert(table)
+    statement = statement.on_conflict_do_update(
+        index_elements=[table.c[name] for name in ROLLUP_GROUPS],
+        set_={name: table.c[name] + statement.excluded[name] for name in ROLLUP_COUNTERS}
+    )
+    for position in range(0, len(rows), UPSERT_BATCH_SIZE):
+        connection.execute(statement, rows[position:position + UPSERT_BATCH_SIZE])
+    return len(rows)
+
+def record_flush(session):
+    """Fold the booking rows written by a flush into daily_rollups
+    
+    Runs from the session's after_flush event, so the rollup changes commit
+    or roll back together with the bookings themselves. A new booking adds
+    its nights; a status, date, price or room change retracts the previous
+    state and adds the new one, so a cancellation moves its nights from sold
+    to cancelled.
+    """
+    changes = []
+    for obj in session.new:
+        if isinstance(obj, Booking):
+            changes.append((1, _booking_state(obj)))
+    for obj in session.deleted:
+        if isinstance(obj, Booking):
+            changes.append((-1, _booking_state(obj, previous=True)))
+    for obj in session.dirty:
+        if isinstance(obj, Booking) and session.is_modified(obj):
+            before, after = _booking_state(obj, previous=True), _booking_state(obj)
+            if before != after:
+                changes.extend([(-1, before), (1, after)])
+    if not changes:
+        return
+    
+    groups = _room_groups(session, {state[0] for _, state in changes})
+    totals = defaultdict(lambda: [0, 0.0, 0])
+    for sign, (room_id, *stay) in changes:
+        group = groups.get(room_id)
+        if group is None:
+            # No such room: the INSERT fails on its foreign key, or a backfill repairs the rollup
+            logger.warning("Booking for unknown room %r left out of the daily rollup", room_id)
+            continue
+        hotel_id, room_type = group
+        for day, sold, revenue, cancelled in _nights(*stay):
+            counters = totals[(day, hotel_id, room_type)]
+            counters[0] += sign * sold
+            counters[1] += sign * revenue
+            counters[2] += sign * cancelled
+    _upsert(session.connection(), totals)
+
+def needs_backfill():
+    """True if there are bookings but no rollup rows, e.g. a database older than the rollup"""
+    with use_primary():
+        return db.session.scalar(db.select(DailyRollup.day).limit(1)) is None and \
+            db.session.scalar(db.select(Booking.id).limit(1)) is not None
+
+def backfill(start=None, end=None, batch_size=10000):
+    """Rebuild the rollup rows for nights in [start, end) from live and archived bookings
+    
+    Either bound may be None for an open range. Booking writes are blocked
+    until the rebuild commits, so none of them is lost or counted twice; call
+    it outside any open transaction. Returns (bookings_read, rows_written).
+    """
+    session = db.session
+    with use_primary():
+        dialect = session.get_bind().dialect.name
+        if dialect == 'sqlite':
+            session.execute(db.text('BEGIN IMMEDIATE'))
+        elif dialect == 'postgresql':
+            # Live bookings upsert rollup rows before committing, so they wait here
+            session.execute(db.text('LOCK TABLE daily_rollups IN EXCLUSIVE MODE'))
+        
+        try:
+            delete = db.delete(DailyRollup)
+            if start is not None:
+                delete = delete.where(DailyRollup.day >= start)
+            if end is not None:
+                delete = delete.where(DailyRollup.day < end)
+            session.execute(delete)
+            
+            # Archived bookings still count towards their nights; only the
+            # partitions holding stays that end after start are read
+            selects = []
+            for table in archive_partitions.tables(start):
+                select = db.select(
+                    Room.hotel_id, Room.room_type, table.c.status,
+                    table.c.check_in_date, table.c.check_out_date, table.c.total_price
+                ).join(Room, table.c.room_id == Room.id).where(
+                    table.c.status.in_(REVENUE_STATUSES + ('cancelled',))
+                )
+                if start is not None:
+                    select = select.where(table.c.check_out_date > start)
+                if end is not None:
+                    select = select.where(table.c.check_in_date < end)
+                selects.append(select)
+            stays = db.union_all(*selects)
+            
+            bookings_read = 0
+            totals = defaultdict(lambda: [0, 0.0, 0])
+            rows = session.execute(stays.execution_options(stream_results=True, yield_per=batch_size))
+            for hotel_id, room_type, *stay in rows:
+                bookings_read += 1
+                for day, sold, revenue, cancelled in _nights(*stay):
+                    if (start is None or day >= start) and (end is None or day < end):
+                        counters = totals[(day, hotel_id, room_type)]
+                        counters[0] += sold
+                        counters[1] += revenue
+                        counters[2] += cancelled
+            
+            rows_written = _upsert(session.connection(), totals)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+    
+    logger.info("Rebuilt %d daily rollup rows from %d bookings", rows_written, bookings_read)
+    return bookings_read, rows_written
+
+def occupancy_report(start, end, hotel_id=None, group_by=('day',)):
+    """Nights sold, revenue, cancellations and occupancy for nights in [start, end)
+    
+    Rows are grouped by the ROLLUP_GROUPS columns in group_by. The occupancy
+    rate divides nights sold by the rooms in the group times its nights,
+    using the current room inventory.
+    """
+    group_columns = [getattr(DailyRollup, name) for name in group_by]
+    sums = [db.func.sum(getattr(DailyRollup, name)) for name in ROLLUP_COUNTERS]
+    query = db.select(*group_columns, *sums).where(DailyRollup.day >= start, DailyRollup.day < end)
+    inventory_query = db.select(Room.hotel_id, Room.room_type, db.func.count(Room.id)).group_by(
+        Room.hotel_id, Room.room_type
+    )
+    if hotel_id is not None:
+        query = query.where(DailyRollup.hotel_id == hotel_id)
+        inventory_query = inventory_query.where(Room.hotel_id == hotel_id)
+    query = query.group_by(*group_columns).order_by(*group_columns)
+    
+    inventory = db.session.execute(inventory_query).all()
+    days = (end - start).days
+    
+    def summarize(group, nights_sold, revenue, cancellations):
+        rooms = sum(
+            count for room_hotel_id, room_type, count in inventory
+            if group.get('hotel_id', room_hotel_id) == room_hotel_id and group.get('room_type', room_type) == room_type
+        )
+        available_nights = rooms * (1 if 'day' in group else days)
+        return {
+            **{name: value.isoformat() if name == 'day' else value for name, value in group.items()},
+            "nights_sold": int(nights_sold or 0),
+            "revenue": round(revenue or 0.0, 2),
+            "cancellations": int(cancellations or 0),
+            "occupancy_rate": round(nights_sold / available_nights, 4) if available_nights and nights_sold else 0.0,
+        }
+    
+    rows = []
+    totals = [0, 0.0, 0]
+    for row in db.session.execute(query):
+        counters = row[len(group_by):]
+        rows.append(summarize(dict(zip(group_by, row[:len(group_by)])), *counters))
+        totals = [total + (value or 0) for total, value in zip(totals, counters)]
+    
+    return {
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "hotel_id": hotel_id,
+        "group_by": list(group_by),
+        "rows": rows,
+        "totals": summarize({}, *totals),
+    }
@@ -0,0 +1,204 @@
+import os
+import threading
+import time
+from collections import Counter
+from datetime import date
+from sqlalchemy import inspect
+from .db import db, Hotel, Room, Booking, use_primary
+from .partitions import archive_partitions
+
+# Statuses whose total_price counts as booked revenue
+REVENUE_STATUSES = ('confirmed', 'completed')
+
+class DashboardStats:
+    """Running totals behind GET /api/stats
+    
+    Loaded once with a handful of aggregate queries, then kept up to date from
+    the deltas of every committed flush (see the session listeners in
+    logic.py), so reading them costs the same whatever the table sizes.
+    
+    Tonight's occupancy is kept as a running count plus, for each future
+    date, the number of confirmed stays starting and ending that day; when the
+    date changes the count is rolled forward by those deltas. Like the
+    occupancy index the counters only see writes made through this process,
+    so they are reloaded every `reload_seconds` (STATS_RELOAD_SECONDS) to pick
+    up other processes and bulk UPDATE/INSERT statements.
+    """
+    
+    def __init__(self, reload_seconds=300):
+        self.reload_seconds = reload_seconds
+        self.loaded = False
+        self._loading = False
+        self._raced = False
+        self._loaded_at = 0.0
+        self._reload_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._reset(date.today().toordinal())
+    
+    def _reset(self, today):
+        self._today = today
+        self.hotels = 0
+        self.rooms = 0
+        self.active_bookings = 0
+        self.occupied_tonight = 0
+        self.revenue = 0.0
+        self._starts = Counter()
+        self._ends = Counter()
+    
+    def load(self):
+        """(Re)compute every counter from the database"""
+        with self._lock:
+            self._loading = True
+            self._raced = False
+        
+        try:
+            today = date.today()
+            confirmed = Booking.status == 'confirmed'
+            # Replicas may lag behind the deltas applied afterwards, so read the primary
+            with use_primary():
+                hotels = db.session.scalar(db.select(db.func.count(Hotel.id)))
+                rooms = db.session.scalar(db.select(db.func.count(Room.id)))
+                revenue = sum(
+                    db.session.scalar(
+                        db.select(db.func.coalesce(db.func.sum(table.c.total_price), 0.0)).where(
+                            table.c.status.in_(REVENUE_STATUSES)
+                        )
+                    )
+                    # Archiving finished bookings leaves the revenue total unchanged
+                    for table in archive_partitions.tables()
+                )
+                occupied = db.session.scalar(
+                    db.select(db.func.count(Booking.id)).where(
+                        confirmed, Booking.check_in_date <= today, Booking.check_out_date > today
+                    )
+                )
+                starts = db.session.execute(
+                    db.select(Booking.check_in_date, db.func.count(Booking.id)).where(
+                        confirmed, Booking.check_in_date > today
+                    ).group_by(Booking.check_in_date)
+                ).all()
+                ends = db.session.execute(
+                    db.select(Booking.check_out_date, db.func.count(Booking.id)).where(
+                        confirmed, Booking.check_out_date > today
+                    ).group_by(Booking.check_out_date)
+                ).all()
+        except Exception:
+            # Deltas kept being applied meanwhile, so the counters stay usable
+            # until the next read retries the reload
+            with self._lock:
+                self._loading = False
+            raise
+        
+        with self._lock:
+            self._reset(today.toordinal())
+            self.hotels = hotels
+            self.rooms = rooms
+            self.revenue = float(revenue)
+            self.occupied_tonight = occupied
+            self._starts.update({day.toordinal(): count for day, count in starts})
+            self._ends.update({day.toordinal(): count for day, count in ends})
+            self.active_bookings = sum(self._ends.values())
+            self._loading = False
+            self.loaded = True
+            # A commit that landed mid-load may or may not be in the snapshot;
+            # rather than guess, load again on the next read
+            self._loaded_at = 0.0 if self._raced else time.monotonic()
+    
+    def ensure_loaded(self):
+        # Like the occupancy index, the lock is not held while querying
+        if not self.loaded:
+            self.load()
+        elif time.monotonic() - self._loaded_at >= self.reload_seconds and self._reload_lock.acquire(blocking=False):
+            # One thread reloads; the others keep reading the current counters
+            try:
+                self.load()
+            finally:
+                self._reload_lock.release()
+    
+    def _roll(self):
+        """Move tonight forward when the date has changed"""
+        today = date.today().toordinal()
+        for day in range(self._today + 1, today + 1):
+            started, ended = self._starts.pop(day, 0), self._ends.pop(day, 0)
+            self.occupied_tonight += started - ended
+            self.active_bookings -= ended
+        self._today = max(self._today, today)
+    
+    @staticmethod
+    def _booking_values(booking, previous=False):
+        """(status, check_in, check_out, total_price), as flushed before if previous"""
+        state = inspect(booking)
+        values = []
+        for name in ('status', 'check_in_date', 'check_out_date', 'total_price'):
+            history = state.attrs[name].history
+            values.append(history.deleted[0] if previous and history.deleted else getattr(booking, name))
+        # The column default applies on INSERT
+        values[0] = values[0] or 'confirmed'
+        return tuple(values)
+    
+    @staticmethod
+    def flush_deltas(session):
+        """Counter deltas for the pending changes of a session about to flush"""
+        deltas = []
+        for sign, objects in ((1, session.new), (-1, session.deleted)):
+            for obj in objects:
+                if isinstance(obj, Hotel):
+                    deltas.append(('hotels', sign))
+                elif isinstance(obj, Room):
+                    deltas.append(('rooms', sign))
+                elif isinstance(obj, Booking):
+                    deltas.append(('booking', sign, DashboardStats._booking_values(obj, previous=sign < 0)))
+        for obj in session.dirty:
+            if isinstance(obj, Booking) and session.is_modified(obj):
+                before = DashboardStats._booking_values(obj, previous=True)
+                after = DashboardStats._booking_values(obj)
+                if before != after:
+                    deltas.append(('booking', -1, before))
+                    deltas.append(('booking', 1, after))
+        return deltas
+    
+    def _apply_booking(self, sign, status, check_in_date, check_out_date, total_price):
+        if status in REVENUE_STATUSES:
+            self.revenue += sign * (total_price or 0)
+        if status != 'confirmed' or not check_in_date or not check_out_date:
+            return
+        start, end = check_in_date.toordinal(), check_out_date.toordinal()
+        if end <= self._today:
+            return
+        self.active_bookings += sign
+        self._ends[end] += sign
+        if start <= self._today:
+            self.occupied_tonight += sign
+        else:
+            self._starts[start] += sign
+    
+    def apply(self, deltas):
+        """Apply the deltas of a committed transaction"""
+        with self._lock:
+            if self._loading:
+                self._raced = True
+            if not self.loaded:
+                return
+            self._roll()
+            for delta in deltas:
+                if delta[0] == 'hotels':
+                    self.hotels += delta[1]
+                elif delta[0] == 'rooms':
+                    self.rooms += delta[1]
+                else:
+                    self._apply_booking(delta[1], *delta[2])
+    
+    def snapshot(self):
+        with self._lock:
+            self._roll()
+            return {
+                "hotels": self.hotels,
+                "rooms": self.rooms,
+                "active_bookings": self.active_bookings,
+                "occupied_rooms_tonight": self.occupied_tonight,
+                "occupancy_rate_tonight": round(self.occupied_tonight / self.rooms, 4) if self.rooms else 0.0,
+                "revenue": round(self.revenue, 2),
+                "date": date.fromordinal(self._today).isoformat(),
+            }
+
+dashboard_stats = DashboardStats(reload_seconds=float(os.getenv('STATS_RELOAD_SECONDS', '300')))